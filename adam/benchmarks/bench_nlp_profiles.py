@@ -0,0 +1,70 @@
+"""
+Compares the NLP profiles on throughput and entity agreement.
+
+Runs the page texts in a directory (e.g. the .txt files
+written by Container.dump) through each profile, reports
+pages per second, and scores each profile's entities
+against the full pipeline's: an entity agrees when its
+span and label match exactly.
+
+  python benchmarks/bench_nlp_profiles.py /tmp/adam/<container-id> --model en_core_web_lg
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from adam.nlp import PROFILES, load_model
+
+
+def entities(docs):
+    return [{(e.start_char, e.end_char, e.label_) for e in doc.ents} for doc in docs]
+
+
+def agreement(reference, candidate):
+    true_positives = sum(len(r & c) for r, c in zip(reference, candidate))
+    predicted = sum(len(c) for c in candidate)
+    expected = sum(len(r) for r in reference)
+    precision = true_positives / predicted if predicted else 1.0
+    recall = true_positives / expected if expected else 1.0
+    f_score = (
+        2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    )
+    return precision, recall, f_score
+
+
+def run_profile(model, profile, texts, batch_size):
+    nlp = load_model(model, profile=profile)
+    start = time.perf_counter()
+    docs = list(nlp.pipe(texts, batch_size=batch_size))
+    elapsed = time.perf_counter() - start
+    return docs, elapsed
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(description="Benchmark NLP profiles")
+    parser.add_argument("text_dir", help="directory of page .txt files")
+    parser.add_argument("--model", default="en_core_web_sm")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--profiles", nargs="+", default=sorted(PROFILES))
+    return parser.parse_args(args)
+
+
+def main(args):
+    args = parse_args(args)
+    texts = [p.read_text() for p in sorted(Path(args.text_dir).glob("*.txt"))]
+    reference, _ = run_profile(args.model, "full", texts, args.batch_size)
+    reference = entities(reference)
+
+    print("profile\tpages/s\tprecision\trecall\tf1")
+    for profile in args.profiles:
+        docs, elapsed = run_profile(args.model, profile, texts, args.batch_size)
+        precision, recall, f_score = agreement(reference, entities(docs))
+        print(
+            f"{profile}\t{len(texts) / elapsed:.1f}\t"
+            f"{precision:.3f}\t{recall:.3f}\t{f_score:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
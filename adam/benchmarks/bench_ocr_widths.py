@@ -0,0 +1,97 @@
+"""
+Compares OCR throughput and confidence across image profiles.
+
+For each width (and the TIFF master), downloads the page
+images of a manifest into a scratch cache, runs tesseract
+on them and reports transfer size, download and OCR time,
+and the mean confidence of the recognized words.
+
+  python benchmarks/bench_ocr_widths.py MANIFEST_URL --widths 1000 1500 2000 3000
+"""
+
+import argparse
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+import pytesseract
+from adam.cache import ImageCache
+from adam.downloader import Downloader
+from adam.manifest import Manifest, Canvas, ImageProfile, MASTER_PROFILE
+
+_logger = logging.getLogger(__name__)
+
+
+def bench_profile(manifest, profile, scratch_dir: Path, pages=None):
+    canvases = [Canvas(c.canvas, profile) for c in manifest.canvases[:pages]]
+    cache = ImageCache(scratch_dir)
+    for canvas in canvases:
+        canvas.image_cache = cache
+
+    downloader = Downloader()
+    start = time.perf_counter()
+    downloader.download_canvases(canvases)
+    download_seconds = time.perf_counter() - start
+    downloader.close()
+
+    transferred = sum(c.image_path.stat().st_size for c in canvases)
+
+    confidences = []
+    start = time.perf_counter()
+    for canvas in canvases:
+        data = pytesseract.image_to_data(str(canvas.image_path), output_type="data.frame")
+        confidences.extend(data[data.conf >= 0].conf.tolist())
+    ocr_seconds = time.perf_counter() - start
+
+    return {
+        "profile": profile.key or "master",
+        "pages": len(canvases),
+        "megabytes": transferred / 2**20,
+        "download_s": download_seconds,
+        "ocr_s": ocr_seconds,
+        "pages_per_s": len(canvases) / ocr_seconds if ocr_seconds else 0.0,
+        "words": len(confidences),
+        "mean_conf": sum(confidences) / len(confidences) if confidences else 0.0,
+    }
+
+
+def report(results):
+    columns = ["profile", "pages", "megabytes", "download_s", "ocr_s",
+               "pages_per_s", "words", "mean_conf"]
+    print("\t".join(columns))
+    for result in results:
+        print(
+            "\t".join(
+                f"{result[c]:.2f}" if isinstance(result[c], float) else str(result[c])
+                for c in columns
+            )
+        )
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(description="Benchmark OCR image widths")
+    parser.add_argument("manifest_url", help="url of manifest")
+    parser.add_argument("--widths", type=int, nargs="+", default=[1000, 1500, 2000, 3000])
+    parser.add_argument("--pages", type=int, help="only use the first N pages")
+    parser.add_argument("--no-master", action="store_true", help="skip the TIFF master")
+    return parser.parse_args(args)
+
+
+def main(args):
+    args = parse_args(args)
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+    manifest = Manifest(args.manifest_url)
+    profiles = [ImageProfile.ocr(width) for width in args.widths]
+    if not args.no_master:
+        profiles.append(MASTER_PROFILE)
+
+    results = []
+    for profile in profiles:
+        with tempfile.TemporaryDirectory() as scratch:
+            results.append(bench_profile(manifest, profile, Path(scratch), args.pages))
+    report(results)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
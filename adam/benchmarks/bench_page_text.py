@@ -0,0 +1,70 @@
+"""
+Compares frame_text with the row-by-row text assembly it replaced.
+
+Takes real tesseract output: a page image (run through
+tesseract first), a cached Parquet OCR frame, or a legacy
+CSV OCR frame.
+
+  python benchmarks/bench_page_text.py /usr/local/var/cache/adam/ocr/<file>.parquet
+"""
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+from adam.ocr_data import frame_text, read_ocr_frame, read_legacy_frame
+
+IMAGE_SUFFIXES = {".tif", ".tiff", ".jpg", ".jpeg", ".png"}
+
+
+def iterrows_text(data_frame, threshold):
+    data_frame = data_frame[data_frame.conf > threshold]
+    data_frame = data_frame.reset_index().fillna("")
+    words = []
+    for _, token in data_frame.iterrows():
+        if not (token.isnull()["text"]):
+            words.append(token["text"])
+    return " ".join(words).strip()
+
+
+def load_frame(path: Path):
+    if path.suffix.lower() in IMAGE_SUFFIXES:
+        import pytesseract
+
+        return pytesseract.image_to_data(str(path), output_type="data.frame")
+    if path.suffix == ".parquet":
+        return read_ocr_frame(path)
+    return read_legacy_frame(path)
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(description="Benchmark page text assembly")
+    parser.add_argument("source", help="page image or cached OCR frame")
+    parser.add_argument("--threshold", type=int, default=95)
+    parser.add_argument("--repeat", type=int, default=20)
+    return parser.parse_args(args)
+
+
+def main(args):
+    args = parse_args(args)
+    frame = load_frame(Path(args.source))
+    assert iterrows_text(frame, args.threshold) == frame_text(frame, args.threshold)
+
+    old = min(
+        timeit.repeat(
+            lambda: iterrows_text(frame, args.threshold), number=1, repeat=args.repeat
+        )
+    )
+    new = min(
+        timeit.repeat(
+            lambda: frame_text(frame, args.threshold), number=1, repeat=args.repeat
+        )
+    )
+    print(f"rows\t{len(frame)}")
+    print(f"iterrows\t{old * 1000:.2f} ms")
+    print(f"frame_text\t{new * 1000:.2f} ms")
+    print(f"speedup\t{old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
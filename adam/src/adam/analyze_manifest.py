@@ -3,10 +3,16 @@ import logging
 from os import defpath
 import sys
 from pathlib import Path
-from adam.manifest import Manifest
+from adam.ledger import DEFAULT_NAME, Ledger
+from adam.manifest import Manifest, Canvas, ImageProfile
 from rdflib import container
 import spacy
 from adam.container import Container
+from adam.exporter import ARCHIVES, FORMATS
+from adam.graphable import Graphable
+from adam.memory import MemoryBudget, format_size, peak_rss
+from adam.nlp import DEFAULT_BATCH_SIZE, DEFAULT_PROFILE, PROFILES, load_model
+from adam.page import Page
 
 _logger = logging.getLogger(__name__)
 
@@ -16,6 +22,102 @@ def parse_args(args):
     parser.add_argument("manifest_url", help="url of manifest")
     parser.add_argument("nlp", help="name of spacy model to use")
     parser.add_argument("basedir", help="directory to save into")
+    parser.add_argument(
+        "--ocr-width",
+        type=int,
+        help="fetch grayscale IIIF derivatives of this width instead of TIFF masters",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="page image cache directory (default: $ADAM_IMAGE_CACHE)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        help="page image cache budget, e.g. 50G (default: $ADAM_IMAGE_CACHE_SIZE)",
+    )
+    doc_cache = parser.add_mutually_exclusive_group()
+    doc_cache.add_argument(
+        "--doc-cache-dir",
+        help="cache of analyzed page Docs (default: $ADAM_DOC_CACHE)",
+    )
+    doc_cache.add_argument(
+        "--no-doc-cache",
+        action="store_true",
+        help="analyze every page afresh, caching no Docs",
+    )
+    parser.add_argument(
+        "--formats",
+        default=",".join(FORMATS),
+        help=f"comma-separated export formats (default: {','.join(FORMATS)})",
+    )
+    parser.add_argument(
+        "--archive",
+        choices=ARCHIVES,
+        help="write the container's files into one archive instead of a directory",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="analyze and export a batch of pages at a time, releasing pages once exported",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        help="with --stream, shrink batches to keep resident memory under this, e.g. 4G",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="use cached manifests only; never fetch them",
+    )
+    parser.add_argument(
+        "--ocr-processes",
+        type=int,
+        help="run OCR in a pool of this many processes before analysis",
+    )
+    parser.add_argument(
+        "--nlp-processes",
+        type=int,
+        default=1,
+        help="number of processes for batched NLP",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="number of pages per NLP batch",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=sorted(PROFILES),
+        default=DEFAULT_PROFILE,
+        help="NLP profile: full pipeline, fast (ner + senter) or ner only",
+    )
+    parser.add_argument(
+        "--gazetteer",
+        action="append",
+        default=[],
+        help="pattern file (.jsonl) or name list (.csv, .tsv) of known names; may be repeated",
+    )
+    parser.add_argument(
+        "--gazetteer-mode",
+        choices=["before", "instead"],
+        default="before",
+        help="run the gazetteer before statistical NER or instead of it",
+    )
+    parser.add_argument(
+        "--ledger",
+        help=f"job ledger recording finished work (default: BASEDIR/{DEFAULT_NAME})",
+    )
+    parser.add_argument(
+        "--no-ledger",
+        action="store_true",
+        help="redo all the work, keeping no ledger",
+    )
+    parser.add_argument(
+        "--deterministic-ids",
+        action="store_true",
+        help="derive RDF ids from canvas, span and text so reruns produce the same ids",
+    )
     parser.add_argument(
         "-v",
         "--verbose",
@@ -52,12 +154,51 @@ def main(args):
     _logger.info("Script starts here")
     args = parse_args(args)
     setup_logging(args.loglevel)
+    if args.ocr_width:
+        Canvas.image_profile = ImageProfile.ocr(args.ocr_width)
+    if args.cache_dir or args.cache_size:
+        Canvas.use_image_cache(args.cache_dir, args.cache_size)
+    if args.no_doc_cache:
+        Page.use_doc_cache(None)
+    elif args.doc_cache_dir:
+        Page.use_doc_cache(args.doc_cache_dir)
+    if args.offline:
+        Manifest.use_manifest_cache(offline=True)
+    if args.deterministic_ids:
+        Graphable.deterministic_ids = True
     manifest = Manifest(args.manifest_url)
-    nlp = spacy.load(args.nlp)
-    container = Container(manifest, nlp)
+    nlp = load_model(
+        args.nlp,
+        profile=args.profile,
+        gazetteer=args.gazetteer,
+        gazetteer_mode=args.gazetteer_mode,
+    )
     base_dir = Path(args.basedir)
     base_dir.mkdir(parents=True, exist_ok=True)
-    container.dump(base_dir)
+    ledger = None
+    if not args.no_ledger:
+        ledger = Ledger(args.ledger or base_dir / DEFAULT_NAME)
+    container = Container(
+        manifest,
+        nlp,
+        args.profile,
+        ledger,
+        export_formats=args.formats.split(","),
+        archive=args.archive,
+    )
+    if container.is_complete():
+        _logger.info(f"{args.manifest_url} is already done")
+        return
+    if args.ocr_processes:
+        container.ocr(args.ocr_processes)
+    if args.stream or args.memory_budget:
+        budget = MemoryBudget(args.memory_budget) if args.memory_budget else None
+        container.dump_streaming(base_dir, args.batch_size, args.nlp_processes, budget)
+    else:
+        container.process_nlp(args.batch_size, args.nlp_processes)
+        container.dump(base_dir)
+    _logger.info(f"image cache: {Canvas.image_cache.stats}")
+    _logger.info(f"peak RSS: {format_size(peak_rss())}")
     _logger.info("Script ends here")
 
 
@@ -0,0 +1,436 @@
+"""The adam Cache module
+
+Three on-disk caches live here.
+
+The ImageCache is a size-capped cache of page images.
+Files are stored under the SHA-256 of their key (the
+image URI), sharded two levels deep so no directory
+holds more than a few thousand files, and indexed in a
+small SQLite database that records each file's size and
+last access.  When the cache grows past its byte budget,
+the least recently used files are evicted, except those
+used within the last min_age seconds: an image just
+downloaded may still be waiting for OCR.  The .part files
+of downloads interrupted more than min_age seconds ago,
+which the index does not know of, are swept away too.
+
+  Typical usage:
+
+  cache = ImageCache("/var/cache/adam/images", max_bytes=parse_size("50G"))
+  path = cache.get(uri, ".tif")
+  if path is None:
+      path = cache.path_for(uri, ".tif")
+      ... write the file ...
+      cache.add(uri, path)
+
+The ManifestCache keeps IIIF manifest JSON together with
+the ETag and Last-Modified headers it was served with, and
+revalidates it with a conditional GET, so an unchanged
+manifest costs a 304 rather than a download and parse.
+In offline mode it never touches the network.
+
+The DocCache keeps the spaCy Docs produced for page texts,
+serialized with DocBin.  A Doc is stored under a hash of
+the text, the pipeline (model name and version, spaCy
+version and component names) and the OCR confidence
+threshold, so a change to any of them misses the cache.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+import requests
+
+log = logging.getLogger(__name__)
+
+size_pattern = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*$", re.IGNORECASE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+STATS = (
+    "hits",
+    "misses",
+    "evicted_files",
+    "evicted_bytes",
+    "swept_files",
+    "swept_bytes",
+)
+
+DEFAULT_MIN_AGE = 600
+
+
+def parse_size(value):
+    """Converts a size such as "500M" or "2G" to a number of bytes."""
+    if value is None or isinstance(value, int):
+        return value
+    match = size_pattern.match(value)
+    if not match:
+        raise ValueError(f"invalid size: {value}")
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** " KMGT".index(unit.upper() or " "))
+
+
+class ImageCache:
+    """The ImageCache class"""
+
+    index_name = "index.sqlite"
+
+    def __init__(self, root, max_bytes=None, min_age=DEFAULT_MIN_AGE):
+        self.root = Path(root)
+        self.max_bytes = parse_size(max_bytes)
+        self.min_age = min_age
+        self._initialized = False
+        self._swept = 0.0
+
+    def __repr__(self) -> str:
+        return f"ImageCache({self.root})"
+
+    @property
+    def index_path(self) -> Path:
+        return self.root / self.index_name
+
+    @contextmanager
+    def connection(self):
+        """Opens a short-lived connection to the index, so the
+        cache may be shared by threads and processes."""
+        if not self._initialized:
+            self.root.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.index_path, timeout=60, isolation_level=None)
+        try:
+            if not self._initialized:
+                conn.executescript(SCHEMA)
+                self._initialized = True
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def digest(key) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def path_for(self, key, suffix="") -> Path:
+        """Returns the sharded path at which key is stored."""
+        digest = self.digest(key)
+        return self.root / digest[:2] / digest[2:4] / (digest + suffix)
+
+    def _count(self, conn, name, amount=1):
+        conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    def get(self, key, suffix=""):
+        """Returns the path of the cached file for key, or None."""
+        path = self.path_for(key, suffix)
+        with self.connection() as conn:
+            if path.is_file():
+                conn.execute(
+                    "INSERT INTO entries (key, path, size, last_access) "
+                    "VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET last_access = excluded.last_access",
+                    (key, str(path.relative_to(self.root)), path.stat().st_size, time.time()),
+                )
+                self._count(conn, "hits")
+                return path
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._count(conn, "misses")
+        return None
+
+    def add(self, key, path: Path):
+        """Records a file written at path_for(key) and evicts
+        older files if the cache is over its budget."""
+        with self.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, path, size, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, str(path.relative_to(self.root)), path.stat().st_size, time.time()),
+            )
+        if self.max_bytes is not None:
+            self.evict(self.max_bytes, keep=key)
+        return path
+
+    @property
+    def size(self) -> int:
+        with self.connection() as conn:
+            return conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def evict(self, max_bytes, keep=None, min_age=None):
+        """Removes least recently used files until the cache
+        holds no more than max_bytes, sparing keep and the
+        files used in the last min_age seconds (by default
+        the cache's min_age), which may be in use."""
+        if min_age is None:
+            min_age = self.min_age
+        if time.time() - self._swept >= min_age:
+            self.sweep(min_age)
+        cutoff = time.time() - min_age
+        evicted_files = evicted_bytes = 0
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                total = conn.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM entries"
+                ).fetchone()[0]
+                rows = conn.execute(
+                    "SELECT key, path, size FROM entries WHERE last_access <= ? "
+                    "ORDER BY last_access",
+                    (cutoff,),
+                )
+                victims = []
+                for key, path, size in rows:
+                    if total <= max_bytes:
+                        break
+                    if key == keep:
+                        continue
+                    victims.append((key, path, size))
+                    total -= size
+                for key, path, size in victims:
+                    (self.root / path).unlink(missing_ok=True)
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    evicted_files += 1
+                    evicted_bytes += size
+                if evicted_files:
+                    self._count(conn, "evicted_files", evicted_files)
+                    self._count(conn, "evicted_bytes", evicted_bytes)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        if evicted_files:
+            log.info(f"evicted {evicted_files} files ({evicted_bytes} bytes) from {self}")
+        return evicted_bytes
+
+    def sweep(self, min_age=None) -> int:
+        """Removes the .part files of downloads interrupted
+        more than min_age seconds ago; returns the bytes
+        freed."""
+        if min_age is None:
+            min_age = self.min_age
+        cutoff = time.time() - min_age
+        swept_files = swept_bytes = 0
+        for part in self.root.glob("*/*/*.part"):
+            try:
+                stat = part.stat()
+                if stat.st_mtime > cutoff:
+                    continue
+                part.unlink()
+            except FileNotFoundError:
+                continue
+            swept_files += 1
+            swept_bytes += stat.st_size
+        self._swept = time.time()
+        if swept_files:
+            with self.connection() as conn:
+                self._count(conn, "swept_files", swept_files)
+                self._count(conn, "swept_bytes", swept_bytes)
+            log.info(
+                f"swept {swept_files} partial downloads ({swept_bytes} bytes) from {self}"
+            )
+        return swept_bytes
+
+    def clear(self):
+        return self.evict(0, min_age=0)
+
+    @property
+    def stats(self) -> dict:
+        with self.connection() as conn:
+            counts = dict(conn.execute("SELECT name, value FROM stats"))
+            files, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        stats = {name: counts.get(name, 0) for name in STATS}
+        stats["files"] = files
+        stats["bytes"] = size
+        return stats
+
+
+class ManifestUnavailable(LookupError):
+    """Raised when an uncached manifest is requested offline."""
+
+
+class ManifestCache:
+    """The ManifestCache class"""
+
+    def __init__(self, root, offline=False, timeout=60):
+        self.root = Path(root)
+        self.offline = offline
+        self.timeout = timeout
+        self._session = None
+
+    def __repr__(self) -> str:
+        return f"ManifestCache({self.root})"
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            self._session = requests.Session()
+        return self._session
+
+    def path_for(self, url) -> Path:
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.root / digest[:2] / f"{digest}.json"
+
+    def meta_path_for(self, url) -> Path:
+        return self.path_for(url).with_suffix(".meta.json")
+
+    @staticmethod
+    def _write(path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def fetch(self, url) -> dict:
+        """Returns the manifest at url, from the cache if it is
+        still current."""
+        path = self.path_for(url)
+        meta_path = self.meta_path_for(url)
+        cached = path.is_file()
+
+        if self.offline:
+            if not cached:
+                raise ManifestUnavailable(f"{url} is not cached")
+            return json.loads(path.read_bytes())
+
+        headers = {}
+        if cached and meta_path.is_file():
+            meta = json.loads(meta_path.read_text())
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and cached:
+                log.debug(f"manifest {url} not modified")
+                return json.loads(path.read_bytes())
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            if not cached:
+                raise
+            log.warning(f"could not revalidate {url} ({e}); using cached copy")
+            return json.loads(path.read_bytes())
+
+        manifest = response.json()
+        self._write(path, response.content)
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        self._write(meta_path, json.dumps(meta).encode("utf-8"))
+        return manifest
+
+
+class DocCache:
+    """The DocCache class"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def __repr__(self) -> str:
+        return f"DocCache({self.root})"
+
+    @staticmethod
+    def key(text, nlp, threshold) -> str:
+        # spaCy is imported here, not with the module, so
+        # that users of the image cache need not load it
+        import spacy
+
+        parts = [
+            nlp.meta.get("lang"),
+            nlp.meta.get("name"),
+            nlp.meta.get("version"),
+            spacy.__version__,
+            nlp.pipe_names,
+            nlp.meta.get("adam_gazetteer"),
+            threshold,
+        ]
+        digest = hashlib.sha256(json.dumps(parts).encode("utf-8"))
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def path_for(self, key) -> Path:
+        return self.root / key[:2] / f"{key}.spacy"
+
+    def get(self, key, vocab):
+        """Returns the cached Doc for key, or None."""
+        from spacy.tokens import DocBin
+
+        path = self.path_for(key)
+        if not path.is_file():
+            return None
+        doc_bin = DocBin().from_bytes(path.read_bytes())
+        return next(doc_bin.get_docs(vocab))
+
+    def put(self, key, doc):
+        from spacy.tokens import DocBin
+
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(DocBin(docs=[doc]).to_bytes())
+        os.replace(tmp, path)
+
+
+# CLI
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(description="Inspect or trim the image cache")
+    parser.add_argument("command", choices=["stats", "trim", "clear"])
+    parser.add_argument("--cache-dir", help="image cache directory")
+    parser.add_argument("--cache-size", help="byte budget for trim, e.g. 50G")
+    parser.add_argument(
+        "--min-age",
+        type=float,
+        default=DEFAULT_MIN_AGE,
+        help="seconds since their last use before trim may remove files",
+    )
+    return parser.parse_args(args)
+
+
+def main(args):
+    from adam.global_vars import PAGE_IMAGE_CACHE, PAGE_IMAGE_CACHE_SIZE
+
+    args = parse_args(args)
+    cache = ImageCache(
+        args.cache_dir or PAGE_IMAGE_CACHE, args.cache_size or PAGE_IMAGE_CACHE_SIZE
+    )
+    if args.command == "trim":
+        if cache.max_bytes is None:
+            raise SystemExit("no cache size given")
+        cache.evict(cache.max_bytes, min_age=args.min_age)
+    elif args.command == "clear":
+        cache.clear()
+    for name, value in cache.stats.items():
+        print(f"{name}\t{value}")
+
+
+def run():
+    main(sys.argv[1:])
+
+
+if __name__ == "__main__":
+    run()
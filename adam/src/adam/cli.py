@@ -1,8 +1,18 @@
 import argparse
 import logging
+import socket
 import sys
 from pathlib import Path
 from adam.container import Container
+from adam.exporter import ARCHIVES, FORMATS
+from adam.graphable import Graphable
+from adam.ledger import DEFAULT_NAME, Ledger
+from adam.manifest import Manifest, Canvas, ImageProfile
+from adam.memory import MemoryBudget, format_size, peak_rss
+from adam.nlp import DEFAULT_BATCH_SIZE, DEFAULT_PROFILE, PROFILES, load_model
+from adam.page import Page
+from adam.pipeline import Pipeline
+from adam.work_queue import DEFAULT_ATTEMPTS, DEFAULT_LEASE, WorkQueue
 
 _logger = logging.getLogger(__name__)
 
@@ -15,18 +25,139 @@ _default_output_dir.mkdir(parents=True, exist_ok=True)
 # `from foo.skeleton import fib`,
 # when using this Python module as a library.
 
-def analyze_manifest(manifest_url, out_dir=_default_output_dir):
-    container = Container(manifest_url)
+def analyze_manifest(
+    manifest_url,
+    out_dir=_default_output_dir,
+    ocr_processes=None,
+    nlp_processes=1,
+    batch_size=DEFAULT_BATCH_SIZE,
+    profile=DEFAULT_PROFILE,
+    gazetteer=(),
+    gazetteer_mode="before",
+    ledger=None,
+    canvases=None,
+    formats=FORMATS,
+    archive=None,
+    stream=False,
+    memory_budget=None,
+):
+    nlp = None
+    if gazetteer:
+        nlp = load_model(
+            profile=profile, gazetteer=gazetteer, gazetteer_mode=gazetteer_mode
+        )
+    container = Container(
+        Manifest(manifest_url), nlp, profile, ledger, canvases, formats, archive
+    )
+    if container.is_complete():
+        _logger.info(f"{manifest_url} is already done")
+        return
+    if ocr_processes:
+        container.ocr(ocr_processes)
+    if stream or memory_budget:
+        budget = MemoryBudget(memory_budget) if memory_budget else None
+        container.dump_streaming(out_dir, batch_size, nlp_processes, budget)
+        return
+    container.process_nlp(batch_size, nlp_processes)
     container.dump(out_dir)
 
-def analyze_manifests(manifest_list, out_dir):
-    with open(manifest_list, 'r') as m:
-        manifests = m.readlines()
+def analyze_manifests_pipelined(
+    manifests,
+    out_dir,
+    ocr_processes=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+    profile=DEFAULT_PROFILE,
+    gazetteer=(),
+    gazetteer_mode="before",
+    ledger=None,
+    formats=FORMATS,
+    archive=None,
+    nlp_processes=1,
+    memory_budget=None,
+):
+    """Runs the manifests through a Pipeline, which overlaps
+    the download, OCR, NLP and export of their pages, and
+    always streams them."""
+    nlp = load_model(profile=profile, gazetteer=gazetteer, gazetteer_mode=gazetteer_mode)
+
+    def containers():
         for manifest_url in manifests:
-            _logger.info(f"processing {manifest_url}")
-            container = Container(manifest_url.strip())
-            container.dump(out_dir)
-            _logger.info(f"done with {manifest_url}")
+            container = Container(
+                Manifest(manifest_url),
+                nlp,
+                profile,
+                ledger,
+                export_formats=formats,
+                archive=archive,
+            )
+            if container.is_complete():
+                _logger.info(f"{manifest_url} is already done")
+                continue
+            _logger.info(f"queueing {manifest_url}")
+            yield container
+
+    pipeline = Pipeline(
+        nlp,
+        ocr_processes=ocr_processes,
+        batch_size=batch_size,
+        nlp_processes=nlp_processes,
+        budget=MemoryBudget(memory_budget) if memory_budget else None,
+        formats=formats,
+        archive=archive,
+    )
+    return pipeline.run(containers(), out_dir)
+
+def enqueue_manifests(tasks, manifests, canvas_batch=None):
+    """Queues the manifests, or batches of canvas_batch of
+    their canvases; tasks already queued are left alone."""
+    queued = 0
+    for manifest_url in manifests:
+        if not canvas_batch:
+            queued += tasks.put({"manifest": manifest_url})
+            continue
+        count = len(Manifest(manifest_url).canvases)
+        for start in range(0, count, canvas_batch):
+            stop = min(start + canvas_batch, count)
+            queued += tasks.put({"manifest": manifest_url, "canvases": [start, stop]})
+    _logger.info(f"queued {queued} tasks in {tasks}")
+    return queued
+
+def analyze_manifests_queued(
+    manifests,
+    out_dir,
+    queue_dir,
+    canvas_batch=None,
+    lease=DEFAULT_LEASE,
+    attempts=DEFAULT_ATTEMPTS,
+    **options,
+):
+    """Queues the manifests in queue_dir, on a filesystem
+    shared by the workers, then works on the queue alongside
+    any other workers until it is empty."""
+    tasks = WorkQueue(queue_dir, lease_seconds=lease, max_attempts=attempts)
+    enqueue_manifests(tasks, manifests, canvas_batch)
+
+    def handle(task):
+        canvases = task.get("canvases")
+        analyze_manifest(task["manifest"], out_dir, canvases=canvases, **options)
+
+    handled = tasks.work(handle)
+    _logger.info(f"{tasks.worker} handled {handled} tasks: {tasks.counts()}")
+    return handled
+
+def analyze_manifests(manifest_list, out_dir, pipeline=False, queue=None, **options):
+    with open(manifest_list, 'r') as m:
+        manifests = [line.strip() for line in m if line.strip()]
+    if queue:
+        return analyze_manifests_queued(manifests, out_dir, queue, **options)
+    if pipeline:
+        # the pipeline streams pages whether asked to or not
+        options.pop("stream", None)
+        return analyze_manifests_pipelined(manifests, out_dir, **options)
+    for manifest_url in manifests:
+        _logger.info(f"processing {manifest_url}")
+        analyze_manifest(manifest_url, out_dir, **options)
+        _logger.info(f"done with {manifest_url}")
 
 # CLI
 
@@ -35,6 +166,131 @@ def parse_args(args):
     parser = argparse.ArgumentParser()
     parser.add_argument(dest="source_file")
     parser.add_argument(dest="out_dir")
+    parser.add_argument(
+        "--ocr-width",
+        type=int,
+        help="fetch grayscale IIIF derivatives of this width instead of TIFF masters",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="page image cache directory (default: $ADAM_IMAGE_CACHE)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        help="page image cache budget, e.g. 50G (default: $ADAM_IMAGE_CACHE_SIZE)",
+    )
+    doc_cache = parser.add_mutually_exclusive_group()
+    doc_cache.add_argument(
+        "--doc-cache-dir",
+        help="cache of analyzed page Docs (default: $ADAM_DOC_CACHE)",
+    )
+    doc_cache.add_argument(
+        "--no-doc-cache",
+        action="store_true",
+        help="analyze every page afresh, caching no Docs",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="use cached manifests only; never fetch them",
+    )
+    parser.add_argument(
+        "--ocr-processes",
+        type=int,
+        help="run OCR in a pool of this many processes before analysis",
+    )
+    parser.add_argument(
+        "--nlp-processes",
+        type=int,
+        default=1,
+        help="number of processes for batched NLP",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="number of pages per NLP batch",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=sorted(PROFILES),
+        default=DEFAULT_PROFILE,
+        help="NLP profile: full pipeline, fast (ner + senter) or ner only",
+    )
+    parser.add_argument(
+        "--gazetteer",
+        action="append",
+        default=[],
+        help="pattern file (.jsonl) or name list (.csv, .tsv) of known names; may be repeated",
+    )
+    parser.add_argument(
+        "--gazetteer-mode",
+        choices=["before", "instead"],
+        default="before",
+        help="run the gazetteer before statistical NER or instead of it",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="overlap download, OCR, NLP and export in a staged pipeline",
+    )
+    parser.add_argument(
+        "--formats",
+        default=",".join(FORMATS),
+        help=f"comma-separated export formats (default: {','.join(FORMATS)})",
+    )
+    parser.add_argument(
+        "--archive",
+        choices=ARCHIVES,
+        help="write each container's files into one archive instead of a directory",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="analyze and export each manifest a batch of pages at a time, "
+        "releasing pages once they are exported",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        help="with --stream, shrink batches to keep resident memory under this, e.g. 4G",
+    )
+    parser.add_argument(
+        "--queue",
+        help="shared work queue directory; workers on other machines running "
+        "with the same queue divide the manifests among them",
+    )
+    parser.add_argument(
+        "--canvas-batch",
+        type=int,
+        help="with --queue, queue batches of this many canvases instead of whole manifests",
+    )
+    parser.add_argument(
+        "--lease",
+        type=int,
+        default=DEFAULT_LEASE,
+        help="with --queue, seconds after which a silent worker's task is retried",
+    )
+    parser.add_argument(
+        "--attempts",
+        type=int,
+        default=DEFAULT_ATTEMPTS,
+        help="with --queue, how many times a task is tried before it is failed",
+    )
+    parser.add_argument(
+        "--ledger",
+        help=f"job ledger recording finished work (default: OUT_DIR/{DEFAULT_NAME}, "
+        "or one per host with --queue)",
+    )
+    parser.add_argument(
+        "--no-ledger",
+        action="store_true",
+        help="redo all the work, keeping no ledger",
+    )
+    parser.add_argument(
+        "--deterministic-ids",
+        action="store_true",
+        help="derive RDF ids from canvas, span and text so reruns produce the same ids",
+    )
     parser.add_argument(
         "-v",
         "--verbose",
@@ -52,7 +308,14 @@ def parse_args(args):
         const=logging.DEBUG,
     )
 
-    return parser.parse_args(args)
+    parsed = parser.parse_args(args)
+    if parsed.queue and parsed.pipeline:
+        parser.error("--pipeline cannot be combined with --queue")
+    if parsed.canvas_batch and parsed.archive:
+        # the workers given a manifest's batches would all
+        # write to the one archive at once
+        parser.error("--archive cannot be combined with --canvas-batch")
+    return parsed
 
 def setup_logging(loglevel):
     """Setup basic logging
@@ -69,7 +332,52 @@ def setup_logging(loglevel):
 def main(args):
     args = parse_args(args)
     setup_logging(args.loglevel)
-    analyze_manifests(args.source_file, args.out_dir)
+    if args.ocr_width:
+        Canvas.image_profile = ImageProfile.ocr(args.ocr_width)
+    if args.cache_dir or args.cache_size:
+        Canvas.use_image_cache(args.cache_dir, args.cache_size)
+    if args.no_doc_cache:
+        Page.use_doc_cache(None)
+    elif args.doc_cache_dir:
+        Page.use_doc_cache(args.doc_cache_dir)
+    if args.offline:
+        Manifest.use_manifest_cache(offline=True)
+    if args.deterministic_ids:
+        Graphable.deterministic_ids = True
+    ledger = None
+    queue_options = {}
+    if not args.no_ledger:
+        ledger_path = args.ledger or Path(args.out_dir) / DEFAULT_NAME
+        if args.queue and not args.ledger:
+            # SQLite cannot be shared safely over NFS
+            ledger_path = ledger_path.with_stem(f"ledger-{socket.gethostname()}")
+        ledger = Ledger(ledger_path)
+    if args.queue:
+        queue_options = {
+            "queue": args.queue,
+            "canvas_batch": args.canvas_batch,
+            "lease": args.lease,
+            "attempts": args.attempts,
+        }
+    analyze_manifests(
+        args.source_file,
+        args.out_dir,
+        ocr_processes=args.ocr_processes,
+        nlp_processes=args.nlp_processes,
+        batch_size=args.batch_size,
+        profile=args.profile,
+        gazetteer=args.gazetteer,
+        gazetteer_mode=args.gazetteer_mode,
+        ledger=ledger,
+        pipeline=args.pipeline,
+        formats=args.formats.split(","),
+        archive=args.archive,
+        stream=args.stream,
+        memory_budget=args.memory_budget,
+        **queue_options,
+    )
+    _logger.info(f"image cache: {Canvas.image_cache.stats}")
+    _logger.info(f"peak RSS: {format_size(peak_rss())}")
     _logger.info("Script ends here")
 
 
@@ -1,5 +1,9 @@
 """
 The Collection class.
+
+A collection's containers may be iterated one at a
+time, without keeping them, so that a whole collection
+can be analyzed and exported in bounded memory.
 """
 import json
 import urllib.request
@@ -7,6 +11,11 @@ import logging
 import spacy
 from adam.graphable import Graphable
 from adam.container import Container
+from adam.manifest import Manifest
+from adam.nlp import DEFAULT_BATCH_SIZE, load_model, process_pages
+from adam.ocr import ocr_canvases
+from adam.rdf_stream import TripleWriter
+from rdflib import URIRef
 
 
 class Collection(Graphable):
@@ -27,7 +36,7 @@ class Collection(Graphable):
     def nlp(self):
         """Returns a spaCy pipeline, creating it if it does not exist"""
         if not self._nlp:
-            self._nlp = spacy.load("en_core_web_lg")
+            self._nlp = load_model("en_core_web_lg")
         return self._nlp
 
     @property
@@ -37,18 +46,60 @@ class Collection(Graphable):
         creating them if necessary.
         """
         if not self._containers:
-            self._containers = []
             print("generating containers")
-            for manifest in self.manifest['manifests']:
-                manifest_url = manifest['@id']
-                self._containers.append(Container(manifest_url, self.nlp))
+            self._containers = list(self.iter_containers())
         return self._containers
 
-    def build_graph(self):
-        """
-        Constructs graph from all the containers.
-        """
-        graph = self.graph
+    def iter_containers(self):
+        """Yields the Containers in the collection, creating
+        each as it is needed and keeping none of them (unless
+        they have been created already)."""
+        if self._containers:
+            yield from self._containers
+            return
+        for manifest in self.manifest['manifests']:
+            manifest_url = manifest['@id']
+            yield Container(Manifest(manifest_url), self.nlp)
+
+    def ocr(self, processes=None, thread_limit=1):
+        """Runs OCR on the uncached canvases of all the
+        containers in a single process pool."""
+        canvases = [
+            canvas
+            for container in self.containers
+            for canvas in container._manifest.canvases
+        ]
+        return ocr_canvases(canvases, processes, thread_limit)
+
+    def process_nlp(self, batch_size=DEFAULT_BATCH_SIZE, n_process=1):
+        """Streams the pages of all the containers through
+        the pipeline in one batched run."""
+        pages = [
+            page
+            for container in self.containers
+            for page in container.pages
+            if page._doc is None
+        ]
+        return process_pages(pages, self.nlp, batch_size, n_process)
+
+    def triples(self):
         for container in self.containers:
-            container.build_graph()
-            graph += container.graph
+            yield from container.triples()
+
+    def export_triples(self, path):
+        """Streams the triples of every container to path,
+        an .nt or .nq file (optionally .gz)."""
+        with TripleWriter(path) as writer:
+            for container in self.iter_containers():
+                for page in container.pages:
+                    writer.write_all(page.triples(), URIRef(page._canvas.id))
+                    page.release()
+        return writer.count
+
+    def dump_streaming(
+        self, target_dir_name, batch_size=DEFAULT_BATCH_SIZE, n_process=1, budget=None
+    ):
+        """Analyzes and exports the containers one at a time,
+        streaming the pages of each."""
+        for container in self.iter_containers():
+            container.dump_streaming(target_dir_name, batch_size, n_process, budget)
@@ -3,16 +3,34 @@
 The Container class contains pages: it
 is at one level a collection class for Page
 objects
+
+A Container given a Ledger records the stages it
+completes for each page, and skips the pages whose
+exports the ledger shows were done with the same inputs.
+
+A Container may be limited to a range of its manifest's
+canvases, so that a large manifest can be divided among
+workers.
 """
 import re
+import time
+from contextlib import nullcontext
+from functools import partial
 from pathlib import Path
-import logging
-import urllib.request
-import json
-import spacy
+from adam.exporter import FORMATS, Exporter
 from adam.page import Page
 from adam.graphable import Graphable
-from adam.manifest import Manifest
+from adam.ledger import input_hash
+from adam.manifest import Canvas
+from adam.nlp import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_PROFILE,
+    load_model,
+    process_pages,
+)
+from adam.ocr import ocr_canvases
+from adam.rdf_stream import TripleWriter
+from rdflib import URIRef
 
 
 class Container(Graphable):
@@ -20,10 +38,24 @@ class Container(Graphable):
     The Container Class
     """
 
-    def __init__(self, manifest_object, nlp=None):
+    def __init__(
+        self,
+        manifest_object,
+        nlp=None,
+        profile=DEFAULT_PROFILE,
+        ledger=None,
+        canvases=None,
+        export_formats=FORMATS,
+        archive=None,
+    ):
         super().__init__()
         self._manifest = manifest_object
         self._nlp = nlp
+        self.profile = profile
+        self.ledger = ledger
+        self.canvases = canvases
+        self.export_formats = export_formats
+        self.archive = archive
         self._pages = None
 
     @property
@@ -62,18 +94,229 @@ class Container(Graphable):
 
         return re.sub(r"[,. ]", "_", string_label)
 
+    @property
+    def inputs(self) -> str:
+        """A hash of the settings that the pages' analysis
+        and exports depend on, including the pipeline,
+        which is loaded if need be."""
+        if self._nlp is None:
+            self.nlp = load_model(profile=self.profile)
+        meta = self._nlp.meta
+        model = [meta.get(key) for key in ("lang", "name", "version", "adam_gazetteer")]
+        model.append(self._nlp.pipe_names)
+        thresholds = sorted({page.confidence_threshold for page in self.pages})
+        return input_hash(
+            model, thresholds, Canvas.image_profile.key, Graphable.deterministic_ids
+        )
+
+    @property
+    def export_inputs(self) -> str:
+        """The inputs, together with the export formats and
+        archive type."""
+        return input_hash(self.inputs, sorted(self.export_formats), self.archive)
+
+    @property
+    def image_inputs(self) -> str:
+        """A hash of the settings that downloads and OCR
+        depend on."""
+        return input_hash(Canvas.image_profile.key)
+
+    def pending_pages(self, stage="export"):
+        """The pages for which the ledger does not show stage
+        done with the current inputs (all pages, without a
+        ledger)."""
+        if self.ledger is None:
+            return self.pages
+        inputs = self.export_inputs if stage == "export" else self.inputs
+        done = self.ledger.done(self._manifest.uri, stage, inputs)
+        return [page for page in self.pages if page._canvas.id not in done]
+
+    def is_complete(self) -> bool:
+        if self.canvases is not None:
+            return self.ledger is not None and not self.pending_pages()
+        return self.ledger is not None and self.ledger.is_done(
+            self._manifest.uri, "export", "", self.export_inputs
+        )
+
+    def stage(self, stage, page=None):
+        """Times the enclosed work on stage, for page or for
+        the whole container, and records it in the ledger (if
+        there is one) under the manifest's @id."""
+        if self.ledger is None:
+            return nullcontext()
+        canvas = "" if page is None else page._canvas.id
+        return self.ledger.stage(self._manifest.uri, stage, canvas, self.inputs)
+
+    def is_done(self, stage) -> bool:
+        """Whether the ledger shows stage done for the whole
+        container with the current inputs."""
+        return self.ledger is not None and self.ledger.is_done(
+            self._manifest.uri, stage, "", self.inputs
+        )
+
+    def ocr(self, processes=None, thread_limit=1):
+        """Runs OCR on all uncached canvases in parallel, so
+        that the pages' text is ready before NLP."""
+        canvases = [page._canvas for page in self.pending_pages()]
+        timings = ocr_canvases(canvases, processes, thread_limit)
+        if self.ledger is not None:
+            inputs = self.image_inputs
+            uri = self._manifest.uri
+            self.ledger.record_many(
+                [(uri, "download", canvas, inputs, t[0]) for canvas, t in timings.items()]
+                + [(uri, "ocr", canvas, inputs, t[1]) for canvas, t in timings.items()]
+            )
+        return timings
+
+    def process_nlp(self, batch_size=DEFAULT_BATCH_SIZE, n_process=1):
+        """Runs NLP over all the pages that have not been
+        analyzed in batches, rather than page by page."""
+        pages = [page for page in self.pending_pages() if page._doc is None]
+        return self._analyze(pages, batch_size, n_process)
+
+    def _analyze(self, pages, batch_size, n_process):
+        if self._nlp is None:
+            self.nlp = load_model(profile=self.profile)
+        start = time.perf_counter()
+        process_pages(pages, self._nlp, batch_size, n_process)
+        if pages:
+            seconds = (time.perf_counter() - start) / len(pages)
+            self.record_pages("nlp", pages, seconds)
+        return pages
+
+    def record_pages(self, stage, pages, seconds=None):
+        """Records stage (download, ocr or nlp) done for pages,
+        taking seconds each, in the ledger, if there is one."""
+        if self.ledger is None or not pages:
+            return
+        inputs = self.inputs if stage == "nlp" else self.image_inputs
+        uri = self._manifest.uri
+        self.ledger.record_many(
+            [(uri, stage, page._canvas.id, inputs, seconds) for page in pages]
+        )
+
+    def iter_pages(self, batch_size=DEFAULT_BATCH_SIZE, n_process=1, budget=None):
+        """Yields the pending pages, analyzed a batch at a
+        time.  Each page is released once the next is asked
+        for, so only a batch of pages holds its OCR data, Doc
+        and graph at once (the released Page objects remain
+        in pages); a MemoryBudget, if given, is checked after
+        each batch and shrinks the next when memory runs
+        short."""
+        pending = self.pending_pages()
+        start = 0
+        while start < len(pending):
+            batch = pending[start : start + batch_size]
+            start += len(batch)
+            unanalyzed = [page for page in batch if page._doc is None]
+            self._analyze(unanalyzed, batch_size, n_process)
+            for page in batch:
+                yield page
+                page.release()
+            if budget is not None:
+                batch_size = budget.batch_size(batch_size)
+
     def generate_pages(self):
-        self._pages = [Page(canvas) for canvas in self._manifest.canvases]
+        canvases = self._manifest.canvases
+        if self.canvases is not None:
+            canvases = canvases[slice(*self.canvases)]
+        self._pages = [
+            Page(canvas, nlp=self._nlp, profile=self.profile) for canvas in canvases
+        ]
+
+    def triples(self):
+        for page in self.pages:
+            yield from page.triples()
 
-    def dump(self, target_dir_name):
+    def export_triples(self, path):
+        """Streams the triples of every page to path, an .nt
+        or .nq file (optionally .gz); in N-Quads each page's
+        triples are in a graph named by its canvas.  Each
+        page is released once written."""
+        with TripleWriter(path) as writer:
+            for page in self.pages:
+                writer.write_all(page.triples(), URIRef(page._canvas.id))
+                page.release()
+        return writer.count
+
+    def exporter(self) -> Exporter:
+        return Exporter(self.export_formats, self.archive)
+
+    def dump(self, target_dir_name, exporter=None):
         """
-        Serializes the container in all formats:
-        plain text, hocr, alto, and rdf
+        Serializes the container in the selected formats
+        (by default plain text, csv, jsonl and rdf), each
+        page's artifacts computed once and written in the
+        background
         """
         base_dir = Path(target_dir_name) / Path(self.id)
-        base_dir.mkdir(parents=True, exist_ok=True)
-        for page in self.pages:
-            page.export_as_txt(base_dir)
-            page.export_as_csv(base_dir)
-            page.export_as_jsonl(base_dir)
-            page.export_as_rdf(base_dir)
+        own_exporter = exporter is None
+        exporter = exporter or self.exporter()
+        inputs = self.export_inputs if self.ledger is not None else None
+        try:
+            for page in self.pending_pages():
+                self.export_page(page, base_dir, inputs, exporter)
+        finally:
+            if own_exporter:
+                exporter.close()
+        self.finish_export(base_dir, exporter)
+
+    def dump_streaming(
+        self,
+        target_dir_name,
+        batch_size=DEFAULT_BATCH_SIZE,
+        n_process=1,
+        budget=None,
+        exporter=None,
+    ):
+        """
+        Analyzes and serializes the pending pages a batch at
+        a time, releasing each page once it is exported
+        """
+        base_dir = Path(target_dir_name) / Path(self.id)
+        own_exporter = exporter is None
+        exporter = exporter or self.exporter()
+        inputs = self.export_inputs if self.ledger is not None else None
+        try:
+            for page in self.iter_pages(batch_size, n_process, budget):
+                self.export_page(page, base_dir, inputs, exporter)
+        finally:
+            if own_exporter:
+                exporter.close()
+        self.finish_export(base_dir, exporter)
+
+    def export_page(self, page, base_dir, inputs=None, exporter=None):
+        """Exports a page, recording each format in the
+        ledger, if there is one, once it has been written.
+        Without an exporter, the page is written at once."""
+        record = None
+        if self.ledger is not None:
+            record = partial(
+                self._record_export, page._canvas.id, inputs or self.export_inputs
+            )
+        if exporter is not None:
+            return exporter.export(page, base_dir, record)
+        exporter = self.exporter()
+        try:
+            return exporter.export(page, base_dir, record)
+        finally:
+            exporter.close()
+
+    def _record_export(self, canvas, inputs, formats, seconds):
+        uri = self._manifest.uri
+        share = seconds / len(formats)
+        self.ledger.record_many(
+            [(uri, f"export:{fmt}", canvas, inputs, share) for fmt in formats]
+            + [(uri, "export", canvas, inputs, seconds)]
+        )
+
+    def finish_export(self, base_dir=None, exporter=None):
+        """Waits for the container's pages to be written and
+        records the container as exported once all of them
+        are (which a range of them cannot show)."""
+        if exporter is not None and base_dir is not None:
+            exporter.finish(base_dir)
+        if self.canvases is not None:
+            return
+        if self.ledger is not None and not self.pending_pages():
+            self.ledger.record(self._manifest.uri, "export", "", self.export_inputs)
@@ -9,6 +9,8 @@ import sys
 from pathlib import Path
 from adam.manifest import Manifest
 from adam.container import Container
+from adam.graphable import Graphable
+from adam.ledger import DEFAULT_NAME, Ledger
 from rdflib import container
 
 _logger = logging.getLogger(__name__)
@@ -19,6 +21,36 @@ def parse_args(args):
     parser = argparse.ArgumentParser(description="Produce a graph from a manifest")
     parser.add_argument("url", help="URL of the manifest")
     parser.add_argument("outdir", help="output directory")
+    parser.add_argument(
+        "--format",
+        choices=["ttl", "nt", "nq"],
+        default="ttl",
+        help="a Turtle file per page, or one streamed N-Triples/N-Quads file",
+    )
+    parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help="compress N-Triples/N-Quads output",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="use cached manifests only; never fetch them",
+    )
+    parser.add_argument(
+        "--ledger",
+        help=f"job ledger recording finished work (default: OUTDIR/{DEFAULT_NAME})",
+    )
+    parser.add_argument(
+        "--no-ledger",
+        action="store_true",
+        help="redo all the work, keeping no ledger",
+    )
+    parser.add_argument(
+        "--deterministic-ids",
+        action="store_true",
+        help="derive RDF ids from canvas, span and text so reruns produce the same ids",
+    )
     parser.add_argument(
         "-v",
         "--verbose",
@@ -51,11 +83,31 @@ def setup_logging(log_level):
 def main(args):
     args = parse_args(args)
     setup_logging(args.loglevel)
-    container = Container(Manifest(args.url))
+    if args.offline:
+        Manifest.use_manifest_cache(offline=True)
+    if args.deterministic_ids:
+        Graphable.deterministic_ids = True
     outdir = Path(args.outdir)
     outdir.mkdir(parents=True, exist_ok=True)
-    for page in container.pages:
-        page.export_as_rdf(outdir)
+    ledger = None
+    if not args.no_ledger:
+        ledger = Ledger(args.ledger or outdir / DEFAULT_NAME)
+    container = Container(Manifest(args.url), ledger=ledger)
+    if args.format == "ttl":
+        for page in container.pending_pages("rdf"):
+            with container.stage("rdf", page):
+                page.export_as_rdf(outdir)
+    else:
+        path = outdir / f"{container.id}.{args.format}"
+        if args.gzip:
+            path = path.with_name(f"{path.name}.gz")
+        stage = f"rdf:{args.format}"
+        if container.is_done(stage):
+            _logger.info(f"{path} is already done")
+            return
+        with container.stage(stage):
+            count = container.export_triples(path)
+        _logger.info(f"wrote {count} statements to {path}")
 
 
 def run():
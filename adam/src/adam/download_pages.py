@@ -2,7 +2,9 @@ import argparse
 import logging
 import sys
 from pathlib import Path
-from adam.container import Container
+from adam.manifest import Manifest, Canvas, ImageProfile
+from adam.downloader import Downloader, DEFAULT_WORKERS, DEFAULT_PER_HOST
+from adam.ledger import DEFAULT_NAME, Ledger, input_hash
 
 _logger = logging.getLogger(__name__)
 
@@ -15,9 +17,51 @@ _default_output_dir.mkdir(parents=True, exist_ok=True)
 # `from foo.skeleton import fib`,
 # when using this Python module as a library.
 
-def download_pages(manifest_url, out_dir=_default_output_dir):
-    container = Container(manifest_url)
-    container.download_pages()
+def download_pages(
+    manifest_url,
+    out_dir=_default_output_dir,
+    workers=DEFAULT_WORKERS,
+    per_host=DEFAULT_PER_HOST,
+    cache_size=None,
+    ledger=None,
+):
+    download_manifests([manifest_url], out_dir, workers, per_host, cache_size, ledger)
+
+
+def download_manifests(
+    manifest_urls,
+    out_dir=_default_output_dir,
+    workers=DEFAULT_WORKERS,
+    per_host=DEFAULT_PER_HOST,
+    cache_size=None,
+    ledger=None,
+):
+    Canvas.use_image_cache(out_dir, cache_size)
+    inputs = input_hash(Canvas.image_profile.key)
+    manifests = [Manifest(url) for url in manifest_urls]
+    if ledger is not None:
+        # keyed by @id, as the other stages are, not by the
+        # URL the manifest was fetched from
+        manifests = [
+            manifest
+            for manifest in manifests
+            if not ledger.is_done(manifest.uri, "download", "", inputs)
+        ]
+    downloader = Downloader(workers=workers, per_host=per_host)
+    try:
+        downloader.download_manifests(manifests)
+    finally:
+        downloader.close()
+    if ledger is not None:
+        for manifest in manifests:
+            failed = [c for c in manifest.canvases if c.id in downloader.failures]
+            if not failed:
+                ledger.record(manifest.uri, "download", "", inputs)
+
+
+def read_manifest_list(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return [line.strip() for line in file if line.strip()]
 
 
 # CLI
@@ -25,6 +69,44 @@ def parse_args(args):
     parser = argparse.ArgumentParser()
     parser.add_argument("manifest_url", help="url of manifest")
     parser.add_argument("out_dir", help="path to image directory")
+    parser.add_argument(
+        "--cache-size",
+        help="page image cache budget, e.g. 50G (default: $ADAM_IMAGE_CACHE_SIZE)",
+    )
+    parser.add_argument(
+        "-l",
+        "--list",
+        dest="is_list",
+        help="treat manifest_url as a file listing manifest urls",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--ocr-width",
+        type=int,
+        help="fetch grayscale IIIF derivatives of this width instead of TIFF masters",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="number of concurrent downloads",
+    )
+    parser.add_argument(
+        "--per-host",
+        type=int,
+        default=DEFAULT_PER_HOST,
+        help="maximum number of connections to any one host",
+    )
+    parser.add_argument(
+        "--ledger",
+        help=f"job ledger recording finished work (default: OUT_DIR/{DEFAULT_NAME})",
+    )
+    parser.add_argument(
+        "--no-ledger",
+        action="store_true",
+        help="redo all the work, keeping no ledger",
+    )
     parser.add_argument(
         "-v",
         "--verbose",
@@ -59,7 +141,24 @@ def setup_logging(loglevel):
 def main(args):
     args = parse_args(args)
     setup_logging(args.loglevel)
-    download_pages(args.manifest_url, args.out_dir)
+    if args.ocr_width:
+        Canvas.image_profile = ImageProfile.ocr(args.ocr_width)
+    if args.is_list:
+        manifest_urls = read_manifest_list(args.manifest_url)
+    else:
+        manifest_urls = [args.manifest_url]
+    ledger = None
+    if not args.no_ledger:
+        ledger = Ledger(args.ledger or Path(args.out_dir) / DEFAULT_NAME)
+    download_manifests(
+        manifest_urls,
+        args.out_dir,
+        args.workers,
+        args.per_host,
+        args.cache_size,
+        ledger,
+    )
+    _logger.info(f"image cache: {Canvas.image_cache.stats}")
     _logger.info("Script ends here")
 
 
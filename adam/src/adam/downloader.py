@@ -0,0 +1,247 @@
+"""The adam Downloader module
+
+A bounded-concurrency download engine for page images.
+Requests are issued from a thread pool over one pooled
+requests.Session per host, and a per-host semaphore caps
+the number of connections open to any one server.
+
+Each image is streamed into a ``.part`` file beside its
+target, resumed with an HTTP Range request if the connection
+drops, checked against its expected length (and checksum,
+when one is known) and only then renamed into place, so a
+file in the cache is always complete.  Failed requests are
+retried with exponential backoff and jitter.
+
+  Typical usage:
+
+  downloader = Downloader(workers=8, per_host=4)
+  downloader.download_manifests(manifests)
+"""
+import hashlib
+import logging
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+DEFAULT_PER_HOST = 4
+DEFAULT_RETRIES = 5
+
+CHUNK_SIZE = 64 * 1024
+
+content_range_pattern = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+
+class DownloadError(Exception):
+    """Raised when a download cannot be completed."""
+
+
+class IncompleteDownload(DownloadError):
+    """Raised when a response ends before the expected length."""
+
+
+class Downloader:
+    """The Downloader class"""
+
+    def __init__(
+        self,
+        workers=DEFAULT_WORKERS,
+        per_host=DEFAULT_PER_HOST,
+        retries=DEFAULT_RETRIES,
+        backoff=0.5,
+        max_backoff=60.0,
+        timeout=60,
+    ):
+        self.workers = workers
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.failures = {}
+        self._sessions = {}
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host(url) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def session(self, url) -> requests.Session:
+        """Returns the pooled session for the host of url."""
+        host = self.host(url)
+        with self._lock:
+            if host not in self._sessions:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1, pool_maxsize=self.per_host, pool_block=True
+                )
+                session.mount(host, adapter)
+                self._sessions[host] = session
+            return self._sessions[host]
+
+    @contextmanager
+    def slot(self, url):
+        """Holds one of the per-host connection slots for url."""
+        host = self.host(url)
+        with self._lock:
+            if host not in self._slots:
+                self._slots[host] = threading.BoundedSemaphore(self.per_host)
+            semaphore = self._slots[host]
+        with semaphore:
+            yield
+
+    def backoff_delay(self, attempt) -> float:
+        """Returns a delay drawn from an exponentially growing,
+        capped window ("full jitter")."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    @staticmethod
+    def is_retryable(error) -> bool:
+        """Client errors other than timeouts and throttling are permanent."""
+        if isinstance(error, requests.exceptions.HTTPError):
+            status = error.response.status_code
+            return status >= 500 or status in (408, 429)
+        return True
+
+    def fetch(self, url, path: Path, checksum=None):
+        """Downloads url to path, resuming and retrying as needed.
+
+        checksum, if given, is the expected sha256 hex digest
+        of the file.  Raises DownloadError if the download has
+        not succeeded after all the retries.
+        """
+        part = path.with_name(path.name + ".part")
+        for attempt in range(self.retries + 1):
+            try:
+                with self.slot(url):
+                    self._fetch_part(url, part)
+                if checksum is not None:
+                    self._verify_checksum(part, checksum)
+                os.replace(part, path)
+                return path
+            except (requests.exceptions.RequestException, DownloadError) as e:
+                if attempt == self.retries or not self.is_retryable(e):
+                    raise DownloadError(f"{url}: {e}") from e
+                delay = self.backoff_delay(attempt)
+                log.warning(
+                    f"attempt {attempt + 1} to download {url} failed ({e}); "
+                    f"retrying in {delay:.1f}s"
+                )
+                time.sleep(delay)
+
+    def _fetch_part(self, url, part: Path):
+        """Streams url into part, resuming from its current size."""
+        offset = part.stat().st_size if part.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        log.debug(f"downloading {url} to {part} from byte {offset}")
+        response = self.session(url).get(
+            url, stream=True, headers=headers, timeout=self.timeout
+        )
+        try:
+            if response.status_code == 416:
+                # The partial file is no good for this resource; start over.
+                part.unlink()
+                raise DownloadError(f"range {offset}- not satisfiable")
+            response.raise_for_status()
+
+            if response.status_code == 206:
+                match = content_range_pattern.match(
+                    response.headers.get("Content-Range", "")
+                )
+                if not match or int(match.group(1)) != offset:
+                    part.unlink()
+                    raise DownloadError("unexpected Content-Range")
+                mode = "ab"
+                expected = None if match.group(3) == "*" else int(match.group(3))
+            else:
+                mode = "wb"
+                expected = self._content_length(response)
+
+            with part.open(mode) as part_file:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    part_file.write(chunk)
+        finally:
+            response.close()
+
+        size = part.stat().st_size
+        if expected is not None and size != expected:
+            if size > expected:
+                part.unlink()
+            raise IncompleteDownload(f"received {size} of {expected} bytes")
+
+    @staticmethod
+    def _content_length(response):
+        if "Content-Encoding" in response.headers:
+            # iter_content decodes the body, so the lengths differ.
+            return None
+        length = response.headers.get("Content-Length")
+        return int(length) if length is not None else None
+
+    @staticmethod
+    def _verify_checksum(part: Path, checksum):
+        digest = hashlib.sha256()
+        with part.open("rb") as part_file:
+            for chunk in iter(lambda: part_file.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        if digest.hexdigest() != checksum:
+            part.unlink()
+            raise DownloadError("checksum mismatch")
+
+    def download_canvases(self, canvases):
+        """Downloads the images of canvases concurrently.
+
+        Returns the list of image paths, in the order
+        the downloads completed.  Canvases whose images
+        could not be downloaded are logged and recorded
+        in self.failures rather than stopping the batch.
+        """
+        paths = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                executor.submit(canvas.download_image, self): canvas
+                for canvas in canvases
+            }
+            for future in as_completed(futures):
+                try:
+                    paths.append(future.result())
+                except DownloadError as e:
+                    canvas = futures[future]
+                    log.error(f"could not download {canvas}: {e}")
+                    self.failures[canvas.id] = e
+        return paths
+
+    def download_manifests(self, manifests):
+        """Downloads the images of every canvas in a list of
+        manifests through a single pool."""
+        canvases = [canvas for manifest in manifests for canvas in manifest.canvases]
+        log.info(f"downloading {len(canvases)} images from {len(manifests)} manifests")
+        return self.download_canvases(canvases)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+
+_default_downloader = None
+
+
+def default_downloader() -> Downloader:
+    """Returns the process-wide downloader, creating it if necessary."""
+    global _default_downloader
+    if _default_downloader is None:
+        _default_downloader = Downloader()
+    return _default_downloader
@@ -0,0 +1,194 @@
+"""The adam Exporter module
+
+Writes pages in any of the export formats:
+
+  txt    the page's text
+  csv    the OCR data frame
+  jsonl  the page's sentences
+  rdf    the page's graph, as Turtle
+
+Each selected artifact is computed once, in the calling
+thread, and handed to a pool of writer threads, so that
+the next page can be analyzed while this one is written.
+The files of a container go either into a directory, one
+file per page and format, or (with archive set to zip or
+tar) into a single archive per container, which saves
+the creation of thousands of small files on a network
+filesystem.  Writes that fail are logged as they happen
+and raised as an ExportError once the exporter is
+finished with the container, or closed.
+
+  Typical usage:
+
+  exporter = Exporter(formats=("txt", "rdf"), archive="zip")
+  for page in container.pages:
+      exporter.export(page, out_dir / container.id)
+  exporter.close()
+"""
+import io
+import json
+import logging
+import tarfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+FORMATS = ("txt", "csv", "jsonl", "rdf")
+SUFFIXES = {"txt": ".txt", "csv": ".csv", "jsonl": ".jsonl", "rdf": ".ttl"}
+ARCHIVES = ("zip", "tar")
+
+DEFAULT_WRITERS = 4
+
+
+class ExportError(Exception):
+    """Raised when pages could not be written."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        files = sum(len(names) for _, names, _ in errors)
+        super().__init__(f"{files} files could not be written; first: {errors[0][2]}")
+
+
+def page_artifacts(page, formats=FORMATS) -> dict:
+    """Returns the bytes of a page in each of formats."""
+    artifacts = {}
+    for fmt in formats:
+        if fmt == "txt":
+            data = page.text
+        elif fmt == "csv":
+            data = page._canvas.ocr_data.to_csv()
+        elif fmt == "jsonl":
+            data = "".join(
+                json.dumps({"text": s.text, "meta": page.metadata}, ensure_ascii=False)
+                + "\n"
+                for s in page.sentences
+            )
+        elif fmt == "rdf":
+            data = page.graph.serialize(format="turtle")
+        else:
+            raise ValueError(f"unknown export format {fmt}")
+        artifacts[fmt] = data.encode("utf-8")
+    return artifacts
+
+
+class Archive:
+    """A zip or tar file that members are added to one at a
+    time.  An existing archive is appended to; when a page
+    is exported again its newer members come later, and are
+    the ones extracted."""
+
+    def __init__(self, path, kind):
+        self.path = Path(path)
+        self.kind = kind
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        if kind == "zip":
+            self._file = zipfile.ZipFile(self.path, "a", zipfile.ZIP_DEFLATED)
+        else:
+            self._file = tarfile.open(self.path, "a")
+
+    def add(self, name, data):
+        with self._lock:
+            if self.kind == "zip":
+                self._file.writestr(name, data)
+            else:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = time.time()
+                self._file.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        self._file.close()
+
+
+class Exporter:
+    """Exports pages in the selected formats through a pool
+    of writer threads."""
+
+    def __init__(self, formats=FORMATS, archive=None, writers=DEFAULT_WRITERS):
+        unknown = set(formats) - set(FORMATS)
+        if unknown:
+            raise ValueError(f"unknown export formats {sorted(unknown)}")
+        if archive is not None and archive not in ARCHIVES:
+            raise ValueError(f"unknown archive type {archive}")
+        self.formats = tuple(fmt for fmt in FORMATS if fmt in formats)
+        self.archive = archive
+        self.errors = []
+        self._pool = ThreadPoolExecutor(max_workers=writers, thread_name_prefix="export")
+        self._archives = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def archive_path(self, base_dir) -> Path:
+        return Path(base_dir).with_suffix(f".{self.archive}")
+
+    def archive_for(self, base_dir) -> Archive:
+        path = self.archive_path(base_dir)
+        with self._lock:
+            if path not in self._archives:
+                self._archives[path] = Archive(path, self.archive)
+            return self._archives[path]
+
+    def export(self, page, base_dir, done=None):
+        """Computes the page's artifacts and queues them to be
+        written to base_dir (or to its archive); done, if
+        given, is called with the formats and the seconds
+        taken once they have all been written."""
+        start = time.perf_counter()
+        artifacts = page_artifacts(page, self.formats)
+        names = {fmt: f"{page.id}{SUFFIXES[fmt]}" for fmt in artifacts}
+        computed = time.perf_counter() - start
+        future = self._pool.submit(self._write, base_dir, names, artifacts, computed, done)
+        with self._lock:
+            self._pending.setdefault(Path(base_dir), []).append(future)
+        return future
+
+    def _write(self, base_dir, names, artifacts, computed, done):
+        start = time.perf_counter()
+        try:
+            if self.archive is None:
+                base_dir = Path(base_dir)
+                base_dir.mkdir(parents=True, exist_ok=True)
+                for fmt, data in artifacts.items():
+                    (base_dir / names[fmt]).write_bytes(data)
+            else:
+                archive = self.archive_for(base_dir)
+                for fmt, data in artifacts.items():
+                    archive.add(names[fmt], data)
+        except Exception as e:
+            log.error(f"could not write {list(names.values())} to {base_dir}: {e}")
+            self.errors.append((base_dir, names, e))
+            return
+        if done is not None:
+            done(tuple(artifacts), computed + time.perf_counter() - start)
+
+    def finish(self, base_dir):
+        """Waits for the writes to base_dir and closes its
+        archive, if it has one; raises an ExportError if any
+        of them failed."""
+        with self._lock:
+            futures = self._pending.pop(Path(base_dir), [])
+        wait(futures)
+        if self.archive is not None:
+            with self._lock:
+                archive = self._archives.pop(self.archive_path(base_dir), None)
+            if archive is not None:
+                archive.close()
+        errors = [error for error in self.errors if Path(error[0]) == Path(base_dir)]
+        if errors:
+            raise ExportError(errors)
+
+    def close(self):
+        """Waits for all the writes and closes the archives;
+        raises an ExportError if any write failed."""
+        self._pool.shutdown(wait=True)
+        for archive in self._archives.values():
+            archive.close()
+        self._archives = {}
+        self._pending = {}
+        if self.errors:
+            raise ExportError(self.errors)
@@ -0,0 +1,174 @@
+"""The adam Gazetteer module
+
+Recognizes known names by lookup rather than by model.
+Names are read from spaCy pattern files (such as
+training/training_patterns.jsonl) and from name lists
+(CSV or TSV files with an "appellation" column, as
+exported from OpenRefine or used by nel), and compiled
+into a PhraseMatcher over lowercased tokens.  The
+matcher runs as a pipeline component either before the
+statistical NER, which then works around the names it
+has found, or instead of it.
+
+Compiling tens of thousands of names means tokenizing
+each of them, so the tokenized names are cached with
+DocBin, keyed by the contents of the sources and the
+tokenizer that produced them.
+
+  Typical usage:
+
+  add_gazetteer(nlp, ["training/training_patterns.jsonl", "names.csv"])
+"""
+import csv
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import spacy
+from spacy.language import Language
+from spacy.matcher import PhraseMatcher
+from spacy.tokens import DocBin, Span
+from spacy.util import filter_spans
+from adam.global_vars import GAZETTEER_CACHE
+
+log = logging.getLogger(__name__)
+
+DEFAULT_LABEL = "PERSON"
+MODES = ("before", "instead")
+TOKEN_KEYS = ("LOWER", "ORTH", "TEXT")
+
+
+class Gazetteer:
+    """The Gazetteer pipeline component"""
+
+    def __init__(self, vocab, name="adam_gazetteer"):
+        self.name = name
+        self.matcher = PhraseMatcher(vocab, attr="LOWER")
+        self.size = 0
+
+    def add_phrases(self, label, docs):
+        docs = list(docs)
+        self.matcher.add(label, docs)
+        self.size += len(docs)
+
+    def __call__(self, doc):
+        spans = [
+            Span(doc, start, end, label=match_id)
+            for match_id, start, end in self.matcher(doc)
+        ]
+        if spans:
+            doc.ents = filter_spans(list(doc.ents) + spans)
+        return doc
+
+
+@Language.factory("adam_gazetteer")
+def make_gazetteer(nlp, name):
+    return Gazetteer(nlp.vocab, name)
+
+
+def _pattern_phrase(pattern):
+    """Returns the phrase a spaCy pattern matches, if it is
+    a plain string or a sequence of literal tokens."""
+    if isinstance(pattern, str):
+        return pattern
+    words = []
+    for token in pattern:
+        keys = {key.upper(): value for key, value in token.items()}
+        literal = [keys[k] for k in TOKEN_KEYS if k in keys]
+        if len(keys) != 1 or not literal or not isinstance(literal[0], str):
+            return None
+        words.append(literal[0])
+    return " ".join(words)
+
+
+def read_source(path, label=DEFAULT_LABEL) -> dict:
+    """Returns a dict of labels to phrases from a pattern
+    file (.jsonl) or a name list (.csv or .tsv)."""
+    path = Path(path)
+    phrases = {}
+    if path.suffix == ".jsonl":
+        with path.open("r", encoding="utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                phrase = _pattern_phrase(entry["pattern"])
+                if phrase is None:
+                    log.debug(f"skipping non-literal pattern {entry['pattern']}")
+                    continue
+                phrases.setdefault(entry.get("label", label), []).append(phrase)
+    else:
+        delimiter = "\t" if path.suffix == ".tsv" else ","
+        with path.open("r", encoding="utf-8") as file:
+            for row in csv.DictReader(file, delimiter=delimiter):
+                name = row.get("appellation") or row.get("name")
+                if name:
+                    phrases.setdefault(label, []).append(name.strip())
+    return phrases
+
+
+def fingerprint(nlp, sources, label=DEFAULT_LABEL) -> str:
+    digest = hashlib.sha256()
+    digest.update(
+        json.dumps(
+            [spacy.__version__, nlp.lang, nlp.meta.get("name"), nlp.meta.get("version"), label]
+        ).encode("utf-8")
+    )
+    for source in sources:
+        digest.update(Path(source).read_bytes())
+    return digest.hexdigest()
+
+
+def compile_phrases(nlp, sources, label=DEFAULT_LABEL, cache_dir=GAZETTEER_CACHE):
+    """Returns a dict of labels to tokenized phrases, from
+    the cache if the sources have been compiled before."""
+    key = fingerprint(nlp, sources, label)
+    path = Path(cache_dir) / f"{key}.spacy" if cache_dir else None
+    compiled = {}
+    if path is not None and path.is_file():
+        doc_bin = DocBin().from_bytes(path.read_bytes())
+        for doc in doc_bin.get_docs(nlp.vocab):
+            compiled.setdefault(doc.user_data["label"], []).append(doc)
+        return compiled
+
+    phrases = {}
+    for source in sources:
+        for source_label, names in read_source(source, label).items():
+            phrases.setdefault(source_label, set()).update(names)
+    doc_bin = DocBin(attrs=["ORTH"], store_user_data=True)
+    for phrase_label, names in phrases.items():
+        docs = list(nlp.tokenizer.pipe(sorted(names)))
+        for doc in docs:
+            doc.user_data["label"] = phrase_label
+            doc_bin.add(doc)
+        compiled[phrase_label] = docs
+
+    if path is not None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(doc_bin.to_bytes())
+        os.replace(tmp, path)
+    return compiled
+
+
+def add_gazetteer(
+    nlp, sources, mode="before", label=DEFAULT_LABEL, cache_dir=GAZETTEER_CACHE
+):
+    """Adds a gazetteer compiled from sources to nlp.
+
+    In "before" mode it runs ahead of the ner component,
+    which keeps the names it finds; in "instead" mode the
+    ner component, if any, is disabled.
+    """
+    if mode not in MODES:
+        raise ValueError(f"unknown gazetteer mode {mode}")
+    before = "ner" if mode == "before" and "ner" in nlp.pipe_names else None
+    gazetteer = nlp.add_pipe("adam_gazetteer", before=before)
+    for phrase_label, docs in compile_phrases(nlp, sources, label, cache_dir).items():
+        gazetteer.add_phrases(phrase_label, docs)
+    if mode == "instead" and "ner" in nlp.pipe_names:
+        nlp.disable_pipe("ner")
+    nlp.meta["adam_gazetteer"] = fingerprint(nlp, sources, label) + mode
+    log.info(f"gazetteer of {gazetteer.size} names added {mode} ner")
+    return gazetteer
@@ -1,5 +1,26 @@
 # global.py
+"""Settings shared across adam, overridable from the environment."""
+import os
 from pathlib import Path
 
-PAGE_IMAGE_CACHE = Path("/tmp/page_images")
-PAGE_IMAGE_CACHE.mkdir(parents=True, exist_ok=True)
+PAGE_IMAGE_CACHE = Path(
+    os.environ.get("ADAM_IMAGE_CACHE", "/usr/local/var/cache/adam/images")
+)
+PAGE_IMAGE_CACHE_SIZE = os.environ.get("ADAM_IMAGE_CACHE_SIZE")
+PAGE_OCR_CACHE = Path(os.environ.get("ADAM_OCR_CACHE", "/usr/local/var/cache/adam/ocr"))
+MANIFEST_CACHE = Path(
+    os.environ.get("ADAM_MANIFEST_CACHE", "/usr/local/var/cache/adam/manifests")
+)
+OFFLINE = os.environ.get("ADAM_OFFLINE", "").lower() in ("1", "true", "yes")
+DOC_CACHE = Path(os.environ.get("ADAM_DOC_CACHE", "/usr/local/var/cache/adam/docs"))
+GAZETTEER_CACHE = Path(
+    os.environ.get("ADAM_GAZETTEER_CACHE", "/usr/local/var/cache/adam/gazetteer")
+)
+DETERMINISTIC_IDS = os.environ.get("ADAM_DETERMINISTIC_IDS", "").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+RDF_SNAPSHOTS = Path(
+    os.environ.get("ADAM_RDF_SNAPSHOTS", "/usr/local/var/cache/adam/rdf")
+)
@@ -3,34 +3,46 @@ The Graphable Class
 """
 
 import pathlib
+import uuid as uuid_lib
 from sys import stdout
 from typing import Union, IO, TextIO
 from rdflib import Graph, Namespace
-from shortuuid import uuid
+from shortuuid import encode, uuid
+from adam.global_vars import DETERMINISTIC_IDS
+from adam.rdf_stream import FORMATS, TripleWriter
+
+
+NAMESPACES = {
+    "ecrm": Namespace("http://erlangen-crm.org/200717/"),
+    "sc": Namespace("http://iiif.io/api/presentation/2#"),
+    "page": Namespace("https://figgy.princeton.edu/concerns/pages/"),
+    "actor": Namespace("https://figgy.princeton.edu/concerns/actors/"),
+    "appellation": Namespace("https://figgy.princeton.edu/concerns/appellations/"),
+    "entity": Namespace("https://figgy.princeton.edu/concerns/entities/"),
+    "inscription": Namespace("https://figgy.princeton.edu/concerns/inscriptions/"),
+    "etype": Namespace("https://figgy.princeton.edu/concerns/adam/"),
+}
+
+ID_NAMESPACE = uuid_lib.uuid5(uuid_lib.NAMESPACE_URL, "https://figgy.princeton.edu/concerns/")
 
 
 class Graphable:
-    """The Graphable class holds info about ontologies"""
+    """The Graphable class holds info about ontologies.
+
+    The namespaces are shared by every instance, and the
+    graph is built only when it is first asked for.
+
+    Ids are random unless deterministic_ids is set, in
+    which case they are derived from what they identify,
+    so that rerunning an analysis mints the same ids.
+    """
+
+    __slots__ = ("_graph",)
+
+    deterministic_ids = DETERMINISTIC_IDS
 
     def __init__(self):
-        """Initializes a Graphable.
-        Sets up namespaces and establishes an id.
-        """
         self._graph = None
-        self._namespaces = {
-            "ecrm": Namespace("http://erlangen-crm.org/200717/"),
-            "sc": Namespace("http://iiif.io/api/presentation/2#"),
-            "page": Namespace("https://figgy.princeton.edu/concerns/pages/"),
-            "actor": Namespace("https://figgy.princeton.edu/concerns/actors/"),
-            "appellation": Namespace(
-                "https://figgy.princeton.edu/concerns/appellations/"
-            ),
-            "entity": Namespace("https://figgy.princeton.edu/concerns/entities/"),
-            "inscription": Namespace(
-                "https://figgy.princeton.edu/concerns/inscriptions/"
-            ),
-            "etype": Namespace("https://figgy.princeton.edu/concerns/adam/"),
-        }
 
     # @property
     # def graph_id(self):
@@ -39,26 +51,51 @@ class Graphable:
     @property
     def graph(self):
         if self._graph is None:
-            self._graph = Graph()
-            manager = self._graph.namespace_manager
-
-            for prefix, namespace in self._namespaces.items():
-                manager.bind(prefix, namespace)
-
+            self._graph = self._new_graph()
             self.build_graph()
         return self._graph
 
+    @staticmethod
+    def _new_graph():
+        graph = Graph()
+        manager = graph.namespace_manager
+
+        for prefix, namespace in NAMESPACES.items():
+            manager.bind(prefix, namespace)
+        return graph
+
     def namespace(self, key):
-        return self._namespaces[key]
+        return NAMESPACES[key]
 
-    def gen_id(self, ns):
+    def gen_id(self, ns, *parts):
+        """Returns a new id in namespace ns.  In deterministic
+        mode the id is a hash of parts (and ns)."""
+        if self.deterministic_ids and parts:
+            name = "\x1f".join(str(part) for part in (ns,) + parts)
+            return self.namespace(ns)[encode(uuid_lib.uuid5(ID_NAMESPACE, name))]
         return self.namespace(ns)[uuid()]
 
+    def triples(self):
+        """Yields the object's triples; intended to be implemented by each subclass"""
+        yield from ()
+
     def build_graph(self):
-        """Does nothing in the base class; intended to be implemented by each subclass"""
-        pass
+        # adds to _graph directly: going through the graph
+        # property would build the graph a second time, with
+        # new random ids
+        if self._graph is None:
+            self._graph = self._new_graph()
+        graph = self._graph
+        for triple in self.triples():
+            graph.add(triple)
 
     def serialize(
         self, path: Union[str, pathlib.PurePath, IO[bytes]], fmt: str = "ttl"
     ):
-        self.graph.serialize(destination=path, format=fmt)
+        """Writes the graph.  N-Triples and N-Quads are
+        streamed from triples() without building the graph."""
+        if fmt in FORMATS:
+            with TripleWriter(path, fmt) as writer:
+                writer.write_all(self.triples())
+        else:
+            self.graph.serialize(destination=path, format=fmt)
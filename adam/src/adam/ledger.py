@@ -0,0 +1,179 @@
+"""The adam Ledger module
+
+A record, kept in SQLite, of the work that has been done:
+for each manifest, and for each canvas in it, which stages
+(download, ocr, nlp, rdf, export:txt and so on) are
+complete, with a hash of the inputs they were done with
+and how long they took.  The command-line tools consult
+the ledger so that a rerun, for instance after a crash,
+does only the work that is missing; work done with
+different inputs (another model, threshold or image
+profile) does not count.
+
+  Typical usage:
+
+  ledger = Ledger("/tmp/adam/ledger.sqlite")
+  if not ledger.is_done(manifest_uri, "ocr", canvas_id, inputs):
+      with ledger.stage(manifest_uri, "ocr", canvas_id, inputs):
+          ... do the work ...
+
+Manifests are keyed by their @id, not by the URL they
+were fetched from, which may differ.  Stages of a whole
+manifest are recorded with an empty canvas.  Like the
+image cache index, the ledger opens a short-lived
+connection for each operation, so it can be shared by
+threads and worker processes.
+"""
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stages (
+    manifest TEXT NOT NULL,
+    canvas TEXT NOT NULL DEFAULT '',
+    stage TEXT NOT NULL,
+    input_hash TEXT,
+    finished REAL NOT NULL,
+    seconds REAL,
+    PRIMARY KEY (manifest, canvas, stage)
+);
+"""
+
+DEFAULT_NAME = "ledger.sqlite"
+
+
+def input_hash(*parts) -> str:
+    """Returns a short hash of the inputs of a stage."""
+    digest = hashlib.sha256(json.dumps(parts, default=str).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class Ledger:
+    """The Ledger class"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def __repr__(self) -> str:
+        return f"Ledger({self.path})"
+
+    @contextmanager
+    def connection(self):
+        conn = sqlite3.connect(self.path, timeout=60)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def is_done(self, manifest, stage, canvas="", inputs=None) -> bool:
+        """Whether stage is done, and (if inputs is given)
+        was done with the same inputs."""
+        with self.connection() as conn:
+            row = conn.execute(
+                "SELECT input_hash FROM stages"
+                " WHERE manifest = ? AND canvas = ? AND stage = ?",
+                (manifest, canvas, stage),
+            ).fetchone()
+        return row is not None and (inputs is None or row[0] == inputs)
+
+    def done(self, manifest, stage, inputs=None) -> set:
+        """Returns the canvases of manifest for which stage
+        is done (with inputs, if given)."""
+        query = "SELECT canvas FROM stages WHERE manifest = ? AND stage = ?"
+        params = [manifest, stage]
+        if inputs is not None:
+            query += " AND input_hash = ?"
+            params.append(inputs)
+        with self.connection() as conn:
+            return {row[0] for row in conn.execute(query, params)}
+
+    def record(self, manifest, stage, canvas="", inputs=None, seconds=None):
+        with self.connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?, ?, ?)",
+                (manifest, canvas, stage, inputs, time.time(), seconds),
+            )
+
+    def record_many(self, records):
+        """Records (manifest, stage, canvas, inputs, seconds)
+        tuples in one transaction."""
+        now = time.time()
+        with self.connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?, ?, ?)",
+                [(m, c, s, i, now, t) for m, s, c, i, t in records],
+            )
+
+    @contextmanager
+    def stage(self, manifest, stage, canvas="", inputs=None):
+        """Times the enclosed work and records it if it
+        completes."""
+        start = time.perf_counter()
+        yield
+        self.record(manifest, stage, canvas, inputs, time.perf_counter() - start)
+
+    def forget(self, manifest=None, stage=None):
+        query, params = "DELETE FROM stages WHERE 1", []
+        if manifest is not None:
+            query += " AND manifest = ?"
+            params.append(manifest)
+        if stage is not None:
+            query += " AND stage = ?"
+            params.append(stage)
+        with self.connection() as conn:
+            conn.execute(query, params)
+
+    def summary(self, manifest=None) -> list:
+        """Returns (stage, manifests, canvases, seconds) for
+        each stage recorded."""
+        query = (
+            "SELECT stage, COUNT(DISTINCT manifest), SUM(canvas != ''),"
+            " COALESCE(SUM(seconds), 0) FROM stages"
+        )
+        params = []
+        if manifest is not None:
+            query += " WHERE manifest = ?"
+            params.append(manifest)
+        query += " GROUP BY stage ORDER BY stage"
+        with self.connection() as conn:
+            return conn.execute(query, params).fetchall()
+
+
+# CLI
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(description="Report or reset pipeline progress")
+    parser.add_argument("command", choices=["status", "forget"])
+    parser.add_argument("ledger", help=f"ledger file, e.g. /tmp/adam/{DEFAULT_NAME}")
+    parser.add_argument("--manifest", help="limit to one manifest URL")
+    parser.add_argument("--stage", help="stage to forget (default: all)")
+    return parser.parse_args(args)
+
+
+def main(args):
+    args = parse_args(args)
+    ledger = Ledger(args.ledger)
+    if args.command == "forget":
+        ledger.forget(args.manifest, args.stage)
+    print("stage\tmanifests\tcanvases\tseconds")
+    for stage, manifests, canvases, seconds in ledger.summary(args.manifest):
+        print(f"{stage}\t{manifests}\t{canvases}\t{seconds:.1f}")
+
+
+def run():
+    main(sys.argv[1:])
+
+
+if __name__ == "__main__":
+    run()
@@ -7,11 +7,19 @@ cache image files.
 import json
 import logging
 import os
-from shutil import copyfileobj
 from pathlib import Path
-import requests
 import pandas as pd
 import pytesseract
+from adam.cache import ImageCache, ManifestCache
+from adam.downloader import Downloader, DownloadError, default_downloader
+from adam.ocr_data import read_ocr_frame, write_ocr_frame, read_legacy_frame
+from adam.global_vars import (
+    PAGE_IMAGE_CACHE,
+    PAGE_IMAGE_CACHE_SIZE,
+    PAGE_OCR_CACHE,
+    MANIFEST_CACHE,
+    OFFLINE,
+)
 
 log = logging.getLogger(__name__)
 
@@ -21,25 +29,39 @@ manifest_uri = "https://figgy.princeton.edu/concern/scanned_resources/a3b5a622-8
 class Manifest:
     """The Manifest class"""
 
-    def __init__(self, manifest_uri):
-        log.debug("downloading manifest |%s|" % manifest_uri)
+    manifest_cache = ManifestCache(MANIFEST_CACHE, offline=OFFLINE)
 
-        r = requests.get(manifest_uri)
-        self.manifest = r.json()
+    def __init__(self, manifest_uri, image_profile=None):
+        log.debug("fetching manifest |%s|" % manifest_uri)
+
+        self.manifest = self.manifest_cache.fetch(manifest_uri)
+        self.image_profile = image_profile
 
         self._canvases = None
 
+    @classmethod
+    def use_manifest_cache(cls, root=None, offline=None):
+        """Replaces the manifest cache shared by all manifests."""
+        cls.manifest_cache = ManifestCache(
+            root or cls.manifest_cache.root,
+            cls.manifest_cache.offline if offline is None else offline,
+        )
+
     @property
     def id(self):
         """returns the uuid portion of the manifest @id"""
         return self.manifest["@id"].split("/")[-2]
 
+    @property
+    def uri(self):
+        return self.manifest["@id"]
+
     @property
     def canvases(self):
         if self._canvases is None:
             self._canvases = []
             for canvas in self.manifest["sequences"][0]["canvases"]:
-                self._canvases.append(Canvas(canvas))
+                self._canvases.append(Canvas(canvas, self.image_profile))
         return self._canvases
 
     @property
@@ -57,20 +79,79 @@ class Manifest:
     def __repr__(self) -> str:
         return f"Manifest({self.label})"
 
-    def download_images(self):
-        for canvas in self.canvases:
-            canvas.download_image()
+    def download_images(self, downloader: Downloader = None):
+        """Downloads the images of all the canvases concurrently."""
+        if downloader is None:
+            downloader = default_downloader()
+        return downloader.download_canvases(self.canvases)
+
+
+class ImageProfile:
+    """Describes which image of a canvas to fetch.
+
+    The master profile fetches the archival image/tiff
+    rendering.  Any other profile requests a derivative
+    of the given width, quality and format from the
+    canvas's IIIF Image API service, e.g.
+
+      ImageProfile("ocr", width=2000)  ->  .../full/2000,/0/gray.jpg
+    """
+
+    def __init__(self, name, width=None, quality="gray", fmt="jpg"):
+        self.name = name
+        self.width = width
+        self.quality = quality
+        self.fmt = fmt
+
+    @classmethod
+    def ocr(cls, width=2000, quality="gray", fmt="jpg"):
+        return cls("ocr", width, quality, fmt)
+
+    @property
+    def is_master(self) -> bool:
+        return self.width is None
+
+    @property
+    def suffix(self) -> str:
+        return ".tif" if self.is_master else f".{self.fmt}"
+
+    @property
+    def key(self) -> str:
+        """The cache subdirectory for OCR of images fetched with this profile."""
+        if self.is_master:
+            return ""
+        return f"{self.width}-{self.quality}-{self.fmt}"
+
+    def request(self, service_id) -> str:
+        return f"{service_id}/full/{self.width},/0/{self.quality}.{self.fmt}"
+
+    def __repr__(self) -> str:
+        return f"ImageProfile({self.name}, {self.key or 'master'})"
+
+
+MASTER_PROFILE = ImageProfile("master")
 
 
 class Canvas:
     """The Canvas class"""
 
-    page_image_cache = Path("/usr/local/var/cache/adam/images")
-    page_ocr_cache = Path("/usr/local/var/cache/adam/ocr")
+    image_cache = ImageCache(PAGE_IMAGE_CACHE, PAGE_IMAGE_CACHE_SIZE)
+    page_ocr_cache = PAGE_OCR_CACHE
+    image_profile = MASTER_PROFILE
 
-    def __init__(self, canvas_json):
+    def __init__(self, canvas_json, image_profile=None):
         self.canvas = canvas_json
         self._ocr_data = None
+        self._fell_back = False
+        if image_profile is not None:
+            self.image_profile = image_profile
+
+    @classmethod
+    def use_image_cache(cls, root=None, max_bytes=None):
+        """Replaces the image cache shared by all canvases."""
+        cls.image_cache = ImageCache(
+            root or cls.image_cache.root, max_bytes or cls.image_cache.max_bytes
+        )
 
     @property
     def id(self) -> str:
@@ -96,13 +177,47 @@ class Canvas:
         ][0]["@id"]
 
     @property
-    def image_uri(self):
+    def master_uri(self):
         return [
             rendering
             for rendering in self.renderings
             if rendering["format"] == "image/tiff"
         ][0]["@id"]
 
+    @property
+    def image_service(self):
+        """returns the @id of the IIIF Image API service, if there is one"""
+        try:
+            return self.canvas["images"][0]["resource"]["service"]["@id"]
+        except (KeyError, IndexError, TypeError):
+            return None
+
+    @property
+    def profile(self) -> ImageProfile:
+        """The profile actually in use: the master when the canvas
+        has no image service, or its derivative could not be
+        downloaded (by this or any earlier run)."""
+        if self.image_profile.is_master or self.image_service is None:
+            return MASTER_PROFILE
+        if not self._fell_back:
+            # another process may have fallen back since
+            self._fell_back = self.fallback_path.is_file()
+        if self._fell_back:
+            return MASTER_PROFILE
+        return self.image_profile
+
+    @property
+    def fallback_path(self) -> Path:
+        """A marker, beside the OCR data of the derivative,
+        recording that the master was used in its place."""
+        return self.page_ocr_cache / self.image_profile.key / f"{self.file_name}.master"
+
+    @property
+    def image_uri(self):
+        if self.profile.is_master:
+            return self.master_uri
+        return self.profile.request(self.image_service)
+
     @property
     def image_uri_old(self):
         image_renderings = [
@@ -110,30 +225,58 @@ class Canvas:
         ]
         return image_renderings[0]
 
+    @property
+    def file_name(self) -> str:
+        return self.master_uri.split("/")[-1]
+
     @property
     def image_path(self) -> Path:
-        return self.page_image_cache / self.image_uri.split("/")[-1]
+        return self.image_cache.path_for(self.image_uri, self.profile.suffix)
 
     @property
     def ocr_data_path(self) -> Path:
-        return self.page_ocr_cache / self.image_uri.split("/")[-1]
+        return self.page_ocr_cache / self.profile.key / f"{self.file_name}.parquet"
+
+    @property
+    def legacy_ocr_data_path(self) -> Path:
+        """Where earlier versions cached OCR data as CSV."""
+        return self.page_ocr_cache / self.profile.key / self.file_name
+
+    @property
+    def has_ocr_data(self) -> bool:
+        return self.ocr_data_path.is_file() or self.legacy_ocr_data_path.is_file()
 
     @property
     def image_file(self) -> Path:
-        if not self.image_path.is_file():
+        path = self.image_cache.get(self.image_uri, self.profile.suffix)
+        if path is None:
             log.debug(f"image not cached")
-            self.download_image()
-        return self.image_path
+            path = self.download_image()
+        return path
 
     @property
     def ocr_data(self) -> pd.DataFrame:
         if self._ocr_data is None:
             if not self.ocr_data_path.is_file():
-                log.debug(f"ocr not cached")
-                self.perform_ocr()
-            self._ocr_data = pd.read_csv(self.ocr_data_path)
+                if self.legacy_ocr_data_path.is_file():
+                    self.migrate_ocr_data()
+                else:
+                    log.debug(f"ocr not cached")
+                    self.perform_ocr()
+            self._ocr_data = read_ocr_frame(self.ocr_data_path)
         return self._ocr_data
 
+    def release(self):
+        """Drops the OCR data frame; it is read from the OCR
+        cache if it is needed again."""
+        self._ocr_data = None
+
+    def migrate_ocr_data(self):
+        """Converts OCR data cached as CSV to Parquet."""
+        log.debug(f"migrating {self.legacy_ocr_data_path}")
+        write_ocr_frame(read_legacy_frame(self.legacy_ocr_data_path), self.ocr_data_path)
+        self.legacy_ocr_data_path.unlink()
+
     @property
     def ocr_data_old(self):
         if not self.ocr_data_path.is_file():
@@ -141,24 +284,34 @@ class Canvas:
             self.perform_ocr()
         return self.ocr_data_path
 
-    def download_image(self):
+    def download_image(self, downloader: Downloader = None):
+        """Downloads the image for the canvas's profile, falling
+        back to the master TIFF if the derivative is unavailable."""
         log.debug(f"downloading {self.image_path}")
+        if downloader is None:
+            downloader = default_downloader()
+        self.image_path.parent.mkdir(parents=True, exist_ok=True)
         try:
-            response = requests.get(self.image_uri, stream=True)
-            response.raise_for_status()
-        except requests.exceptions.RequestException as e:
-            raise SystemExit(e)
-
-        response.raw.decode_content = True
-        try:
-            image_file = self.image_path.open("wb")
-            copyfileobj(response.raw, image_file)
-            image_file.close()
-        except OSError as e:
-            log.exception(e)
+            path = downloader.fetch(self.image_uri, self.image_path)
+            return self.image_cache.add(self.image_uri, path)
+        except DownloadError as e:
+            if self.profile.is_master:
+                raise
+            log.warning(f"{self.profile} unavailable for {self}, using master: {e}")
+        # recorded, so that later canvases for the page (in
+        # other processes and runs) look for the master's OCR
+        self.fallback_path.parent.mkdir(parents=True, exist_ok=True)
+        self.fallback_path.touch()
+        self._fell_back = True
+        path = self.image_cache.get(self.image_uri, self.profile.suffix)
+        if path is not None:
+            return path
+        self.image_path.parent.mkdir(parents=True, exist_ok=True)
+        path = downloader.fetch(self.image_uri, self.image_path)
+        return self.image_cache.add(self.image_uri, path)
 
     def perform_ocr(self):
         ocr_data = pytesseract.image_to_data(
             str(self.image_file), output_type="data.frame"
         )
-        ocr_data.to_csv(self.ocr_data_path)
+        write_ocr_frame(ocr_data, self.ocr_data_path)
@@ -0,0 +1,88 @@
+"""The adam memory module
+
+Measures the memory a run uses and keeps streaming runs
+within a budget.  Pages streamed from a container are
+analyzed a batch at a time and released once exported;
+a MemoryBudget, checked after each batch, halves the
+batch size (and collects garbage) whenever the process's
+resident set grows past the budget, so a run settles at
+the largest batches that fit.
+
+Releasing a page drops its OCR data, Doc and graph, not
+the Page itself: a container keeps one small Page object
+for each of its canvases, whose JSON the manifest holds
+in any case, so a run's memory still grows, slowly, with
+the size of the manifest being streamed.
+
+  Typical usage:
+
+  budget = MemoryBudget("4G")
+  container.dump_streaming("/tmp/adam", budget=budget)
+  log.info(f"peak RSS {format_size(peak_rss())}")
+"""
+import gc
+import logging
+import os
+import resource
+import sys
+from adam.cache import parse_size
+
+log = logging.getLogger(__name__)
+
+
+def peak_rss() -> int:
+    """The most memory the process has had resident, in
+    bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss() -> int:
+    """The memory the process has resident now, in bytes
+    (its peak, where that cannot be read)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return peak_rss()
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def format_size(size) -> str:
+    for unit in ("B", "K", "M", "G"):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}T"
+
+
+class MemoryBudget:
+    """A limit on the resident memory of a streaming run."""
+
+    def __init__(self, limit):
+        self.limit = parse_size(limit)
+        self.overruns = 0
+
+    def __repr__(self) -> str:
+        return f"MemoryBudget({format_size(self.limit)})"
+
+    def exceeded(self) -> bool:
+        return current_rss() > self.limit
+
+    def batch_size(self, batch_size) -> int:
+        """Returns the batch size to use next: batch_size, or
+        half of it if the budget is exceeded even after
+        collecting garbage."""
+        if batch_size <= 1 or not self.exceeded():
+            return batch_size
+        gc.collect()
+        if not self.exceeded():
+            return batch_size
+        self.overruns += 1
+        smaller = max(1, batch_size // 2)
+        log.warning(
+            f"resident memory {format_size(current_rss())} is over the budget of "
+            f"{format_size(self.limit)}; batch size {batch_size} -> {smaller}"
+        )
+        return smaller
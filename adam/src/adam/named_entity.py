@@ -9,39 +9,56 @@ from adam.graphable import Graphable
 
 
 class NamedEntity(Graphable):
-    """Holds data from spaCy"""
+    """Holds data from spaCy.
 
-    def __init__(self, ent):
+    A page may hold hundreds of entities, so each is a
+    small record; its id and graph are made only when
+    they are asked for.
+    """
+
+    __slots__ = ("_id", "source", "string", "type", "start_char", "end_char")
+
+    def __init__(self, ent, source=None):
         super().__init__()
-        self._id = self.gen_id("appellation")
+        self._id = None
+        self.source = source
         self.string = ent.text
         self.type = ent.label_
-        self.build_graph()
+        self.start_char = ent.start_char
+        self.end_char = ent.end_char
+
+    @property
+    def id(self):
+        if self._id is None:
+            self._id = self.gen_id("appellation", *self.key)
+        return self._id
+
+    @property
+    def key(self):
+        """The source (e.g. canvas id), span and content of
+        the entity, from which deterministic ids are made."""
+        return (self.source, self.start_char, self.end_char, self.string, self.type)
 
     def __repr__(self) -> str:
         return f"{self.type}({self.string})"
 
-    def build_graph(self):
+    def triples(self):
         """
-        Constructs a graph that looks like this:
+        Yields triples that look like this:
 
         id a ecrm:E90_Symbolic_Object;
            rdfs:label "Acheson";
            ecrm:P190_has_symbolic_content "Acheson" .
         """
         content = Literal(self.string)
-        self.graph.add((self._id, RDF.type, self.namespace("ecrm")["E41_Appellation"]))
-
-        self.graph.add(
-            (
-                self._id,
-                self.namespace("ecrm")["E55_Type"],
-                self.namespace("etype")[self.type],
-            )
+        yield (self.id, RDF.type, self.namespace("ecrm")["E41_Appellation"])
+
+        yield (
+            self.id,
+            self.namespace("ecrm")["E55_Type"],
+            self.namespace("etype")[self.type],
         )
 
-        self.graph.add((self._id, RDFS.label, content))
+        yield (self.id, RDFS.label, content)
 
-        self.graph.add(
-            (self._id, self.namespace("ecrm")["P190_has_symbolic_content"], content)
-        )
+        yield (self.id, self.namespace("ecrm")["P190_has_symbolic_content"], content)
@@ -0,0 +1,139 @@
+"""The adam NLP module
+
+A process-wide registry of spaCy pipelines.  Loading a
+model is expensive, so each pipeline is loaded lazily,
+once per process, and shared by every Collection,
+Container and Page that asks for it.
+
+  Typical usage:
+
+  nlp = load_model("en_core_web_lg", exclude=["lemmatizer"])
+
+Profiles name the sets of components to load.  The full
+profile loads the whole pipeline; the fast profile loads
+only what entity recognition needs, plus the statistical
+senter in place of the parser for sentence boundaries;
+the ner profile drops sentence segmentation too, and
+ensure_sentences adds rule-based boundaries to a Doc only
+when something (such as the JSONL export) asks for them.
+
+A pipeline may also carry a gazetteer of known names (see
+adam.gazetteer), run before the ner component or instead
+of it; in the latter case ner is not loaded at all.
+
+process_pages streams the text of many pages through a
+pipeline's nlp.pipe, so spaCy can batch them (and spread
+them over several processes), and attaches the resulting
+Docs to their pages.
+"""
+import logging
+import threading
+import spacy
+from spacy.pipeline import Sentencizer
+from adam.gazetteer import add_gazetteer
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "en_core_web_sm"
+DEFAULT_BATCH_SIZE = 32
+
+NON_NER_COMPONENTS = ("tagger", "parser", "lemmatizer", "attribute_ruler", "morphologizer")
+
+PROFILES = {
+    "full": {"exclude": (), "enable": ()},
+    "fast": {"exclude": NON_NER_COMPONENTS, "enable": ("senter",)},
+    "ner": {"exclude": NON_NER_COMPONENTS + ("senter",), "enable": ()},
+}
+
+DEFAULT_PROFILE = "full"
+
+_models = {}
+_lock = threading.Lock()
+_sentencizer = Sentencizer()
+
+
+def load_model(
+    name=DEFAULT_MODEL,
+    exclude=(),
+    disable=(),
+    profile=DEFAULT_PROFILE,
+    gazetteer=(),
+    gazetteer_mode="before",
+):
+    """Returns the pipeline for model name, loading it if necessary.
+
+    profile is one of PROFILES; exclude names further
+    components not to load at all, and disable names
+    components to load but not run.  gazetteer names
+    pattern files and name lists to add as a gazetteer,
+    run before or instead of ner according to
+    gazetteer_mode.
+    """
+    exclude = set(exclude) | set(PROFILES[profile]["exclude"])
+    gazetteer = tuple(str(source) for source in gazetteer)
+    if gazetteer and gazetteer_mode == "instead":
+        exclude.add("ner")
+    exclude = tuple(sorted(exclude))
+    key = (name, exclude, tuple(sorted(disable)), profile, gazetteer, gazetteer_mode)
+    with _lock:
+        if key not in _models:
+            log.info(f"loading spaCy model {name} ({profile})")
+            nlp = spacy.load(name, exclude=list(exclude), disable=list(disable))
+            for component in PROFILES[profile]["enable"]:
+                if component in nlp.disabled:
+                    nlp.enable_pipe(component)
+            if profile != "full":
+                _prune_embeddings(nlp)
+            if gazetteer:
+                add_gazetteer(nlp, gazetteer, gazetteer_mode)
+            _models[key] = nlp
+        return _models[key]
+
+
+def _prune_embeddings(nlp):
+    """Removes shared embedding layers that no remaining
+    component listens to."""
+    for name in ("tok2vec", "transformer"):
+        if name in nlp.pipe_names and not nlp.get_pipe(name).listening_components:
+            nlp.remove_pipe(name)
+
+
+def ensure_sentences(doc):
+    """Adds rule-based sentence boundaries to a Doc whose
+    pipeline did not set any."""
+    if not (doc.has_annotation("SENT_START") or doc.has_annotation("DEP")):
+        _sentencizer(doc)
+    return doc
+
+
+def loaded_models() -> list:
+    with _lock:
+        return list(_models)
+
+
+def clear():
+    """Forgets all loaded pipelines."""
+    with _lock:
+        _models.clear()
+
+
+def process_pages(pages, nlp, batch_size=DEFAULT_BATCH_SIZE, n_process=1):
+    """Runs nlp over the text of pages in batches and
+    attaches each Doc to its page.  Pages whose Docs are
+    in the doc cache are not processed again."""
+    pages = list(pages)
+    pending = []
+    for page in pages:
+        doc = page.cached_doc(nlp)
+        if doc is None:
+            pending.append(page)
+        else:
+            page.attach_doc(doc, nlp)
+    log.info(f"running nlp on {len(pending)} of {len(pages)} pages")
+    docs = nlp.pipe(
+        (page.text for page in pending), batch_size=batch_size, n_process=n_process
+    )
+    for page, doc in zip(pending, docs):
+        page.attach_doc(doc, nlp)
+        page.store_doc(doc, nlp)
+    return pages
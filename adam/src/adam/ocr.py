@@ -0,0 +1,77 @@
+"""The adam OCR module
+
+Runs tesseract over many canvases at once.  Canvases
+whose OCR is not yet cached are fanned out to a pool of
+worker processes; each worker limits tesseract's own
+OpenMP threads (OMP_THREAD_LIMIT) so that the pool, not
+tesseract, decides how many cores are busy.
+
+  Typical usage:
+
+  timings = ocr_canvases(manifest.canvases, processes=32)
+"""
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from adam.manifest import Canvas
+
+log = logging.getLogger(__name__)
+
+
+def _init_worker(thread_limit, image_cache, ocr_cache, image_profile):
+    """Configures a worker process like its parent, which
+    matters when workers are spawned rather than forked."""
+    os.environ["OMP_THREAD_LIMIT"] = str(thread_limit)
+    Canvas.image_cache = image_cache
+    Canvas.page_ocr_cache = ocr_cache
+    Canvas.image_profile = image_profile
+
+
+def _ocr_canvas(canvas: Canvas):
+    start = time.perf_counter()
+    canvas.image_file
+    fetched = time.perf_counter()
+    canvas.perform_ocr()
+    done = time.perf_counter()
+    return fetched - start, done - fetched
+
+
+def ocr_canvases(canvases, processes=None, thread_limit=1) -> dict:
+    """OCRs the canvases that are not yet cached, in parallel.
+
+    Returns a dict mapping canvas ids to (image seconds,
+    ocr seconds) for each canvas processed.
+    """
+    pending = [canvas for canvas in canvases if not canvas.has_ocr_data]
+    timings = {}
+    if not pending:
+        return timings
+
+    log.info(f"running ocr on {len(pending)} of {len(canvases)} canvases")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        initializer=_init_worker,
+        initargs=(
+            thread_limit,
+            Canvas.image_cache,
+            Canvas.page_ocr_cache,
+            Canvas.image_profile,
+        ),
+    ) as executor:
+        futures = {executor.submit(_ocr_canvas, canvas): canvas for canvas in pending}
+        for future in as_completed(futures):
+            canvas = futures[future]
+            try:
+                image_seconds, ocr_seconds = future.result()
+            except Exception as e:
+                log.error(f"ocr of {canvas} failed: {e}")
+                continue
+            timings[canvas.id] = (image_seconds, ocr_seconds)
+            log.info(
+                f"ocr {canvas}: image {image_seconds:.1f}s, tesseract {ocr_seconds:.1f}s"
+            )
+    elapsed = time.perf_counter() - start
+    log.info(f"ocr of {len(timings)} canvases took {elapsed:.1f}s")
+    return timings
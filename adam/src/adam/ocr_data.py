@@ -0,0 +1,82 @@
+"""The adam OCR data module
+
+Reads and writes the tesseract data frames that make up
+the OCR cache.  Frames are stored as Parquet with a fixed
+schema: layout columns as small integers, conf as float32
+and the word text dictionary-encoded.  Files are read
+through a memory map, and no dtypes need to be inferred.
+
+Earlier versions of adam cached these frames as CSV;
+read_legacy_frame reads them so they can be migrated.
+
+frame_text assembles a page's text from a frame with
+column operations rather than a walk over its rows.
+"""
+import os
+from pathlib import Path
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+OCR_SCHEMA = pa.schema(
+    [
+        ("level", pa.int16()),
+        ("page_num", pa.int16()),
+        ("block_num", pa.int16()),
+        ("par_num", pa.int16()),
+        ("line_num", pa.int16()),
+        ("word_num", pa.int16()),
+        ("left", pa.int32()),
+        ("top", pa.int32()),
+        ("width", pa.int32()),
+        ("height", pa.int32()),
+        ("conf", pa.float32()),
+        ("text", pa.dictionary(pa.int32(), pa.string())),
+    ]
+)
+
+LINE_KEYS = ["page_num", "block_num", "par_num", "line_num"]
+
+
+def _as_strings(column: pd.Series) -> pd.Series:
+    """Tesseract words that look like numbers may have been
+    parsed as numbers; make every non-null word a str."""
+    return column.where(column.isna(), column.astype(str)).astype(object)
+
+
+def write_ocr_frame(frame: pd.DataFrame, path: Path):
+    """Writes frame to path atomically."""
+    frame = frame[OCR_SCHEMA.names].copy()
+    frame["text"] = _as_strings(frame["text"])
+    table = pa.Table.from_pandas(frame, schema=OCR_SCHEMA, preserve_index=False)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+
+
+def read_ocr_frame(path: Path) -> pd.DataFrame:
+    table = pq.read_table(path, memory_map=True)
+    frame = table.to_pandas()
+    frame["text"] = frame["text"].astype(object).where(frame["text"].notna(), None)
+    return frame
+
+
+def read_legacy_frame(path: Path) -> pd.DataFrame:
+    """Reads a frame cached as CSV (with its pandas index)."""
+    return pd.read_csv(path, index_col=0)
+
+
+def frame_text(frame: pd.DataFrame, threshold, by_line=False) -> str:
+    """Returns the words whose confidence exceeds threshold,
+    joined by spaces or, if by_line is true, one line of the
+    page per line of text."""
+    words = frame[frame.conf > threshold]
+    if not by_line:
+        return " ".join(words.text.fillna("").astype(str)).strip()
+    lines = (
+        words.assign(text=words.text.fillna("").astype(str))
+        .groupby(LINE_KEYS, sort=True)["text"]
+        .agg(" ".join)
+    )
+    return "\n".join(lines).strip()
@@ -15,31 +15,36 @@ entities.
 """
 
 import json
-import os
-from shutil import copyfileobj
-from pathlib import Path, PosixPath
-import logging
-from types import NoneType
-from numpy import newaxis
-import requests
-import pytesseract
-import pandas as pd
-import spacy
+from pathlib import Path
 from rdflib import URIRef, Literal
 from rdflib.namespace._RDF import RDF
 from rdflib.namespace._RDFS import RDFS
-from adam.global_vars import PAGE_IMAGE_CACHE
+from adam.cache import DocCache
+from adam.global_vars import DOC_CACHE
 from adam.graphable import Graphable
 from adam.named_entity import NamedEntity
+from adam.nlp import DEFAULT_PROFILE, ensure_sentences, load_model
 from adam.manifest import Canvas
+from adam.ocr_data import frame_text
 
 
 class Page(Graphable):
-    def __init__(self, canvas_object: Canvas, metadata={}):
+    doc_cache = DocCache(DOC_CACHE)
+
+    @classmethod
+    def use_doc_cache(cls, root=None):
+        """Replaces the Doc cache shared by all pages; with no
+        root, Docs are not cached."""
+        cls.doc_cache = DocCache(root) if root is not None else None
+
+    def __init__(
+        self, canvas_object: Canvas, metadata={}, nlp=None, profile=DEFAULT_PROFILE
+    ):
         super().__init__()
         self._canvas = canvas_object
         self.metadata = metadata
-        self._nlp = None
+        self._nlp = nlp
+        self._profile = profile
         self._doc = None
         self._text = None
         self._entities = None
@@ -77,16 +82,17 @@ class Page(Graphable):
     @property
     def text(self):
         if self._text is None:
-            data_frame: pd.DataFrame = self._canvas.ocr_data
-            data_frame = data_frame[data_frame.conf > self._confidence_threshold]
-            data_frame = data_frame.reset_index().fillna("")
-            words = []
-            for _, token in data_frame.iterrows():
-                if not (token.isnull()["text"]):
-                    words.append(token["text"])
-            self._text = " ".join(words).strip()
+            self._text = frame_text(self._canvas.ocr_data, self._confidence_threshold)
         return self._text
 
+    @property
+    def line_text(self):
+        """The text with one line per line of the page,
+        grouped by tesseract's block, paragraph and line."""
+        return frame_text(
+            self._canvas.ocr_data, self._confidence_threshold, by_line=True
+        )
+
     @property
     def doc(self):
         if self._doc is None:
@@ -96,12 +102,14 @@ class Page(Graphable):
     @property
     def entities(self):
         if self._entities is None:
-            self._entities = [NamedEntity(ent) for ent in self.doc.ents]
+            self._entities = [
+                NamedEntity(ent, self._canvas.id) for ent in self.doc.ents
+            ]
         return self._entities
 
     @property
     def sentences(self):
-        return list(self.doc.sents)
+        return list(ensure_sentences(self.doc).sents)
 
     def rendering(self, rendering_type):
         return [
@@ -110,45 +118,75 @@ class Page(Graphable):
 
     def do_nlp(self):
         if self._nlp is None:
-            self._nlp = spacy.load("en_core_web_sm")
-        self._doc = self._nlp(self.text)
+            self._nlp = load_model(profile=self._profile)
+        doc = self.cached_doc(self._nlp)
+        if doc is None:
+            doc = self._nlp(self.text)
+            self.store_doc(doc, self._nlp)
+        self._doc = doc
+
+    def cached_doc(self, nlp):
+        """Returns the Doc nlp produced for this text on an
+        earlier run, if it is in the doc cache."""
+        if self.doc_cache is None:
+            return None
+        key = self.doc_cache.key(self.text, nlp, self._confidence_threshold)
+        return self.doc_cache.get(key, nlp.vocab)
+
+    def store_doc(self, doc, nlp):
+        if self.doc_cache is not None:
+            key = self.doc_cache.key(self.text, nlp, self._confidence_threshold)
+            self.doc_cache.put(key, doc)
+
+    def attach_doc(self, doc, nlp=None):
+        """Uses a Doc produced elsewhere, e.g. by a batch, as
+        the page's analysis."""
+        if nlp is not None:
+            self._nlp = nlp
+        self._doc = doc
+        self._entities = None
 
     def reset(self):
         self._text = None
         self._doc = None
         self._entities = None
 
-    def build_graph(self):
+    def release(self):
+        """Drops everything derived from the page's OCR data,
+        and the data itself, to free memory; it is all read
+        again, from the caches, if it is needed."""
+        self.reset()
+        self._graph = None
+        self._canvas.release()
+
+    def triples(self):
+        """Yields an inscription for each entity on the page.
+        Each call mints new inscription ids, unless ids are
+        deterministic."""
+        canvas = URIRef(self._canvas.id)
         for entity in self.entities:
-            inscription_id = self.gen_id("inscription")
-            self.graph.add(
-                (inscription_id, RDF.type, self.namespace("ecrm")["E34_Inscription"])
-            )
+            inscription_id = self.gen_id("inscription", *entity.key)
+            content = Literal(entity.string)
+            yield (inscription_id, RDF.type, self.namespace("ecrm")["E34_Inscription"])
 
-            self.graph.add((inscription_id, RDFS.label, Literal(entity.string)))
+            yield (inscription_id, RDFS.label, content)
 
-            self.graph.add(
-                (
-                    inscription_id,
-                    self.namespace("ecrm")["P128i_is_carried_by"],
-                    URIRef(self._canvas.id),
-                )
+            yield (
+                inscription_id,
+                self.namespace("ecrm")["P128i_is_carried_by"],
+                canvas,
             )
 
-            self.graph.add(
-                (
-                    inscription_id,
-                    self.namespace("ecrm")["P190_has_symbolic_content"],
-                    Literal(entity.string),
-                )
+            yield (
+                inscription_id,
+                self.namespace("ecrm")["P190_has_symbolic_content"],
+                content,
             )
 
-            self.graph.add(
-                (
-                    inscription_id,
-                    self.namespace("ecrm")["E55_Type"],
-                    Literal(entity.type),
-                )
+            yield (
+                inscription_id,
+                self.namespace("ecrm")["E55_Type"],
+                Literal(entity.type),
             )
 
     def export_file_path(self, base_dir: Path, suffix: str) -> Path:
@@ -174,5 +212,4 @@ class Page(Graphable):
 
     def export_as_rdf(self, path: Path):
         fname = self.export_file_path(path, ".ttl")
-        self.build_graph()
         self.serialize(fname)
@@ -0,0 +1,288 @@
+"""The adam Pipeline module
+
+Runs the pages of one or more containers through four
+stages at once, instead of one page and one stage at a
+time:
+
+  download  a pool of threads fetching page images
+  ocr       a pool of processes running tesseract
+  nlp       a single worker running spaCy over batches
+            (in nlp_processes processes), which a
+            MemoryBudget shrinks when memory runs short
+  export    an Exporter, computing each finished page's
+            artifacts and writing them in the background
+
+The stages are joined by bounded queues.  A stage that
+falls behind fills the queue in front of it, and the
+stages upstream wait, so no more than a few queues' worth
+of pages are in memory however large the input; and since
+the network, tesseract and spaCy are all busy at the same
+time, the wall time approaches that of the slowest stage
+rather than the sum of them all.  Pages whose images or
+OCR are already cached pass through those stages at once,
+and pages are released as soon as they are exported.  As
+with Container.ocr and process_nlp, each page's download,
+OCR and analysis are recorded in its container's ledger.
+
+  Typical usage:
+
+  pipeline = Pipeline(nlp, ocr_processes=8)
+  stats = pipeline.run(containers, "/tmp/adam")
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from adam.downloader import DEFAULT_PER_HOST, DEFAULT_WORKERS, Downloader
+from adam.exporter import FORMATS, ExportError, Exporter
+from adam.manifest import Canvas
+from adam.memory import format_size, peak_rss
+from adam.nlp import DEFAULT_BATCH_SIZE, process_pages
+from adam.ocr import _init_worker, _ocr_canvas
+
+log = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 64
+
+_DONE = object()
+
+
+class Stage:
+    """Workers that take items from an inbox, pass them to
+    func and put the results in an outbox.  When the last
+    worker has seen the end of the inbox, the end is passed
+    on to the outbox.  Items func fails on are logged and
+    dropped."""
+
+    def __init__(self, name, func, inbox, outbox, workers=1, batch_size=None):
+        self.name = name
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.workers = workers
+        self.batch_size = batch_size
+        self.items = 0
+        self.failures = 0
+        self.busy = 0.0
+        self._running = workers
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _take(self):
+        """Returns the next item or batch, and whether the
+        inbox is finished."""
+        item = self.inbox.get()
+        if item is _DONE:
+            self.inbox.put(_DONE)
+            return None, True
+        if self.batch_size is None:
+            return item, False
+        batch = [item]
+        while len(batch) < self.batch_size:
+            try:
+                item = self.inbox.get(timeout=0.5)
+            except queue.Empty:
+                break
+            if item is _DONE:
+                self.inbox.put(_DONE)
+                break
+            batch.append(item)
+        return batch, False
+
+    def _work(self):
+        while True:
+            item, finished = self._take()
+            if finished:
+                break
+            start = time.perf_counter()
+            try:
+                results = self.func(item)
+            except Exception as e:
+                log.error(f"{self.name} failed on {item}: {e}")
+                results = []
+                failed = len(item) if self.batch_size else 1
+            else:
+                failed = 0
+                if self.batch_size is None:
+                    results = [results]
+            count = len(item) if self.batch_size else 1
+            with self._lock:
+                self.busy += time.perf_counter() - start
+                self.items += count - failed
+                self.failures += failed
+            for result in results:
+                if self.outbox is not None:
+                    self.outbox.put(result)
+        with self._lock:
+            self._running -= 1
+            last = self._running == 0
+        if last and self.outbox is not None:
+            self.outbox.put(_DONE)
+
+    @property
+    def stats(self) -> dict:
+        return {"items": self.items, "failures": self.failures, "busy": self.busy}
+
+
+class Pipeline:
+    """Overlaps the download, OCR, NLP and export of pages."""
+
+    def __init__(
+        self,
+        nlp,
+        download_workers=DEFAULT_WORKERS,
+        per_host=DEFAULT_PER_HOST,
+        ocr_processes=None,
+        thread_limit=1,
+        batch_size=DEFAULT_BATCH_SIZE,
+        nlp_processes=1,
+        budget=None,
+        queue_size=DEFAULT_QUEUE_SIZE,
+        ocr_task=_ocr_canvas,
+        formats=FORMATS,
+        archive=None,
+    ):
+        self.nlp = nlp
+        self.download_workers = download_workers
+        self.per_host = per_host
+        self.ocr_processes = ocr_processes
+        self.thread_limit = thread_limit
+        self.batch_size = batch_size
+        self.nlp_processes = nlp_processes
+        self.budget = budget
+        self.queue_size = queue_size
+        self.ocr_task = ocr_task
+        self.formats = formats
+        self.archive = archive
+        self.stats = {}
+
+    def run(self, containers, out_dir) -> dict:
+        """Analyzes and exports the pending pages of
+        containers (which may be a generator) to out_dir;
+        returns statistics for each stage."""
+        out_dir = Path(out_dir)
+        processes = self.ocr_processes or os.cpu_count()
+        downloader = Downloader(workers=self.download_workers, per_host=self.per_host)
+        pool = ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=_init_worker,
+            initargs=(
+                self.thread_limit,
+                Canvas.image_cache,
+                Canvas.page_ocr_cache,
+                Canvas.image_profile,
+            ),
+        )
+        # start the worker processes now: forking them later,
+        # beside the running stage threads, can copy a lock one
+        # of those threads holds into a child that then waits
+        # on it forever
+        pool.submit(os.getpid).result()
+        exporter = Exporter(self.formats, self.archive)
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(4)]
+        finished = []
+
+        def download(item):
+            container, page = item
+            canvas = page._canvas
+            if not canvas.has_ocr_data and canvas.image_cache.get(
+                canvas.image_uri, canvas.profile.suffix
+            ) is None:
+                start = time.perf_counter()
+                canvas.download_image(downloader)
+                container.record_pages("download", [page], time.perf_counter() - start)
+            return item
+
+        def ocr(item):
+            container, page = item
+            canvas = page._canvas
+            if not canvas.has_ocr_data:
+                _, seconds = pool.submit(self.ocr_task, canvas).result()
+                container.record_pages("ocr", [page], seconds)
+            return item
+
+        def nlp(batch):
+            pages = [page for _, page in batch]
+            start = time.perf_counter()
+            process_pages(pages, self.nlp, len(pages), self.nlp_processes)
+            seconds = (time.perf_counter() - start) / len(pages)
+            by_container = {}
+            for container, page in batch:
+                by_container.setdefault(container, []).append(page)
+            for container, analyzed in by_container.items():
+                container.record_pages("nlp", analyzed, seconds)
+            if self.budget is not None:
+                stages[2].batch_size = self.budget.batch_size(stages[2].batch_size)
+            return batch
+
+        inputs = {}
+
+        def export(item):
+            container, page = item
+            if container.ledger is not None and container.id not in inputs:
+                inputs[container.id] = container.export_inputs
+            base_dir = out_dir / container.id
+            container.export_page(page, base_dir, inputs.get(container.id), exporter)
+            page.release()
+            return item
+
+        stages = [
+            Stage("download", download, queues[0], queues[1], self.download_workers),
+            Stage("ocr", ocr, queues[1], queues[2], processes),
+            Stage("nlp", nlp, queues[2], queues[3], batch_size=self.batch_size),
+            Stage("export", export, queues[3], None),
+        ]
+        start = time.perf_counter()
+        for stage in stages:
+            stage.start()
+        try:
+            for container in containers:
+                container.nlp = self.nlp
+                container.export_formats = exporter.formats
+                container.archive = exporter.archive
+                for page in container.pending_pages():
+                    queues[0].put((container, page))
+                finished.append(container)
+        finally:
+            queues[0].put(_DONE)
+            for stage in stages:
+                stage.join()
+            pool.shutdown()
+            downloader.close()
+        try:
+            for container in finished:
+                try:
+                    container.finish_export(out_dir / container.id, exporter)
+                except ExportError as e:
+                    # finish the other containers; close() raises
+                    log.error(f"exporting {container.id} failed: {e}")
+        finally:
+            exporter.close()
+
+        wall = time.perf_counter() - start
+        self.stats = {stage.name: stage.stats for stage in stages}
+        self.stats["wall"] = wall
+        self.stats["peak_rss"] = peak_rss()
+        self.stats["batch_size"] = stages[2].batch_size
+        log.info(
+            f"pipeline took {wall:.1f}s, peak RSS {format_size(self.stats['peak_rss'])}: "
+            + ", ".join(
+                f"{stage.name} {stage.items} pages in {stage.busy:.1f}s busy"
+                for stage in stages
+            )
+        )
+        return self.stats
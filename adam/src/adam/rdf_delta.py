@@ -0,0 +1,254 @@
+"""The adam RDF delta module
+
+Updates a triple store with only what has changed.  The
+statements last loaded for each canvas are kept as a
+snapshot (sorted N-Triples, one file per canvas).  When a
+page is regenerated its statements are compared with the
+snapshot, and only the difference is sent, as SPARQL
+DELETE DATA / INSERT DATA requests of bounded size;
+unchanged pages send nothing.  Alternatively, in graph
+mode, each changed canvas's named graph is dropped and
+reloaded whole.
+
+A delta is only small if a rerun mints the same ids for
+the same entities, so deterministic ids are required.
+
+  Typical usage:
+
+  updater = DeltaUpdater("http://localhost:7200/repositories/kennan/statements")
+  updater.update_pages(container.pages)
+"""
+import argparse
+import hashlib
+import logging
+import os
+import sys
+from pathlib import Path
+import requests
+from adam.container import Container
+from adam.global_vars import RDF_SNAPSHOTS
+from adam.graphable import Graphable
+from adam.manifest import Manifest
+from adam.nlp import DEFAULT_PROFILE, PROFILES
+from adam.rdf_stream import statement_nt, term_nt
+from rdflib import URIRef
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_BYTES = 1024 * 1024
+MODES = ("delta", "graph")
+
+
+class UpdateError(Exception):
+    """The SPARQL endpoint refused an update."""
+
+
+class SnapshotStore:
+    """The N-Triples statements last loaded for each canvas"""
+
+    def __init__(self, root=RDF_SNAPSHOTS):
+        self.root = Path(root)
+
+    def path_for(self, canvas_id) -> Path:
+        digest = hashlib.sha256(canvas_id.encode("utf-8")).hexdigest()
+        return self.root / digest[:2] / f"{digest}.nt"
+
+    def get(self, canvas_id) -> set:
+        path = self.path_for(canvas_id)
+        if not path.is_file():
+            return set()
+        with path.open("r", encoding="utf-8") as f:
+            return {line.rstrip("\n") for line in f if line.strip()}
+
+    def put(self, canvas_id, statements):
+        path = self.path_for(canvas_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with tmp.open("w", encoding="utf-8", newline="\n") as f:
+            for line in sorted(statements):
+                f.write(f"{line}\n")
+        os.replace(tmp, path)
+
+
+def page_statements(page) -> set:
+    return {statement_nt(triple) for triple in page.triples()}
+
+
+def data_block(statements, graph=None) -> str:
+    body = "\n".join(sorted(statements))
+    if graph is not None:
+        body = f"GRAPH {term_nt(graph)} {{\n{body}\n}}"
+    return f"{{\n{body}\n}}"
+
+
+class DeltaUpdater:
+    """Sends the changes to pages' statements to a SPARQL
+    update endpoint and keeps their snapshots."""
+
+    def __init__(
+        self,
+        endpoint,
+        snapshots=None,
+        mode="delta",
+        batch_bytes=DEFAULT_BATCH_BYTES,
+        timeout=300,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"unknown mode {mode}")
+        self.endpoint = endpoint
+        self.snapshots = snapshots or SnapshotStore()
+        self.mode = mode
+        self.batch_bytes = batch_bytes
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.bytes_sent = 0
+
+    def operations(self, canvas_id, old, new) -> list:
+        """Returns the SPARQL operations that turn old into new."""
+        if self.mode == "graph":
+            graph = URIRef(canvas_id)
+            operations = [f"DROP SILENT GRAPH {term_nt(graph)}"]
+            if new:
+                operations.append(f"INSERT DATA {data_block(new, graph)}")
+            return operations
+        operations = []
+        if old - new:
+            operations.append(f"DELETE DATA {data_block(old - new)}")
+        if new - old:
+            operations.append(f"INSERT DATA {data_block(new - old)}")
+        return operations
+
+    def send(self, operations):
+        body = " ;\n".join(operations).encode("utf-8")
+        response = self.session.post(
+            self.endpoint,
+            data=body,
+            headers={"Content-Type": "application/sparql-update; charset=utf-8"},
+            timeout=self.timeout,
+        )
+        _logger.info(f"sent {len(body)} bytes: {response.status_code}")
+        if not response.ok:
+            raise UpdateError(f"{response.status_code} {response.text[:200]}")
+        self.bytes_sent += len(body)
+
+    def update_pages(self, pages) -> dict:
+        """Brings the store up to date with pages; returns
+        counts of changed pages and of deleted and inserted
+        statements.  A page's snapshot is replaced only once
+        its batch has been accepted."""
+        if not Graphable.deterministic_ids:
+            _logger.warning("ids are random, so every statement will change")
+        counts = {"pages": 0, "changed": 0, "deleted": 0, "inserted": 0}
+        batch, batch_size, snapshots = [], 0, []
+        for page in pages:
+            counts["pages"] += 1
+            canvas_id = page._canvas.id
+            old = self.snapshots.get(canvas_id)
+            new = page_statements(page)
+            if old == new:
+                continue
+            counts["changed"] += 1
+            counts["deleted"] += len(old - new)
+            counts["inserted"] += len(new - old)
+            operations = self.operations(canvas_id, old, new)
+            batch.extend(operations)
+            batch_size += sum(len(operation) for operation in operations)
+            snapshots.append((canvas_id, new))
+            if batch_size >= self.batch_bytes:
+                self.flush(batch, snapshots)
+                batch, batch_size, snapshots = [], 0, []
+        self.flush(batch, snapshots)
+        return counts
+
+    def flush(self, batch, snapshots):
+        if batch:
+            self.send(batch)
+        for canvas_id, statements in snapshots:
+            self.snapshots.put(canvas_id, statements)
+
+
+# CLI
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        description="Send the RDF changes for a manifest to a SPARQL endpoint"
+    )
+    parser.add_argument("url", help="URL of the manifest")
+    parser.add_argument(
+        "endpoint",
+        help="SPARQL update endpoint, e.g. http://localhost:7200/repositories/kennan/statements",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=MODES,
+        default="delta",
+        help="send changed statements, or replace each changed canvas's named graph",
+    )
+    parser.add_argument(
+        "--snapshot-dir",
+        default=RDF_SNAPSHOTS,
+        help="where loaded statements are kept (default: $ADAM_RDF_SNAPSHOTS)",
+    )
+    parser.add_argument(
+        "--batch-bytes",
+        type=int,
+        default=DEFAULT_BATCH_BYTES,
+        help="approximate size of each update request",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=sorted(PROFILES),
+        default=DEFAULT_PROFILE,
+        help="NLP profile: full pipeline, fast (ner + senter) or ner only",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="use cached manifests only; never fetch them",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        dest="loglevel",
+        help="set loglevel to INFO",
+        action="store_const",
+        const=logging.INFO,
+    )
+    return parser.parse_args(args)
+
+
+def setup_logging(log_level):
+    log_format = "[%(asctime)s] %(levelname)s:%(name)s:%(message)s"
+    logging.basicConfig(
+        level=log_level,
+        stream=sys.stdout,
+        format=log_format,
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+
+def main(args):
+    args = parse_args(args)
+    setup_logging(args.loglevel)
+    Graphable.deterministic_ids = True
+    if args.offline:
+        Manifest.use_manifest_cache(offline=True)
+    container = Container(Manifest(args.url), profile=args.profile)
+    container.process_nlp()
+    updater = DeltaUpdater(
+        args.endpoint,
+        SnapshotStore(args.snapshot_dir),
+        mode=args.mode,
+        batch_bytes=args.batch_bytes,
+    )
+    counts = updater.update_pages(container.pages)
+    _logger.info(f"{counts}; {updater.bytes_sent} bytes sent")
+
+
+def run():
+    main(sys.argv[1:])
+
+
+if __name__ == "__main__":
+    run()
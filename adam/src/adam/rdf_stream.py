@@ -0,0 +1,120 @@
+"""The adam RDF stream module
+
+Writes triples as N-Triples or N-Quads as they are
+produced, one line per statement, without collecting
+them in an rdflib Graph.  Memory use does not grow with
+the output, so whole containers and collections can be
+exported this way; Turtle, which needs the whole graph to
+group statements by subject, remains the format for
+single pages and other small graphs.
+
+The format is chosen by the file suffix (.nt or .nq), and
+a further .gz suffix compresses the stream.
+
+  Typical usage:
+
+  with TripleWriter("/tmp/adam/container.nt.gz") as writer:
+      writer.write_all(container.triples())
+"""
+import gzip
+import io
+from pathlib import Path
+from rdflib import BNode, Literal, URIRef
+
+FORMATS = ("nt", "nq")
+
+_LITERAL_ESCAPES = str.maketrans(
+    {"\\": "\\\\", '"': '\\"', "\n": "\\n", "\r": "\\r", "\t": "\\t"}
+)
+_IRI_FORBIDDEN = set('<>"{}|^`\\') | {chr(c) for c in range(0x21)}
+
+
+def _escape_iri(iri: str) -> str:
+    if not _IRI_FORBIDDEN.intersection(iri):
+        return iri
+    return "".join(
+        f"\\u{ord(c):04X}" if c in _IRI_FORBIDDEN else c for c in iri
+    )
+
+
+def term_nt(term) -> str:
+    """Returns the N-Triples form of an rdflib term."""
+    if isinstance(term, URIRef):
+        return f"<{_escape_iri(str(term))}>"
+    if isinstance(term, Literal):
+        lexical = f'"{str(term).translate(_LITERAL_ESCAPES)}"'
+        if term.language:
+            return f"{lexical}@{term.language}"
+        if term.datatype:
+            return f"{lexical}^^<{_escape_iri(str(term.datatype))}>"
+        return lexical
+    if isinstance(term, BNode):
+        return f"_:{term}"
+    raise TypeError(f"cannot write {term!r} as N-Triples")
+
+
+def statement_nt(triple, graph=None) -> str:
+    """Returns a triple (or, with graph, a quad) as an
+    N-Triples (N-Quads) line, without its newline."""
+    subject, predicate, obj = triple
+    line = f"{term_nt(subject)} {term_nt(predicate)} {term_nt(obj)}"
+    if graph is not None:
+        line = f"{line} {term_nt(graph)}"
+    return f"{line} ."
+
+
+def format_for(path) -> str:
+    """Returns the format named by a path's suffixes."""
+    suffixes = Path(path).suffixes
+    if suffixes and suffixes[-1] == ".gz":
+        suffixes = suffixes[:-1]
+    fmt = suffixes[-1].lstrip(".") if suffixes else ""
+    if fmt not in FORMATS:
+        raise ValueError(f"{path} is not a .nt or .nq file")
+    return fmt
+
+
+class TripleWriter:
+    """Streams triples to a file or binary stream."""
+
+    def __init__(self, destination, fmt=None):
+        if isinstance(destination, (str, Path)):
+            path = Path(destination)
+            self.fmt = fmt or format_for(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if path.suffix == ".gz":
+                raw = gzip.open(path, "wb")
+            else:
+                raw = path.open("wb")
+            self._owned = True
+        else:
+            self.fmt = fmt or "nt"
+            raw = destination
+            self._owned = False
+        self._stream = io.TextIOWrapper(
+            raw, encoding="utf-8", newline="\n", write_through=False
+        )
+        self.count = 0
+
+    def write(self, triple, graph=None):
+        if self.fmt != "nq":
+            graph = None
+        self._stream.write(f"{statement_nt(triple, graph)}\n")
+        self.count += 1
+
+    def write_all(self, triples, graph=None):
+        for triple in triples:
+            self.write(triple, graph)
+
+    def close(self):
+        if self._owned:
+            self._stream.close()
+        else:
+            self._stream.flush()
+            self._stream.detach()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,11 +1,11 @@
 import sys
 import json
 import logging
-from os.path import exists
 from pathlib import Path
 from urllib.request import urlopen
 from adam.container import Container
 from adam.collection import Collection
+from adam.ledger import DEFAULT_NAME, Ledger
 
 _logger = logging.getLogger(__name__)
 
@@ -18,11 +18,10 @@ def setup_logging(log_level):
 
 mc076_path = "/Users/cwulfman/repos/github/pulibrary/finding_aid_enrichment/adam/manifest"
 
-done_dirs = [Path("/Users/cwulfman/Desktop/cw_graphs_1"),
-             Path("/Users/cwulfman/Desktop/cw_graphs_2")]
-
 target_dir = Path.home() / "Desktop/cw_graphs"
 
+ledger = Ledger(target_dir / DEFAULT_NAME)
+
 with open(mc076_path) as file:
     manifest = json.load(file)
 
@@ -33,13 +32,12 @@ setup_logging(logging.INFO)
 logging.debug("starting to iterate over containers")
 for container in collection.containers:
     logging.info(f"looking at {container}")
-    c_id = container.manifest['@id'].split('/')[-2]
-    fname = c_id + ".ttl"
-    if any([exists(x) for x in [d / fname for d in done_dirs]]):
-        logging.info(f"{id} already exists")
+    manifest_url = container._manifest.uri
+    if ledger.is_done(manifest_url, "rdf:ttl"):
+        logging.info(f"{container.id} already exists")
     else:
-        target = target_dir / fname
+        target = target_dir / f"{container.id}.ttl"
         logging.info(f"creating {target}")
-        container.build_graph()
-        container.serialize(target)
+        with ledger.stage(manifest_url, "rdf:ttl"):
+            container.serialize(target)
         logging.info(f"finished creating {target}")
@@ -0,0 +1,290 @@
+"""The adam work queue module
+
+A queue of tasks kept as files in a directory on a shared
+filesystem, so that workers on any number of machines
+mounting it can divide a list of manifests among
+themselves.  Each task is a small JSON file that moves
+between subdirectories:
+
+  pending  waiting to be claimed
+  leased   claimed by a worker
+  done     finished
+  failed   failed too many times
+
+A worker claims a task by renaming it from pending to
+leased; rename is atomic, on NFS as locally, so only one
+worker can succeed.  While it works, the worker touches
+the file every few seconds; a leased task whose file has
+not been touched for longer than the lease has lost its
+worker, and any worker may rename it back to pending.
+Times are compared with the modification time of a file
+the worker has just touched, so it is the file server's
+clock that counts, not the workers'.  A leased task's file
+names the worker and the attempt that claimed it, and a
+worker whose lease has expired and been claimed again
+can no longer renew, complete or fail it.
+
+  Typical usage:
+
+  tasks = WorkQueue("/mnt/shared/adam-queue")
+  tasks.put({"manifest": url})
+  tasks.work(lambda task: analyze_manifest(task["manifest"]))
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+STATES = ("pending", "leased", "done", "failed")
+
+DEFAULT_LEASE = 600
+DEFAULT_ATTEMPTS = 3
+
+
+def task_name(task) -> str:
+    """Names a task by its content, so that a task put
+    twice is queued once."""
+    key = json.dumps(task, sort_keys=True).encode("utf-8")
+    return f"{hashlib.sha256(key).hexdigest()[:24]}.json"
+
+
+class Lease:
+    """A claimed task, kept alive by a heartbeat thread
+    while it is used as a context manager."""
+
+    def __init__(self, queue, name, task, attempts):
+        self.queue = queue
+        self.name = name
+        self.task = task
+        self.attempts = attempts
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __repr__(self) -> str:
+        return f"Lease({self.name}, {self.task})"
+
+    @property
+    def path(self) -> Path:
+        return self.queue.root / "leased" / self.name
+
+    def heartbeat(self) -> bool:
+        """Renews the lease; returns False if it has been
+        lost."""
+        if self.queue.owned(self) is None:
+            return False
+        try:
+            os.utime(self.path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _beat(self):
+        while not self._stop.wait(self.queue.heartbeat):
+            if not self.heartbeat():
+                log.warning(f"lost the lease on {self.task}")
+                return
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._beat, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class WorkQueue:
+    """The WorkQueue class"""
+
+    def __init__(
+        self,
+        root,
+        lease_seconds=DEFAULT_LEASE,
+        max_attempts=DEFAULT_ATTEMPTS,
+        worker=None,
+    ):
+        self.root = Path(root)
+        self.lease_seconds = lease_seconds
+        self.heartbeat = max(lease_seconds / 4, 0.1)
+        self.max_attempts = max_attempts
+        self.worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+        for state in STATES:
+            (self.root / state).mkdir(parents=True, exist_ok=True)
+        self._clock = self.root / f".clock-{self.worker}"
+
+    def __repr__(self) -> str:
+        return f"WorkQueue({self.root})"
+
+    def now(self) -> float:
+        """The file server's time."""
+        self._clock.touch()
+        try:
+            return self._clock.stat().st_mtime
+        finally:
+            self._clock.unlink()
+
+    def _write(self, path, record):
+        tmp = path.with_name(f".{path.name}.{self.worker}.tmp")
+        tmp.write_text(json.dumps(record), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def _move(self, name, source, target) -> bool:
+        try:
+            os.rename(self.root / source / name, self.root / target / name)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put(self, task) -> bool:
+        """Queues task (a JSON-serializable dict) unless it
+        is already in the queue in any state."""
+        name = task_name(task)
+        if any((self.root / state / name).exists() for state in STATES):
+            return False
+        self._write(self.root / "pending" / name, {"task": task, "attempts": 0})
+        return True
+
+    def claim(self):
+        """Returns a Lease on the next pending task, or None
+        if there is none."""
+        for path in sorted((self.root / "pending").glob("*.json")):
+            try:
+                # a fresh mtime, so the lease is not taken as expired
+                os.utime(path)
+            except FileNotFoundError:
+                continue
+            if not self._move(path.name, "pending", "leased"):
+                continue  # another worker claimed it first
+            leased = self.root / "leased" / path.name
+            record = json.loads(leased.read_text(encoding="utf-8"))
+            record["attempts"] += 1
+            record["worker"] = self.worker
+            self._write(leased, record)
+            return Lease(self, path.name, record["task"], record["attempts"])
+        return None
+
+    def owned(self, lease):
+        """Returns the record of a leased task if lease is
+        still the claim on it, or None if the lease expired
+        and the task was requeued or claimed again."""
+        try:
+            record = json.loads(lease.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        if record.get("worker") != self.worker or record["attempts"] != lease.attempts:
+            return None
+        return record
+
+    def complete(self, lease) -> bool:
+        if self.owned(lease) is None or not self._move(lease.name, "leased", "done"):
+            log.warning(f"{lease.task} finished after its lease expired")
+            return False
+        return True
+
+    def fail(self, lease, error=None) -> bool:
+        """Returns the task to pending, or to failed once it
+        has been attempted max_attempts times."""
+        record = self.owned(lease)
+        if record is None:
+            log.warning(f"{lease.task} failed after its lease expired")
+            return False
+        record["error"] = str(error)
+        self._write(lease.path, record)
+        target = "failed" if lease.attempts >= self.max_attempts else "pending"
+        return self._move(lease.name, "leased", target)
+
+    def requeue_expired(self) -> int:
+        """Returns tasks whose leases have expired to pending
+        (or to failed, if they are out of attempts)."""
+        cutoff = self.now() - self.lease_seconds
+        count = 0
+        for path in (self.root / "leased").glob("*.json"):
+            try:
+                if path.stat().st_mtime >= cutoff:
+                    continue
+                record = json.loads(path.read_text(encoding="utf-8"))
+            except FileNotFoundError:
+                continue
+            target = "failed" if record["attempts"] >= self.max_attempts else "pending"
+            if self._move(path.name, "leased", target):
+                log.warning(f"lease on {record['task']} expired; moved to {target}")
+                count += 1
+        return count
+
+    def counts(self) -> dict:
+        return {
+            state: sum(1 for _ in (self.root / state).glob("*.json"))
+            for state in STATES
+        }
+
+    def work(self, handler, poll_interval=10) -> int:
+        """Claims tasks and passes them to handler until none
+        are pending or leased; returns the number handled."""
+        handled = 0
+        while True:
+            self.requeue_expired()
+            lease = self.claim()
+            if lease is None:
+                if not self.counts()["leased"]:
+                    return handled
+                # others are still working, and may fail
+                time.sleep(poll_interval)
+                continue
+            log.info(f"{self.worker} claimed {lease.task} (attempt {lease.attempts})")
+            with lease:
+                try:
+                    handler(lease.task)
+                except Exception as error:
+                    log.error(f"{lease.task} failed: {error}")
+                    self.fail(lease, error)
+                    continue
+            self.complete(lease)
+            handled += 1
+
+
+# CLI
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(description="Report on or reset a work queue")
+    parser.add_argument("command", choices=["status", "requeue", "retry-failed"])
+    parser.add_argument("queue", help="queue directory on the shared filesystem")
+    parser.add_argument(
+        "--lease",
+        type=int,
+        default=DEFAULT_LEASE,
+        help="seconds after which an untouched lease expires",
+    )
+    return parser.parse_args(args)
+
+
+def main(args):
+    args = parse_args(args)
+    tasks = WorkQueue(args.queue, lease_seconds=args.lease)
+    if args.command == "requeue":
+        tasks.requeue_expired()
+    elif args.command == "retry-failed":
+        for path in (tasks.root / "failed").glob("*.json"):
+            record = json.loads(path.read_text(encoding="utf-8"))
+            record["attempts"] = 0
+            tasks._write(path, record)
+            tasks._move(path.name, "failed", "pending")
+    for state, count in tasks.counts().items():
+        print(f"{state}\t{count}")
+
+
+def run():
+    main(sys.argv[1:])
+
+
+if __name__ == "__main__":
+    run()
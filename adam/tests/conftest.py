@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""Fixtures shared by the test modules: stand-ins for
+tesseract output, an image server, manifests and a spaCy
+pipeline, so that no test needs the network or a model."""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+import pytest
+import spacy
+from adam import nlp as registry
+from adam.cache import DocCache
+from adam.manifest import Canvas
+from adam.ocr_data import write_ocr_frame
+from adam.page import Page
+
+IMAGE_BYTES = bytes(range(256)) * 4096
+
+NAMES = [
+    {"label": "PERSON", "pattern": name} for name in ("Acheson", "Kennan", "Dulles")
+] + [{"label": "GPE", "pattern": "Moscow"}]
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    """Serves the server's body for any path, counting concurrent requests."""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(0.05)
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(server.body)))
+        self.end_headers()
+        self.wfile.write(server.body)
+        with server.lock:
+            server.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+class StubManifest:
+    """Stands in for a fetched Manifest."""
+
+    def __init__(self, name, canvases, uri=None):
+        self.id = name
+        self.uri = uri or f"http://example.org/manifest/{name}/manifest"
+        self.canvases = canvases
+
+
+@pytest.fixture(name="tesseract_frame")
+def fixture_tesseract_frame():
+    """The words tesseract finds on a page."""
+    return pd.DataFrame(
+        {
+            "level": [1, 5, 5, 5, 5],
+            "page_num": [1, 1, 1, 1, 1],
+            "block_num": [0, 1, 1, 1, 1],
+            "par_num": [0, 1, 1, 1, 1],
+            "line_num": [0, 1, 1, 1, 2],
+            "word_num": [0, 1, 2, 3, 1],
+            "left": [0, 100, 240, 400, 100],
+            "top": [0, 50, 50, 50, 90],
+            "width": [3774, 120, 150, 90, 200],
+            "height": [4770, 30, 30, 30, 30],
+            "conf": [-1, 96.5, 97.0, 40.0, 98.0],
+            "text": [None, "Kennan", "Papers", 1922, "Princeton"],
+        }
+    )
+
+
+@pytest.fixture(name="serve")
+def fixture_serve():
+    """Starts local HTTP servers with the given handlers."""
+    servers = []
+
+    def serve(handler):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        server.lock = threading.Lock()
+        server.in_flight = 0
+        server.max_in_flight = 0
+        server.requests = []
+        server.always_fail = False
+        server.body = IMAGE_BYTES
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(name="image_server")
+def fixture_image_server(serve):
+    return serve(ImageHandler)
+
+
+@pytest.fixture(name="make_canvas")
+def fixture_make_canvas():
+    """Makes canvases whose images are served by a server."""
+
+    def make_canvas(server, name):
+        url = f"http://127.0.0.1:{server.server_port}/downloads/{name}"
+        return Canvas(
+            {
+                "@id": f"http://example.org/canvas/{name}",
+                "label": name,
+                "rendering": [{"@id": url, "format": "image/tiff"}],
+            }
+        )
+
+    return make_canvas
+
+
+@pytest.fixture(name="make_manifest")
+def fixture_make_manifest():
+    return StubManifest
+
+
+@pytest.fixture(name="nlp")
+def fixture_nlp():
+    """A pipeline that finds a few known names."""
+    nlp = spacy.blank("en")
+    nlp.add_pipe("entity_ruler").add_patterns(NAMES)
+    return nlp
+
+
+@pytest.fixture(name="manifest")
+def fixture_manifest(tmp_path, monkeypatch, nlp, tesseract_frame):
+    """A manifest of three OCRed canvases, analyzed by nlp
+    in place of the default model."""
+    monkeypatch.setattr(Canvas, "page_ocr_cache", tmp_path / "ocr")
+    monkeypatch.setattr(Page, "doc_cache", DocCache(tmp_path / "docs"))
+    monkeypatch.setattr(registry.spacy, "load", lambda name, exclude=(), disable=(): nlp)
+    registry.clear()
+    canvases = [
+        Canvas(
+            {
+                "@id": f"http://example.org/canvas/{i}",
+                "label": str(i),
+                "rendering": [
+                    {"@id": f"http://example.org/downloads/{i}", "format": "image/tiff"}
+                ],
+            }
+        )
+        for i in range(3)
+    ]
+    for canvas in canvases:
+        write_ocr_frame(tesseract_frame, canvas.ocr_data_path)
+    yield StubManifest("abc", canvases)
+    registry.clear()
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+import pytest
+from adam.cache import ImageCache, ManifestCache, ManifestUnavailable, parse_size
+
+MANIFEST = {"@id": "https://example.org/iiif/abc/manifest", "label": ["1922"]}
+
+
+class ManifestHandler(BaseHTTPRequestHandler):
+    """Serves MANIFEST with an ETag and honors If-None-Match."""
+
+    def do_GET(self):
+        self.server.requests.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = json.dumps(MANIFEST).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(name="manifest_server")
+def fixture_manifest_server(serve):
+    return serve(ManifestHandler)
+
+
+@pytest.fixture(name="cache")
+def fixture_cache(tmp_path):
+    return ImageCache(tmp_path / "images", max_bytes=250, min_age=0)
+
+
+def store(cache, key, size):
+    path = cache.path_for(key, ".tif")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    return cache.add(key, path)
+
+
+def test_parse_size():
+    assert parse_size("500") == 500
+    assert parse_size("2K") == 2048
+    assert parse_size("1.5G") == 1.5 * 2**30
+    assert parse_size(None) is None
+
+
+def test_sharded_paths(cache):
+    path = cache.path_for("https://example.org/image/1", ".tif")
+    digest = path.stem
+    assert path.parent == cache.root / digest[:2] / digest[2:4]
+
+
+def test_hits_and_misses(cache):
+    assert cache.get("a", ".tif") is None
+    store(cache, "a", 100)
+    assert cache.get("a", ".tif") == cache.path_for("a", ".tif")
+    stats = cache.stats
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["bytes"] == 100
+
+
+def test_lru_eviction(cache):
+    store(cache, "a", 100)
+    store(cache, "b", 100)
+    cache.get("a", ".tif")
+    store(cache, "c", 100)
+    assert cache.get("b", ".tif") is None
+    assert cache.get("a", ".tif") is not None
+    assert cache.get("c", ".tif") is not None
+    stats = cache.stats
+    assert stats["evicted_files"] == 1
+    assert stats["evicted_bytes"] == 100
+    assert stats["bytes"] == 200
+
+
+def test_recent_files_are_kept(tmp_path):
+    cache = ImageCache(tmp_path / "images", max_bytes=250, min_age=60)
+    for key in "abc":
+        store(cache, key, 100)
+    assert all(cache.get(key, ".tif") is not None for key in "abc")
+    assert cache.stats["evicted_files"] == 0
+    assert cache.evict(250, min_age=0) == 100
+
+
+def test_interrupted_downloads_are_swept(tmp_path):
+    cache = ImageCache(tmp_path / "images", max_bytes=250, min_age=60)
+    old = cache.path_for("old", ".tif.part")
+    fresh = cache.path_for("fresh", ".tif.part")
+    for path in (old, fresh):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * 100)
+    os.utime(old, (0, 0))
+    store(cache, "a", 100)
+    assert not old.exists()
+    assert fresh.exists()
+    stats = cache.stats
+    assert (stats["swept_files"], stats["swept_bytes"]) == (1, 100)
+
+
+def test_image_cache_does_not_load_spacy():
+    code = "import sys, adam.cache; assert 'spacy' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_concurrent_downloads_keep_images_for_ocr(tmp_path):
+    """Each thread downloads an image and reads it back a
+    little later, as OCR does, while the others' downloads
+    push the cache over its budget."""
+    cache = ImageCache(tmp_path / "images", max_bytes=250, min_age=60)
+    missing = []
+
+    def download_and_ocr(key):
+        store(cache, key, 100)
+        time.sleep(0.1)
+        path = cache.get(key, ".tif")
+        if path is None or not path.is_file():
+            missing.append(key)
+
+    threads = [
+        threading.Thread(target=download_and_ocr, args=(f"page{i}",)) for i in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert missing == []
+    assert cache.stats["files"] == 8
+
+
+def test_manifest_revalidation(manifest_server, tmp_path):
+    url = f"http://127.0.0.1:{manifest_server.server_port}/manifest"
+    cache = ManifestCache(tmp_path / "manifests")
+    assert cache.fetch(url) == MANIFEST
+    assert cache.fetch(url) == MANIFEST
+    assert manifest_server.requests == [None, '"v1"']
+
+
+def test_manifest_offline(manifest_server, tmp_path):
+    url = f"http://127.0.0.1:{manifest_server.server_port}/manifest"
+    offline = ManifestCache(tmp_path / "manifests", offline=True)
+    with pytest.raises(ManifestUnavailable):
+        offline.fetch(url)
+    ManifestCache(tmp_path / "manifests").fetch(url)
+    assert offline.fetch(url) == MANIFEST
+    assert len(manifest_server.requests) == 1
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+from http.server import BaseHTTPRequestHandler
+import pytest
+from adam.cache import ImageCache
+from adam.downloader import Downloader, DownloadError
+from adam.manifest import Canvas, ImageProfile
+from adam.ocr_data import write_ocr_frame
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Drops the connection halfway through every full (non-Range)
+    response, and honors Range requests."""
+
+    def do_GET(self):
+        self.server.requests.append(self.headers.get("Range"))
+        if self.server.always_fail:
+            self.send_error(503)
+            return
+        range_header = self.headers.get("Range")
+        if range_header:
+            start = int(range_header.split("=")[1].rstrip("-"))
+            body = self.server.body[start:]
+            self.send_response(206)
+            self.send_header(
+                "Content-Range",
+                f"bytes {start}-{len(self.server.body) - 1}/{len(self.server.body)}",
+            )
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(self.server.body)))
+            self.end_headers()
+            self.wfile.write(self.server.body[: len(self.server.body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(name="flaky_server")
+def fixture_flaky_server(serve):
+    return serve(FlakyHandler)
+
+
+def test_download_canvases(make_canvas, image_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(Canvas, "image_cache", ImageCache(tmp_path))
+    canvases = [make_canvas(image_server, f"page{i}") for i in range(12)]
+    downloader = Downloader(workers=8, per_host=3)
+    paths = downloader.download_canvases(canvases)
+    downloader.close()
+    assert len(paths) == 12
+    for canvas in canvases:
+        assert canvas.image_path.read_bytes() == image_server.body
+    assert image_server.max_in_flight <= 3
+
+
+def test_resume_after_dropped_connection(
+    make_canvas, flaky_server, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(Canvas, "image_cache", ImageCache(tmp_path))
+    canvas = make_canvas(flaky_server, "page")
+    downloader = Downloader(retries=3, backoff=0.01)
+    canvas.download_image(downloader)
+    assert canvas.image_path.read_bytes() == flaky_server.body
+    assert len(flaky_server.requests) == 2
+    assert flaky_server.requests[0] is None
+    assert flaky_server.requests[1].startswith("bytes=")
+    assert flaky_server.requests[1] != "bytes=0-"
+    assert not list(tmp_path.rglob("*.part"))
+
+
+def test_failed_download_leaves_no_image(
+    make_canvas, flaky_server, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(Canvas, "image_cache", ImageCache(tmp_path))
+    flaky_server.always_fail = True
+    canvas = make_canvas(flaky_server, "page")
+    downloader = Downloader(retries=2, backoff=0.01)
+    with pytest.raises(DownloadError):
+        canvas.download_image(downloader)
+    assert len(flaky_server.requests) == 3
+    assert not canvas.image_path.exists()
+
+
+def test_derivative_falls_back_to_master(
+    make_canvas, flaky_server, image_server, tesseract_frame, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(Canvas, "image_cache", ImageCache(tmp_path / "images"))
+    monkeypatch.setattr(Canvas, "page_ocr_cache", tmp_path / "ocr")
+    flaky_server.always_fail = True
+    canvas = make_canvas(image_server, "page")
+    canvas.canvas["images"] = [
+        {
+            "resource": {
+                "service": {"@id": f"http://127.0.0.1:{flaky_server.server_port}/iiif/page"}
+            }
+        }
+    ]
+    canvas.image_profile = ImageProfile.ocr(2000)
+    canvas.download_image(Downloader(retries=1, backoff=0.01))
+    assert canvas.profile.is_master
+    assert canvas.image_path.read_bytes() == image_server.body
+    write_ocr_frame(tesseract_frame, canvas.ocr_data_path)
+
+    # a later canvas for the page, as in another process or
+    # a rerun, finds the master's image and OCR
+    requests = len(flaky_server.requests)
+    again = Canvas(canvas.canvas, ImageProfile.ocr(2000))
+    assert again.profile.is_master
+    assert again.has_ocr_data
+    assert again.ocr_data_path == canvas.ocr_data_path
+    assert again.image_file == canvas.image_path
+    assert len(flaky_server.requests) == requests
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+import tarfile
+import zipfile
+import pytest
+from adam.container import Container
+from adam.exporter import ExportError, Exporter, page_artifacts
+from adam.ledger import Ledger
+
+
+def test_artifacts_match_page_exports(manifest, tmp_path):
+    page = Container(manifest).pages[0]
+    for fmt in ("txt", "csv", "jsonl", "rdf"):
+        getattr(page, f"export_as_{fmt}")(tmp_path)
+    artifacts = page_artifacts(page)
+    assert artifacts["txt"] == (tmp_path / "0.txt").read_bytes()
+    assert artifacts["csv"] == (tmp_path / "0.csv").read_bytes()
+    assert artifacts["jsonl"] == (tmp_path / "0.jsonl").read_bytes()
+    assert b"Kennan" in artifacts["rdf"]
+
+
+def test_selected_formats(manifest, tmp_path):
+    ledger = Ledger(tmp_path / "ledger.sqlite")
+    container = Container(manifest, ledger=ledger, export_formats=("txt", "rdf"))
+    container.dump(tmp_path / "out")
+    names = sorted(p.name for p in (tmp_path / "out" / "abc").iterdir())
+    assert names == ["0.ttl", "0.txt", "1.ttl", "1.txt", "2.ttl", "2.txt"]
+    assert container.is_complete()
+    assert ledger.done(manifest.uri, "export:txt") == {c.id for c in manifest.canvases}
+    assert ledger.done(manifest.uri, "export:csv") == set()
+
+    # other formats are other work
+    more = Container(manifest, ledger=ledger, export_formats=("txt", "csv"))
+    assert not more.is_complete()
+    assert len(more.pending_pages()) == 3
+
+
+@pytest.mark.parametrize("kind", ["zip", "tar"])
+def test_archive(manifest, tmp_path, kind):
+    ledger = Ledger(tmp_path / "ledger.sqlite")
+    container = Container(manifest, ledger=ledger, archive=kind)
+    container.dump(tmp_path / "out")
+    assert not (tmp_path / "out" / "abc").exists()
+    path = tmp_path / "out" / f"abc.{kind}"
+    if kind == "zip":
+        with zipfile.ZipFile(path) as archive:
+            names = archive.namelist()
+            text = archive.read("1.txt")
+    else:
+        with tarfile.open(path) as archive:
+            names = archive.getnames()
+            text = archive.extractfile("1.txt").read()
+    assert len(names) == 12
+    assert text == page_artifacts(container.pages[1], ["txt"])["txt"]
+    assert container.is_complete()
+
+
+def test_failed_writes_are_raised(manifest, tmp_path):
+    ledger = Ledger(tmp_path / "ledger.sqlite")
+    container = Container(manifest, ledger=ledger)
+    # a file where the container's directory should be
+    (tmp_path / "out").mkdir()
+    (tmp_path / "out" / "abc").write_text("")
+    with pytest.raises(ExportError) as raised:
+        container.dump(tmp_path / "out")
+    assert len(raised.value.errors) == 3
+    assert not container.is_complete()
+    assert ledger.done(manifest.uri, "export") == set()
+
+    exporter = Exporter(formats=("txt",))
+    for page in container.pages:
+        exporter.export(page, tmp_path / "out" / "abc")
+        exporter.export(page, tmp_path / "elsewhere")
+    exporter.finish(tmp_path / "elsewhere")
+    with pytest.raises(ExportError):
+        exporter.finish(tmp_path / "out" / "abc")
+    with pytest.raises(ExportError):
+        exporter.close()
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        Exporter(formats=("txt", "pdf"))
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+import pytest
+import spacy
+from adam import gazetteer
+from adam.cache import DocCache
+
+PATTERNS = Path(__file__).parents[2] / "training" / "training_patterns.jsonl"
+
+
+@pytest.fixture(name="names")
+def fixture_names(tmp_path):
+    path = tmp_path / "names.csv"
+    path.write_text("appellation,viaf\nGeorge F. Kennan,12345\nDean Acheson,67890\n")
+    return path
+
+
+def test_read_patterns():
+    phrases = gazetteer.read_source(PATTERNS)
+    assert "hamilton fish armstrong" in phrases["PERSON"]
+    assert "thomas e. dewey" in phrases["PERSON"]
+
+
+def test_matches_known_names(tmp_path, names):
+    nlp = spacy.blank("en")
+    gazetteer.add_gazetteer(nlp, [PATTERNS, names], cache_dir=tmp_path / "cache")
+    doc = nlp("Letters from Thomas E. Dewey and DEAN ACHESON to George F. Kennan.")
+    assert [(e.text, e.label_) for e in doc.ents] == [
+        ("Thomas E. Dewey", "PERSON"),
+        ("DEAN ACHESON", "PERSON"),
+        ("George F. Kennan", "PERSON"),
+    ]
+
+
+def test_compiled_phrases_are_cached(tmp_path, names):
+    cache_dir = tmp_path / "cache"
+    nlp = spacy.blank("en")
+    compiled = gazetteer.compile_phrases(nlp, [names], cache_dir=cache_dir)
+    assert len(list(cache_dir.glob("*.spacy"))) == 1
+
+    names.write_text("appellation\nDean Acheson\nGeorge F. Kennan\n")
+    # a different source is compiled afresh
+    gazetteer.compile_phrases(nlp, [names], cache_dir=cache_dir)
+    assert len(list(cache_dir.glob("*.spacy"))) == 2
+
+    names.write_text("appellation,viaf\nGeorge F. Kennan,12345\nDean Acheson,67890\n")
+    cached = gazetteer.compile_phrases(spacy.blank("en"), [names], cache_dir=cache_dir)
+    assert {label: [d.text for d in docs] for label, docs in cached.items()} == {
+        label: [d.text for d in docs] for label, docs in compiled.items()
+    }
+
+
+def test_modes(tmp_path, names):
+    nlp = spacy.blank("en")
+    nlp.add_pipe("entity_ruler", name="ner").add_patterns(
+        [{"label": "ORG", "pattern": "Acheson"}]
+    )
+    gazetteer.add_gazetteer(nlp, [names], cache_dir=tmp_path)
+    assert nlp.pipe_names == ["adam_gazetteer", "ner"]
+    # the ner component keeps what the gazetteer found
+    assert [e.label_ for e in nlp("Dean Acheson").ents] == ["PERSON"]
+
+    nlp = spacy.blank("en")
+    nlp.add_pipe("entity_ruler", name="ner")
+    gazetteer.add_gazetteer(nlp, [names], mode="instead", cache_dir=tmp_path)
+    assert nlp.pipe_names == ["adam_gazetteer"]
+    with pytest.raises(ValueError):
+        gazetteer.add_gazetteer(nlp, [names], mode="after", cache_dir=tmp_path)
+
+
+def test_gazetteer_changes_doc_cache_key(tmp_path, names):
+    nlp = spacy.blank("en")
+    before = DocCache.key("Dean Acheson", nlp, 95)
+    gazetteer.add_gazetteer(nlp, [names], cache_dir=tmp_path)
+    assert DocCache.key("Dean Acheson", nlp, 95) != before
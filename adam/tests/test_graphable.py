@@ -49,7 +49,7 @@ spacy_nlp = spacy.load("en_core_web_sm")
 
 @pytest.fixture(name="basic_page")
 def fixture_basic_page():
-    return Page(test_canvas, spacy_nlp)
+    return Page(test_canvas, nlp=spacy_nlp)
 
 
 def test_graph(basic_page):
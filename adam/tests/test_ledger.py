@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+from adam import create_graph
+from adam import ledger as ledger_module
+from adam.container import Container
+from adam.ledger import Ledger, input_hash
+
+MANIFEST = "http://example.org/manifest/abc/manifest"
+
+
+def test_stages(tmp_path):
+    ledger = Ledger(tmp_path / "ledger.sqlite")
+    assert not ledger.is_done(MANIFEST, "ocr", "c1")
+    with ledger.stage(MANIFEST, "ocr", "c1", input_hash("gray", 1000)):
+        pass
+    assert ledger.is_done(MANIFEST, "ocr", "c1")
+    assert ledger.is_done(MANIFEST, "ocr", "c1", input_hash("gray", 1000))
+    assert not ledger.is_done(MANIFEST, "ocr", "c1", input_hash("gray", 2000))
+    with pytest.raises(RuntimeError):
+        with ledger.stage(MANIFEST, "ocr", "c2"):
+            raise RuntimeError("tesseract crashed")
+    assert ledger.done(MANIFEST, "ocr") == {"c1"}
+    ledger.forget(MANIFEST, "ocr")
+    assert ledger.done(MANIFEST, "ocr") == set()
+
+
+def test_container_resumes(manifest, tmp_path):
+    ledger = Ledger(tmp_path / "ledger.sqlite")
+    container = Container(manifest, ledger=ledger)
+    container.process_nlp()
+    container.dump(tmp_path / "out")
+    assert len(list((tmp_path / "out" / "abc").glob("*.ttl"))) == 3
+    assert container.is_complete()
+
+    # a fresh run finds nothing to do
+    rerun = Container(manifest, ledger=ledger)
+    assert rerun.is_complete()
+    assert rerun.pending_pages() == []
+
+    # work lost after a crash is redone, and only that work
+    with ledger.connection() as conn:
+        conn.execute("DELETE FROM stages WHERE canvas = ?", ("http://example.org/canvas/1",))
+        conn.execute("DELETE FROM stages WHERE canvas = '' ")
+    rerun = Container(manifest, ledger=ledger)
+    assert not rerun.is_complete()
+    assert [p._canvas.id for p in rerun.pending_pages()] == ["http://example.org/canvas/1"]
+    assert len(rerun.process_nlp()) == 1
+
+    # other settings are other work
+    for page in rerun.pages:
+        page.confidence_threshold = 50
+    assert len(rerun.pending_pages()) == 3
+
+
+def test_status(manifest, tmp_path, capsys):
+    path = tmp_path / "ledger.sqlite"
+    container = Container(manifest, ledger=Ledger(path))
+    container.process_nlp()
+    container.dump(tmp_path / "out")
+    ledger_module.main(["status", str(path)])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == "stage\tmanifests\tcanvases\tseconds"
+    counts = {line.split("\t")[0]: line.split("\t")[1:3] for line in lines[1:]}
+    assert counts["nlp"] == ["1", "3"]
+    assert counts["export:jsonl"] == ["1", "3"]
+    assert counts["export"] == ["1", "3"]
+
+
+def test_canvas_range(manifest, tmp_path):
+    ledger = Ledger(tmp_path / "ledger.sqlite")
+    part = Container(manifest, ledger=ledger, canvases=(0, 2))
+    assert len(part.pages) == 2
+    part.process_nlp()
+    part.dump(tmp_path / "out")
+    assert len(list((tmp_path / "out" / "abc").glob("*.ttl"))) == 2
+    assert part.is_complete()
+    whole = Container(manifest, ledger=ledger)
+    assert not whole.is_complete()
+    assert [p._canvas.id for p in whole.pending_pages()] == ["http://example.org/canvas/2"]
+
+
+def test_keyed_by_manifest_id(manifest, tmp_path, monkeypatch):
+    # the manifest is fetched from a URL other than its @id
+    url = "http://example.org/fetch/abc.json"
+    monkeypatch.setattr(create_graph, "Manifest", lambda uri: manifest)
+    path = tmp_path / "ledger.sqlite"
+    args = [url, str(tmp_path / "out"), "--ledger", str(path)]
+    create_graph.main(args)
+    assert len(list((tmp_path / "out").glob("*.ttl"))) == 3
+    ledger = Ledger(path)
+    assert len(ledger.done(manifest.uri, "rdf")) == 3
+    assert ledger.done(url, "rdf") == set()
+
+    # a rerun finds the work done
+    for ttl in (tmp_path / "out").glob("*.ttl"):
+        ttl.unlink()
+    create_graph.main(args)
+    assert not list((tmp_path / "out").glob("*.ttl"))
+
+    create_graph.main(args + ["--format", "nt"])
+    assert ledger.is_done(manifest.uri, "rdf:nt")
+    assert not ledger.is_done(url, "rdf:nt")
@@ -3,7 +3,7 @@
 import os
 import json
 import pytest
-from adam.manifest import Manifest, Canvas
+from adam.manifest import Manifest, Canvas, ImageProfile
 
 manifest_1_url = "https://figgy.princeton.edu/concern/scanned_resources/3c782d03-59be-4d6c-b421-3cbf697f9447/manifest"
 
@@ -38,3 +38,48 @@ def test_canvas_rendering(canvas_1):
     assert len(renderings) == 2
     assert renderings[0]["format"] == "text/plain"
     assert renderings[1]["format"] == "image/tiff"
+
+
+service_canvas_json = {
+    "@id": "https://figgy.princeton.edu/concern/scanned_resources/6a83801b-9169-40a4-8ca7-1494c94727b9/manifest/canvas/84304756-8e12-4a21-aad1-ba6d67582266",
+    "label": "1",
+    "rendering": [
+        {
+            "@id": "https://figgy.princeton.edu/downloads/84304756-8e12-4a21-aad1-ba6d67582266/file/45b6c33b-2b1c-4307-bb6c-a897e2a49e8c",
+            "format": "image/tiff",
+        }
+    ],
+    "images": [
+        {
+            "resource": {
+                "service": {
+                    "@id": "https://iiif-cloud.princeton.edu/iiif/2/ad%2F7d%2F1b%2Fad7d1b2e62604a2aa1976ad8dbd21ba9%2Fintermediate_file",
+                },
+            },
+        }
+    ],
+}
+
+
+def test_master_profile():
+    canvas = Canvas(service_canvas_json)
+    assert canvas.image_uri.endswith("45b6c33b-2b1c-4307-bb6c-a897e2a49e8c")
+    assert canvas.image_path.suffix == ".tif"
+
+
+def test_ocr_profile():
+    canvas = Canvas(service_canvas_json, ImageProfile.ocr(2000))
+    assert canvas.image_uri == (
+        "https://iiif-cloud.princeton.edu/iiif/2/ad%2F7d%2F1b%2Fad7d1b2e62604a2aa1976ad8dbd21ba9%2Fintermediate_file"
+        "/full/2000,/0/gray.jpg"
+    )
+    assert canvas.image_path.suffix == ".jpg"
+    assert canvas.image_path != Canvas(service_canvas_json).image_path
+    assert canvas.ocr_data_path != Canvas(service_canvas_json).ocr_data_path
+
+
+def test_ocr_profile_without_service():
+    canvas_json = {k: v for k, v in service_canvas_json.items() if k != "images"}
+    canvas = Canvas(canvas_json, ImageProfile.ocr(2000))
+    assert canvas.profile.is_master
+    assert canvas.image_uri.endswith("45b6c33b-2b1c-4307-bb6c-a897e2a49e8c")
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+from adam.container import Container
+from adam.ledger import Ledger
+from adam.memory import MemoryBudget, current_rss, format_size, peak_rss
+
+
+def test_rss():
+    assert peak_rss() > 1024 * 1024
+    assert current_rss() > 1024 * 1024
+    assert format_size(3 * 1024 * 1024) == "3.0M"
+    assert format_size(512) == "512B"
+
+
+def test_budget():
+    assert MemoryBudget("1T").batch_size(64) == 64
+    budget = MemoryBudget(1024)
+    assert budget.batch_size(64) == 32
+    assert budget.batch_size(1) == 1
+    assert budget.overruns == 1
+
+
+def test_iter_pages_releases(manifest):
+    container = Container(manifest)
+    seen = []
+    for page in container.iter_pages(batch_size=2):
+        assert page._doc is not None
+        seen.append(page)
+        if len(seen) > 1:
+            assert seen[-2]._doc is None
+            assert seen[-2]._canvas._ocr_data is None
+    assert len(seen) == 3
+    assert all(page._doc is None and page._text is None for page in seen)
+    # released pages read their data again when asked
+    assert seen[0].text == "Kennan Papers Princeton"
+
+
+def test_dump_streaming(manifest, tmp_path):
+    ledger = Ledger(tmp_path / "ledger.sqlite")
+    container = Container(manifest, ledger=ledger)
+    budget = MemoryBudget(1024)
+    container.dump_streaming(tmp_path / "out", batch_size=2, budget=budget)
+    assert len(list((tmp_path / "out" / "abc").glob("*.ttl"))) == 3
+    assert budget.overruns == 1
+    assert container.is_complete()
+    assert ledger.done(manifest.uri, "nlp") == {c.id for c in manifest.canvases}
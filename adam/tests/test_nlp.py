@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+import spacy
+from adam import cli
+from adam import nlp as registry
+from adam.cache import DocCache
+from adam.manifest import Canvas
+from adam.page import Page
+
+
+@pytest.fixture(autouse=True)
+def fixture_doc_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(Page, "doc_cache", DocCache(tmp_path / "docs"))
+
+
+@pytest.fixture(name="loads")
+def fixture_loads(monkeypatch):
+    """Replaces spacy.load with a blank pipeline and records each call."""
+    loads = []
+
+    def load(name, exclude=(), disable=()):
+        loads.append((name, tuple(exclude)))
+        return spacy.blank("en")
+
+    monkeypatch.setattr(registry.spacy, "load", load)
+    registry.clear()
+    yield loads
+    registry.clear()
+
+
+def test_models_are_loaded_once(loads):
+    first = registry.load_model("en_core_web_sm")
+    assert registry.load_model("en_core_web_sm") is first
+    assert registry.load_model("en_core_web_sm", exclude=["parser"]) is not first
+    assert loads == [("en_core_web_sm", ()), ("en_core_web_sm", ("parser",))]
+
+
+def test_pages_share_the_default_model(loads):
+    canvas = Canvas({"@id": "http://example.org/canvas/1", "label": "1"})
+    pages = [Page(canvas), Page(canvas)]
+    for page in pages:
+        page._text = "George Kennan wrote to Dean Acheson."
+        page.do_nlp()
+    assert pages[0].nlp is pages[1].nlp
+    assert len(loads) == 1
+
+
+def test_process_pages(nlp):
+    canvas = Canvas({"@id": "http://example.org/canvas/1", "label": "1"})
+    pages = [Page(canvas), Page(canvas)]
+    pages[0]._text = "A letter to Acheson."
+    pages[1]._text = "No names here."
+    registry.process_pages(pages, nlp, batch_size=2)
+    assert [e.string for e in pages[0].entities] == ["Acheson"]
+    assert pages[1].entities == []
+    assert pages[0].nlp is nlp
+
+
+def test_fast_profile_excludes_non_ner_components(loads):
+    registry.load_model("en_core_web_sm", profile="fast")
+    name, exclude = loads[0]
+    assert "parser" in exclude
+    assert "ner" not in exclude
+    assert "senter" not in exclude
+
+
+def test_ensure_sentences():
+    doc = spacy.blank("en")("Dear Mr. Kennan. Thank you for your letter.")
+    assert len(list(registry.ensure_sentences(doc).sents)) == 2
+
+
+def test_cached_docs_are_not_reprocessed(nlp):
+    canvas = Canvas({"@id": "http://example.org/canvas/1", "label": "1"})
+    page = Page(canvas)
+    page._text = "A letter to Acheson."
+    registry.process_pages([page], nlp)
+
+    calls = []
+    nlp.pipe = lambda texts, **kwargs: calls.append(list(texts)) or iter([])
+    again = Page(canvas)
+    again._text = "A letter to Acheson."
+    registry.process_pages([again], nlp)
+    assert calls == [[]]
+    assert [e.string for e in again.entities] == ["Acheson"]
+
+    page.confidence_threshold = 50
+    page._text = "A letter to Acheson."
+    assert page.cached_doc(nlp) is None
+
+
+def test_doc_cache_options(tmp_path):
+    args = cli.parse_args(["list.txt", "out", "--doc-cache-dir", str(tmp_path / "docs2")])
+    assert args.doc_cache_dir == str(tmp_path / "docs2")
+    assert cli.parse_args(["list.txt", "out", "--no-doc-cache"]).no_doc_cache
+    with pytest.raises(SystemExit):
+        cli.parse_args(["list.txt", "out", "--no-doc-cache", "--doc-cache-dir", "docs"])
+
+    Page.use_doc_cache(tmp_path / "docs2")
+    assert Page.doc_cache.root == tmp_path / "docs2"
+    Page.use_doc_cache(None)
+    assert Page.doc_cache is None
+    page = Page(Canvas({"@id": "http://example.org/canvas/1", "label": "1"}))
+    page._text = "Kennan replied."
+    assert page.cached_doc(spacy.blank("en")) is None
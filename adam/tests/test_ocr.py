@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+from adam.manifest import Canvas
+from adam.ocr import ocr_canvases
+from adam.ocr_data import frame_text, read_ocr_frame, write_ocr_frame
+
+
+@pytest.fixture(name="canvas")
+def fixture_canvas(tmp_path, monkeypatch):
+    monkeypatch.setattr(Canvas, "page_ocr_cache", tmp_path)
+    return Canvas(
+        {
+            "@id": "http://example.org/canvas/1",
+            "label": "1",
+            "rendering": [
+                {"@id": "http://example.org/downloads/1", "format": "image/tiff"}
+            ],
+        }
+    )
+
+
+def test_round_trip(tmp_path, tesseract_frame):
+    path = tmp_path / "page.parquet"
+    write_ocr_frame(tesseract_frame, path)
+    frame = read_ocr_frame(path)
+    assert str(frame.conf.dtype) == "float32"
+    assert str(frame.block_num.dtype) == "int16"
+    assert str(frame.left.dtype) == "int32"
+    assert frame.text.tolist() == [None, "Kennan", "Papers", "1922", "Princeton"]
+
+
+def test_legacy_csv_is_migrated(canvas, tesseract_frame):
+    tesseract_frame.to_csv(canvas.legacy_ocr_data_path)
+    assert canvas.ocr_data.text.tolist()[1:] == ["Kennan", "Papers", "1922", "Princeton"]
+    assert canvas.ocr_data_path.is_file()
+    assert not canvas.legacy_ocr_data_path.exists()
+
+
+def test_cached_canvases_are_skipped(canvas, tesseract_frame):
+    write_ocr_frame(tesseract_frame, canvas.ocr_data_path)
+    assert ocr_canvases([canvas]) == {}
+
+
+def iterrows_text(data_frame, threshold):
+    """The row-by-row implementation frame_text replaces."""
+    data_frame = data_frame[data_frame.conf > threshold]
+    data_frame = data_frame.reset_index().fillna("")
+    words = []
+    for _, token in data_frame.iterrows():
+        if not (token.isnull()["text"]):
+            words.append(token["text"])
+    return " ".join(words).strip()
+
+
+def test_frame_text(tmp_path, tesseract_frame):
+    path = tmp_path / "page.parquet"
+    write_ocr_frame(tesseract_frame, path)
+    frame = read_ocr_frame(path)
+    assert frame_text(frame, 95) == "Kennan Papers Princeton"
+    assert frame_text(frame, 95) == iterrows_text(frame, 95)
+    assert frame_text(frame, 30) == iterrows_text(frame, 30)
+    assert frame_text(frame, 95, by_line=True) == "Kennan Papers\nPrinceton"
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+from functools import partial
+import pytest
+from adam import cli
+from adam.cache import DocCache, ImageCache
+from adam.container import Container
+from adam.ledger import Ledger
+from adam.manifest import Canvas
+from adam.memory import MemoryBudget
+from adam.ocr_data import write_ocr_frame
+from adam.page import Page
+from adam.pipeline import Pipeline
+
+
+def fake_ocr(frame, canvas):
+    """Stands in for tesseract in the OCR worker processes."""
+    assert canvas.image_file.stat().st_size > 0
+    write_ocr_frame(frame, canvas.ocr_data_path)
+    return 0.0, 0.0
+
+
+@pytest.fixture(autouse=True)
+def fixture_caches(tmp_path, monkeypatch):
+    monkeypatch.setattr(Canvas, "image_cache", ImageCache(tmp_path / "images"))
+    monkeypatch.setattr(Canvas, "page_ocr_cache", tmp_path / "ocr")
+    monkeypatch.setattr(Page, "doc_cache", DocCache(tmp_path / "docs"))
+
+
+def test_pipeline(
+    image_server, make_canvas, make_manifest, nlp, tesseract_frame, tmp_path
+):
+    ledger = Ledger(tmp_path / "ledger.sqlite")
+    containers = [
+        Container(
+            make_manifest(
+                name, [make_canvas(image_server, f"{name}-{i}") for i in range(5)]
+            ),
+            ledger=ledger,
+        )
+        for name in ("box1", "box2")
+    ]
+    # one page is already OCRed, and skips download and OCR
+    write_ocr_frame(tesseract_frame, containers[0]._manifest.canvases[0].ocr_data_path)
+
+    ocr_task = partial(fake_ocr, tesseract_frame)
+    pipeline = Pipeline(nlp, ocr_processes=2, batch_size=3, queue_size=2, ocr_task=ocr_task)
+    stats = pipeline.run(iter(containers), tmp_path / "out")
+    for stage in ("download", "ocr", "nlp", "export"):
+        assert (stats[stage]["items"], stats[stage]["failures"]) == (10, 0)
+    for name in ("box1", "box2"):
+        assert len(list((tmp_path / "out" / name).glob("*.jsonl"))) == 5
+    text = (tmp_path / "out" / "box2" / "box2-3.txt").read_text()
+    assert text == "Kennan Papers Princeton"
+    assert all(container.is_complete() for container in containers)
+    assert Canvas.image_cache.stats["files"] == 9
+
+    # each stage is in the ledger, as Container.ocr and
+    # process_nlp would have recorded it
+    uri = containers[0]._manifest.uri
+    canvases = {canvas.id for canvas in containers[0]._manifest.canvases}
+    assert ledger.done(uri, "nlp") == canvases
+    for stage in ("download", "ocr"):
+        assert len(ledger.done(uri, stage)) == 4
+        assert ledger.done(containers[1]._manifest.uri, stage) == {
+            canvas.id for canvas in containers[1]._manifest.canvases
+        }
+    assert all(not container.pending_pages("nlp") for container in containers)
+
+    # a rerun has nothing to do
+    stats = Pipeline(nlp, ocr_processes=1, ocr_task=ocr_task).run(containers, tmp_path / "out")
+    assert stats["export"]["items"] == 0
+
+
+def test_memory_budget(manifest, nlp, tmp_path):
+    budget = MemoryBudget(1024)
+    pipeline = Pipeline(nlp, ocr_processes=1, batch_size=2, budget=budget)
+    stats = pipeline.run([Container(manifest)], tmp_path / "out")
+    assert stats["nlp"]["items"] == 3
+    assert stats["batch_size"] == 1
+    assert budget.overruns == 1
+
+
+def test_pipeline_and_queue_are_exclusive(capsys):
+    with pytest.raises(SystemExit):
+        cli.parse_args(["list.txt", "out", "--pipeline", "--queue", "/tmp/queue"])
+    assert "--pipeline" in capsys.readouterr().err
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+from http.server import BaseHTTPRequestHandler
+import pytest
+from rdflib import Dataset, Graph, URIRef
+from adam.cache import DocCache
+from adam.graphable import Graphable
+from adam.manifest import Canvas
+from adam.page import Page
+from adam.rdf_delta import DeltaUpdater, SnapshotStore, page_statements
+
+
+class SparqlHandler(BaseHTTPRequestHandler):
+    """Stands in for a SPARQL update endpoint, applying each
+    update to an in-memory graph or dataset."""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8")
+        self.server.updates.append(body)
+        self.server.store.update(body)
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(name="server")
+def fixture_server(serve):
+    server = serve(SparqlHandler)
+    server.store = Graph()
+    server.updates = []
+    return server
+
+
+@pytest.fixture(name="pages")
+def fixture_pages(tmp_path, monkeypatch, nlp):
+    monkeypatch.setattr(Page, "doc_cache", DocCache(tmp_path / "docs"))
+    monkeypatch.setattr(Graphable, "deterministic_ids", True)
+    pages = []
+    for i, text in enumerate(["Acheson wrote.", "Kennan replied.", "No names."]):
+        page = Page(Canvas({"@id": f"http://example.org/canvas/{i}", "label": str(i)}), nlp=nlp)
+        page._text = text
+        pages.append(page)
+    return pages
+
+
+def retext(page, text):
+    page.reset()
+    page._text = text
+
+
+def endpoint(server):
+    return f"http://127.0.0.1:{server.server_port}/repositories/kennan/statements"
+
+
+def store_statements(graph):
+    return set(graph)
+
+
+def expected_statements(pages):
+    return {t for page in pages for t in page.triples()}
+
+
+def test_delta_updates(server, pages, tmp_path):
+    updater = DeltaUpdater(endpoint(server), SnapshotStore(tmp_path / "rdf"))
+    counts = updater.update_pages(pages)
+    assert counts == {"pages": 3, "changed": 2, "deleted": 0, "inserted": 10}
+    assert len(server.updates) == 1
+    assert store_statements(server.store) == expected_statements(pages)
+
+    # nothing changed, nothing sent
+    assert updater.update_pages(pages)["changed"] == 0
+    assert len(server.updates) == 1
+
+    retext(pages[1], "Kennan and Dulles replied.")
+    counts = updater.update_pages(pages)
+    assert counts == {"pages": 3, "changed": 1, "deleted": 0, "inserted": 5}
+    assert "DELETE DATA" not in server.updates[-1]
+    assert store_statements(server.store) == expected_statements(pages)
+
+    retext(pages[0], "Someone wrote.")
+    counts = updater.update_pages(pages)
+    assert counts["deleted"] == 5 and counts["inserted"] == 0
+    assert store_statements(server.store) == expected_statements(pages)
+
+
+def test_graph_replacement(server, pages, tmp_path):
+    server.store = Dataset()
+    updater = DeltaUpdater(endpoint(server), SnapshotStore(tmp_path / "rdf"), mode="graph")
+    updater.update_pages(pages)
+    canvas = URIRef("http://example.org/canvas/0")
+    assert len(server.store.graph(canvas)) == 5
+
+    retext(pages[0], "Acheson and Kennan wrote.")
+    updater.update_pages(pages)
+    assert "DROP SILENT GRAPH <http://example.org/canvas/0>" in server.updates[-1]
+    assert "canvas/1" not in server.updates[-1]
+    assert len(server.store.graph(canvas)) == 10
+
+
+def test_small_batches(server, pages, tmp_path):
+    updater = DeltaUpdater(endpoint(server), SnapshotStore(tmp_path / "rdf"), batch_bytes=1)
+    updater.update_pages(pages)
+    assert len(server.updates) == 2
+
+
+def test_snapshots(pages, tmp_path):
+    store = SnapshotStore(tmp_path)
+    statements = page_statements(pages[0])
+    store.put("http://example.org/canvas/0", statements)
+    assert store.get("http://example.org/canvas/0") == statements
+    assert store.get("http://example.org/canvas/9") == set()
+    assert len(Graph().parse(data="\n".join(statements), format="nt")) == 5
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+import gzip
+import io
+import pytest
+from rdflib import BNode, Dataset, Graph, Literal, URIRef
+from rdflib.namespace import XSD
+from adam.cache import DocCache
+from adam.container import Container
+from adam.graphable import Graphable
+from adam.manifest import Canvas
+from adam.page import Page
+from adam.rdf_stream import TripleWriter, format_for, term_nt
+
+CANVAS = "http://example.org/manifest/canvas/1"
+
+
+@pytest.fixture(name="page")
+def fixture_page(tmp_path, monkeypatch, nlp):
+    monkeypatch.setattr(Page, "doc_cache", DocCache(tmp_path / "docs"))
+    page = Page(Canvas({"@id": CANVAS, "label": "1"}), nlp=nlp)
+    page._text = "Acheson cabled Moscow."
+    return page
+
+
+def test_term_nt():
+    assert term_nt(URIRef("http://example.org/a b")) == "<http://example.org/a\\u0020b>"
+    assert term_nt(Literal('say "hi"\n')) == '"say \\"hi\\"\\n"'
+    assert term_nt(Literal("chat", lang="fr")) == '"chat"@fr'
+    assert term_nt(Literal(1)) == f'"1"^^<{XSD.integer}>'
+    assert term_nt(BNode("b0")) == "_:b0"
+
+
+def test_format_for():
+    assert format_for("a/b.nt") == "nt"
+    assert format_for("a/b.nq.gz") == "nq"
+    with pytest.raises(ValueError):
+        format_for("a/b.ttl")
+
+
+def test_page_triples_round_trip(page, tmp_path):
+    path = tmp_path / "page.nt.gz"
+    with TripleWriter(path) as writer:
+        writer.write_all(page.triples())
+    assert writer.count == 10
+    graph = Graph()
+    with gzip.open(path, "rt", encoding="utf-8") as data:
+        graph.parse(data=data.read(), format="nt")
+    assert len(graph) == 10
+    assert set(graph.objects(None, URIRef("http://www.w3.org/2000/01/rdf-schema#label"))) == {
+        Literal("Acheson"),
+        Literal("Moscow"),
+    }
+
+
+def test_quads_are_named_by_canvas(page):
+    buffer = io.BytesIO()
+    with TripleWriter(buffer, "nq") as writer:
+        writer.write_all(page.triples(), URIRef(CANVAS))
+    dataset = Dataset()
+    dataset.parse(data=buffer.getvalue().decode("utf-8"), format="nquads")
+    assert len(dataset.graph(URIRef(CANVAS))) == 10
+
+
+def test_serialize_streams_ntriples(page, tmp_path):
+    path = tmp_path / "page.nt"
+    page.serialize(path, fmt="nt")
+    assert page._graph is None
+    assert len(Graph().parse(path, format="nt")) == 10
+
+
+def test_entities_are_light(page):
+    entity = page.entities[0]
+    assert not hasattr(entity, "__dict__")
+    assert (entity.string, entity.type, entity.start_char, entity.end_char) == (
+        "Acheson",
+        "PERSON",
+        0,
+        7,
+    )
+    assert entity._graph is None and entity._id is None
+    assert len(entity.graph) == 4
+    assert entity.graph.namespace_manager.store.namespace("ecrm") is not None
+
+
+def test_deterministic_ids(page, monkeypatch):
+    random_ids = {s for s, _, _ in page.triples()}
+    assert random_ids.isdisjoint({s for s, _, _ in page.triples()})
+
+    monkeypatch.setattr(Graphable, "deterministic_ids", True)
+    buffers = []
+    for _ in range(2):
+        buffer = io.BytesIO()
+        with TripleWriter(buffer) as writer:
+            writer.write_all(page.triples())
+        buffers.append(buffer.getvalue())
+    assert buffers[0] == buffers[1]
+    assert page.entities[0].id == page.entities[0].gen_id(
+        "appellation", CANVAS, 0, 7, "Acheson", "PERSON"
+    )
+    assert page.entities[0].id != page.entities[1].id
+
+
+def test_build_graph_once(page, monkeypatch):
+    monkeypatch.setattr(Graphable, "deterministic_ids", False)
+    page.build_graph()
+    # two entities, five statements each, minted once
+    assert len(page.graph) == 10
+
+
+def test_container_releases_exported_pages(manifest, tmp_path):
+    container = Container(manifest)
+    count = container.export_triples(tmp_path / "abc.nt")
+    assert count > 0
+    for page in container.pages:
+        assert page._doc is None
+        assert page._graph is None
+        assert page._canvas._ocr_data is None
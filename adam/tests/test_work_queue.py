@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+import time
+import pytest
+from adam import cli, work_queue
+from adam.work_queue import WorkQueue
+
+
+@pytest.fixture(name="tasks")
+def fixture_tasks(tmp_path):
+    return WorkQueue(tmp_path / "queue", lease_seconds=60, worker="a")
+
+
+def test_put_and_claim(tasks):
+    assert tasks.put({"manifest": "m1"})
+    assert not tasks.put({"manifest": "m1"})
+    assert tasks.put({"manifest": "m2"})
+
+    other = WorkQueue(tasks.root, worker="b")
+    claimed = [tasks.claim(), other.claim(), tasks.claim()]
+    assert sorted(lease.task["manifest"] for lease in claimed[:2]) == ["m1", "m2"]
+    assert claimed[2] is None
+    assert tasks.counts() == {"pending": 0, "leased": 2, "done": 0, "failed": 0}
+
+    tasks.complete(claimed[0])
+    assert not tasks.put({"manifest": claimed[0].task["manifest"]})
+    assert tasks.counts()["done"] == 1
+
+
+def test_expired_lease(tasks):
+    tasks.put({"manifest": "m1"})
+    lease = tasks.claim()
+    assert tasks.requeue_expired() == 0
+    assert lease.heartbeat()
+
+    # the worker stops touching its lease
+    os.utime(lease.path, (0, 0))
+    assert tasks.requeue_expired() == 1
+    assert not lease.heartbeat()
+    retry = tasks.claim()
+    assert retry.task == lease.task
+    assert retry.attempts == 2
+    assert not list(tasks.root.glob(".clock-*"))
+
+
+def test_stale_worker(tasks):
+    tasks.put({"manifest": "m1"})
+    stale = tasks.claim()
+    os.utime(stale.path, (0, 0))
+    other = WorkQueue(tasks.root, worker="b")
+    assert other.requeue_expired() == 1
+    lease = other.claim()
+
+    # the first worker comes back to a task it no longer holds
+    assert not stale.heartbeat()
+    assert not tasks.complete(stale)
+    assert not tasks.fail(stale, RuntimeError("too late"))
+    assert tasks.counts() == {"pending": 0, "leased": 1, "done": 0, "failed": 0}
+
+    assert lease.heartbeat()
+    assert other.complete(lease)
+    assert tasks.counts()["done"] == 1
+
+
+def test_archive_and_canvas_batch_are_exclusive(capsys):
+    with pytest.raises(SystemExit):
+        cli.parse_args(
+            ["list.txt", "out", "--queue", "q", "--canvas-batch", "50", "--archive", "zip"]
+        )
+    assert "--archive" in capsys.readouterr().err
+
+
+def test_failures(tmp_path):
+    tasks = WorkQueue(tmp_path / "queue", max_attempts=2)
+    tasks.put({"manifest": "m1"})
+    tasks.put({"manifest": "m2"})
+    handled = []
+
+    def handler(task):
+        if task["manifest"] == "m2":
+            raise RuntimeError("no such manifest")
+        handled.append(task["manifest"])
+
+    assert tasks.work(handler, poll_interval=0.1) == 1
+    assert handled == ["m1"]
+    assert tasks.counts() == {"pending": 0, "leased": 0, "done": 1, "failed": 1}
+
+    work_queue.main(["retry-failed", str(tasks.root)])
+    assert tasks.counts()["pending"] == 1
+
+
+def test_workers_share_queue(tmp_path):
+    root = tmp_path / "queue"
+    for i in range(20):
+        WorkQueue(root).put({"manifest": f"m{i}"})
+    handled = {}
+
+    def worker(name):
+        tasks = WorkQueue(root, lease_seconds=1, worker=name)
+
+        def handler(task):
+            time.sleep(0.01)
+            handled.setdefault(task["manifest"], []).append(name)
+
+        tasks.work(handler, poll_interval=0.1)
+
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(handled) == sorted(f"m{i}" for i in range(20))
+    assert all(len(names) == 1 for names in handled.values())
+    assert len({name for names in handled.values() for name in names}) > 1
@@ -17,23 +17,50 @@ p
   loader = ManifestLoader(manifest_url, repository, server_url)
 
   response = loader.load()
+
+To import many manifests, a BatchImporter keeps a number of
+imports in flight on the server, polls the server's list
+of imports until each is done, retries those that fail or
+time out (waiting longer before each retry), and records
+the outcome in a state file, so that a later run skips
+manifests already imported:
+
+  importer = BatchImporter(repository, server_url, concurrency=8,
+                           state_file="manifest_list.txt.state.json")
+  importer.run(manifest_urls)
 """
 
 import sys
+import os
 from pathlib import Path
 import argparse
 import json
 from sys import stdout
 import logging
+import time
 import requests
 
+_logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RETRIES = 3
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_TIMEOUT = 3600.0
+DEFAULT_BACKOFF = 5.0
+
+DONE = "DONE"
+FAILED = "ERROR"
+
 
 class ManifestLoader:
     """Loads a manifest into GraphDB via its
     rest interface."""
 
-    def __init__(self, url, repository, server_url="http://localhost:7200"):
-        self._base_url = server_url + "/rest/data/import/upload"
+    def __init__(
+        self, url, repository, server_url="http://localhost:7200", session=None
+    ):
+        self._base_url = server_url.rstrip("/") + "/rest/data/import/upload"
+        self._session = session or requests
         self._data = {}
         self._headers = {}
         self._repository = repository
@@ -75,6 +102,13 @@ class ManifestLoader:
             raise ValueError("no repository specified")
         return "/".join((self._base_url, self._repository, "url"))
 
+    @property
+    def status_url(self):
+        """The server's list of imports into the repository."""
+        if not self._repository:
+            raise ValueError("no repository specified")
+        return "/".join((self._base_url, self._repository))
+
     @property
     def data(self):
         return json.dumps(self._data)
@@ -84,12 +118,154 @@ class ManifestLoader:
         return self._headers
 
     def load(self):
-        response = requests.post(self.url,
-                                 headers=self.headers,
-                                 data=self.data)
+        response = self._session.post(self.url,
+                                      headers=self.headers,
+                                      data=self.data)
         return response
 
 
+class ImportState:
+    """The outcome of each manifest's import, kept in a JSON
+    file so that later runs can skip what is done."""
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self.outcomes = {}
+        if self.path and self.path.exists():
+            self.outcomes = json.loads(self.path.read_text(encoding="utf-8"))
+
+    def done(self, url):
+        return self.outcomes.get(url) == DONE
+
+    def record(self, url, outcome):
+        self.outcomes[url] = outcome
+        if self.path:
+            tmp = self.path.with_name(f"{self.path.name}.tmp")
+            tmp.write_text(json.dumps(self.outcomes, indent=1), encoding="utf-8")
+            os.replace(tmp, self.path)
+
+
+class BatchImporter:
+    """Imports many manifests with at most concurrency
+    imports in flight on the server at once."""
+
+    def __init__(self, repository, server_url="http://localhost:7200",
+                 concurrency=DEFAULT_CONCURRENCY, retries=DEFAULT_RETRIES,
+                 poll_interval=DEFAULT_POLL_INTERVAL, timeout=DEFAULT_TIMEOUT,
+                 backoff=DEFAULT_BACKOFF, state_file=None):
+        self.repository = repository
+        self.server_url = server_url
+        self.concurrency = concurrency
+        self.retries = retries
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.backoff = backoff
+        self.not_before = {}
+        self.timestamps = {}
+        self.state = ImportState(state_file)
+        self.session = requests.Session()
+
+    def loader(self, url):
+        return ManifestLoader(url, self.repository, self.server_url, self.session)
+
+    def submit(self, url):
+        """Starts an import; returns whether the server took it."""
+        try:
+            response = self.loader(url).load()
+        except requests.RequestException as error:
+            _logger.warning("submitting %s failed: %s", url, error)
+            return False
+        _logger.info("submitted %s: %s", url, response.status_code)
+        if not response.ok:
+            _logger.warning("server said %s", response.text[:200])
+        return response.ok
+
+    def statuses(self):
+        """Returns the server's status of each import, by name."""
+        status_url = self.loader("").status_url
+        try:
+            response = self.session.get(status_url)
+            response.raise_for_status()
+        except requests.RequestException as error:
+            _logger.warning("polling imports failed: %s", error)
+            return {}
+        statuses = {job["name"]: job for job in response.json()}
+        for name, job in statuses.items():
+            if "timestamp" in job:
+                self.timestamps[name] = job["timestamp"]
+        return statuses
+
+    def finish(self, url, outcome, attempts, pending):
+        """Records outcome, or queues url again if it failed
+        and may be retried."""
+        if outcome == FAILED and attempts[url] <= self.retries:
+            delay = self.backoff * 2 ** (attempts[url] - 1)
+            _logger.info("retrying %s in %.0fs", url, delay)
+            self.not_before[url] = time.time() + delay
+            pending.append(url)
+            return
+        _logger.info("%s: %s", url, outcome)
+        self.state.record(url, outcome)
+
+    def status(self, job, before):
+        """The status of an import, or None if it is still
+        running.  before is the server's timestamp for the
+        name when the import was submitted: a finished entry
+        whose timestamp has not moved on from it is left from
+        an earlier import of the same name, and does not
+        count.  Only the server's own timestamps are compared,
+        so its clock need not agree with ours."""
+        status = job.get("status")
+        if status not in (DONE, FAILED):
+            return None
+        if before is not None and job.get("timestamp", before) <= before:
+            return None
+        return status
+
+    def run(self, urls):
+        """Imports urls; returns a dict of outcomes by url."""
+        pending = [url for url in dict.fromkeys(urls) if not self.state.done(url)]
+        _logger.info("importing %d of %d manifests", len(pending), len(urls))
+        attempts = dict.fromkeys(pending, 0)
+        in_flight = {}
+        if pending:
+            # the timestamps of any earlier imports of the same names
+            self.statuses()
+        while pending or in_flight:
+            now = time.time()
+            ready = [url for url in pending if self.not_before.get(url, 0) <= now]
+            for url in ready[:self.concurrency - len(in_flight)]:
+                pending.remove(url)
+                attempts[url] += 1
+                started = time.time()
+                before = self.timestamps.get(url)
+                if self.submit(url):
+                    in_flight[url] = (started, before)
+                else:
+                    self.finish(url, FAILED, attempts, pending)
+            if not in_flight:
+                if pending:
+                    wait = min(self.not_before.get(url, 0) for url in pending)
+                    time.sleep(max(0, wait - time.time()))
+                continue
+            time.sleep(self.poll_interval)
+            statuses = self.statuses()
+            now = time.time()
+            for url, (started, before) in list(in_flight.items()):
+                job = statuses.get(url, {})
+                status = self.status(job, before)
+                if status is None:
+                    if now - started < self.timeout:
+                        continue
+                    _logger.warning("%s: no result after %.0fs", url, now - started)
+                    status = FAILED
+                elif status == FAILED:
+                    _logger.warning("%s: %s", url, job.get("message"))
+                del in_flight[url]
+                self.finish(url, status, attempts, pending)
+        return {url: self.state.outcomes.get(url) for url in urls}
+
+
 # CLI
 
 def parse_args(args):
@@ -98,11 +274,22 @@ def parse_args(args):
     parser.add_argument('manifest_list')
     parser.add_argument('repository')
     parser.add_argument('server')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help="number of imports in flight on the server")
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES)
+    parser.add_argument('--poll-interval', type=float,
+                        default=DEFAULT_POLL_INTERVAL,
+                        help="seconds between polls of the server's imports")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help="seconds after which an unfinished import is failed")
+    parser.add_argument('--backoff', type=float, default=DEFAULT_BACKOFF,
+                        help="seconds before the first retry, doubled for each after")
+    parser.add_argument('--state',
+                        help="state file (default: MANIFEST_LIST.state.json)")
     return parser.parse_args(args)
 
 def main(args):
     args = parse_args(args)
-    _logger = logging.getLogger(__name__)
     log_format = "[%(asctime)s] %(levelname)s:%(name)s:%(message)s"
     logging.basicConfig(level=logging.INFO,
                         stream=stdout,
@@ -110,13 +297,20 @@ def main(args):
                         datefmt="%Y-%m-%d %H:%M:%S")
 
     with open(args.manifest_list, 'r', encoding="utf-8") as file:
-        manifests = file.readlines()
-        for manifest_url in manifests:
-            logging.info("loading %s" % manifest_url)
-            result = ManifestLoader(manifest_url,
-                                    args.repository,
-                                    args.server).load()
-            logging.info("result: %s" % result)
+        manifests = [line.strip() for line in file if line.strip()]
+    importer = BatchImporter(args.repository, args.server,
+                             concurrency=args.concurrency,
+                             retries=args.retries,
+                             poll_interval=args.poll_interval,
+                             timeout=args.timeout,
+                             backoff=args.backoff,
+                             state_file=args.state or f"{args.manifest_list}.state.json")
+    outcomes = importer.run(manifests)
+    failed = [url for url, outcome in outcomes.items() if outcome != DONE]
+    _logger.info("imported %d manifests; %d failed",
+                 len(outcomes) - len(failed), len(failed))
+    if failed:
+        sys.exit(1)
 
 def run():
     main(sys.argv[1:])
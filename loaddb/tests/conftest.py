@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the loaders are scripts rather than an installed package
+sys.path.insert(0, str(Path(__file__).parents[1]))
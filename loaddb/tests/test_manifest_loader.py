@@ -0,0 +1,145 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from manifest_loader import DONE, FAILED, BatchImporter
+
+MANIFESTS = [f"https://figgy.example.org/{i}/manifest" for i in range(6)]
+
+
+class ImportHandler(BaseHTTPRequestHandler):
+    """Stands in for GraphDB's /rest/data/import/upload API.
+    Each import finishes on the second poll after it is
+    submitted; imports named in server.fail_once fail the
+    first time, and those named in server.lost are accepted
+    but never started.  Its clock is server.skew seconds
+    ahead of ours."""
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.submitted.append(body["name"])
+            server.submit_times.append(time.time())
+            if body["name"] in server.lost:
+                self.send_response(202)
+                self.end_headers()
+                return
+            running = sum(1 for job in server.jobs.values() if job["polls"] < 2)
+            server.max_running = max(server.max_running, running + 1)
+            server.jobs[body["name"]] = {
+                "polls": 0,
+                "timestamp": time.time() + server.skew,
+            }
+        self.send_response(202)
+        self.end_headers()
+
+    def do_GET(self):
+        server = self.server
+        jobs = []
+        with server.lock:
+            for name, job in server.jobs.items():
+                job["polls"] += 1
+                status = "IMPORTING"
+                if job["polls"] >= 2:
+                    status = DONE
+                    if name in server.fail_once:
+                        server.fail_once.discard(name)
+                        job["failed"] = True
+                    if job.get("failed"):
+                        status = FAILED
+                jobs.append(
+                    {
+                        "name": name,
+                        "status": status,
+                        "message": "",
+                        "timestamp": int(job["timestamp"] * 1000),
+                    }
+                )
+        body = json.dumps(jobs).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(name="server")
+def fixture_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ImportHandler)
+    server.lock = threading.Lock()
+    server.jobs = {}
+    server.submitted = []
+    server.submit_times = []
+    server.max_running = 0
+    server.fail_once = set()
+    server.lost = set()
+    server.skew = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+
+
+def importer_for(server, state_file, **kwargs):
+    url = f"http://127.0.0.1:{server.server_port}"
+    kwargs.setdefault("backoff", 0)
+    return BatchImporter("kennan", url, poll_interval=0, state_file=state_file, **kwargs)
+
+
+def test_concurrency_cap(server, tmp_path):
+    outcomes = importer_for(server, tmp_path / "state.json", concurrency=2).run(MANIFESTS)
+    assert outcomes == dict.fromkeys(MANIFESTS, DONE)
+    assert server.max_running == 2
+
+
+def test_retry_and_resume(server, tmp_path):
+    state = tmp_path / "state.json"
+    server.fail_once = {MANIFESTS[0]}
+    outcomes = importer_for(server, state, retries=1).run(MANIFESTS[:3])
+    assert outcomes == dict.fromkeys(MANIFESTS[:3], DONE)
+    assert server.submitted.count(MANIFESTS[0]) == 2
+
+    server.submitted.clear()
+    importer_for(server, state).run(MANIFESTS)
+    assert server.submitted == MANIFESTS[3:]
+
+
+def test_gives_up(server, tmp_path):
+    server.fail_once = {MANIFESTS[0]}
+    outcomes = importer_for(server, tmp_path / "state.json", retries=0).run(MANIFESTS[:1])
+    assert outcomes == {MANIFESTS[0]: FAILED}
+
+
+def test_timeout(server, tmp_path):
+    server.lost = {MANIFESTS[0]}
+    importer = importer_for(
+        server, tmp_path / "state.json", retries=1, timeout=0.2, backoff=0.3
+    )
+    outcomes = importer.run(MANIFESTS[:2])
+    assert outcomes == {MANIFESTS[0]: FAILED, MANIFESTS[1]: DONE}
+    assert server.submitted.count(MANIFESTS[0]) == 2
+    first, second = [
+        t
+        for name, t in zip(server.submitted, server.submit_times)
+        if name == MANIFESTS[0]
+    ]
+    assert second - first > 0.45
+
+
+def test_stale_status(server, tmp_path):
+    # the server still lists an earlier import of the same name
+    server.jobs[MANIFESTS[0]] = {"polls": 2, "timestamp": time.time() - 3600}
+    server.lost = {MANIFESTS[0]}
+    importer = importer_for(server, tmp_path / "state.json", retries=0, timeout=0.2)
+    assert importer.run(MANIFESTS[:1]) == {MANIFESTS[0]: FAILED}
+
+
+def test_server_clock_behind(server, tmp_path):
+    server.skew = -3600
+    importer = importer_for(server, tmp_path / "state.json", timeout=5)
+    outcomes = importer.run(MANIFESTS[:2])
+    assert outcomes == dict.fromkeys(MANIFESTS[:2], DONE)
@@ -0,0 +1,111 @@
+import gzip
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from ttl_loader import BulkLoader, LoadLog, chunk_files, file_list
+
+
+class StatementsHandler(BaseHTTPRequestHandler):
+    """Stands in for the RDF4J /repositories/{id}/statements
+    endpoint, failing the first fail_first requests."""
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        with server.lock:
+            server.attempts += 1
+            failing = server.attempts <= server.fail_first
+            if not failing:
+                server.posts.append((self.path, self.headers["Content-Type"], body))
+        if self.path != "/repositories/kennan/statements":
+            self.send_error(404)
+        elif failing:
+            self.send_error(503)
+        else:
+            self.send_response(204)
+            self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(name="server")
+def fixture_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StatementsHandler)
+    server.lock = threading.Lock()
+    server.attempts = 0
+    server.fail_first = 0
+    server.posts = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture(name="rdf_dir")
+def fixture_rdf_dir(tmp_path):
+    rdf = tmp_path / "rdf"
+    for i in range(6):
+        page = rdf / f"container{i % 2}" / f"page{i}.ttl"
+        page.parent.mkdir(parents=True, exist_ok=True)
+        page.write_text(f"<urn:s{i}> <urn:p> <urn:o> .\n")
+    with gzip.open(rdf / "container.nt.gz", "wt") as f:
+        f.write("<urn:s> <urn:p> <urn:o> .\n")
+    (rdf / "notes.txt").write_text("not rdf")
+    return rdf
+
+
+def loader_for(server, **kwargs):
+    url = f"http://127.0.0.1:{server.server_port}"
+    return BulkLoader("kennan", url, backoff=0.01, **kwargs)
+
+
+def test_chunks(rdf_dir):
+    files = file_list(rdf_dir)
+    assert len(files) == 7
+    chunks = list(chunk_files(files, chunk_size=60))
+    assert [(suffix, len(chunk)) for suffix, chunk in chunks] == [
+        (".nt", 1),
+        (".ttl", 2),
+        (".ttl", 2),
+        (".ttl", 2),
+    ]
+
+
+def test_load_batches_and_logs(server, rdf_dir, tmp_path):
+    log = LoadLog(tmp_path / "loaded")
+    loaded, failures = loader_for(server).load(file_list(rdf_dir), log)
+    assert (loaded, failures) == (7, [])
+    assert sorted((ctype, body.count(b"\n")) for _, ctype, body in server.posts) == [
+        ("application/n-triples", 1),
+        ("text/turtle", 11),
+    ]
+
+    # a rerun loads nothing
+    server.posts.clear()
+    log = LoadLog(tmp_path / "loaded")
+    assert loader_for(server).load(file_list(rdf_dir), log) == (0, [])
+    assert server.posts == []
+
+
+def test_retries(server, rdf_dir, tmp_path):
+    server.fail_first = 2
+    log = LoadLog(tmp_path / "loaded")
+    loader = loader_for(server, concurrency=1)
+    assert loader.load(file_list(rdf_dir), log) == (7, [])
+    assert server.attempts == 4
+
+
+def test_failures_are_not_logged(server, rdf_dir, tmp_path):
+    server.fail_first = 100
+    log = LoadLog(tmp_path / "loaded")
+    loaded, failures = loader_for(server, retries=1).load(file_list(rdf_dir), log)
+    assert loaded == 0 and len(failures) == 2
+    assert not (tmp_path / "loaded").exists()
+
+    # client errors are not retried
+    url = f"http://127.0.0.1:{server.server_port}"
+    _, failures = BulkLoader("nowhere", url).load(file_list(rdf_dir), log)
+    assert len(failures) == 2
+    assert server.attempts == 4 + 2
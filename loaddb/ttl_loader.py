@@ -1,43 +1,267 @@
-"""Loads directory of Turtle files into GraphDB
+"""Loads directory of RDF files into GraphDB
 
+Files (Turtle, N-Triples or N-Quads, optionally gzipped)
+are grouped by format into chunks of up to --chunk-size
+bytes; each chunk is sent as a single gzip-compressed
+request to the repository's RDF4J statements endpoint,
+and several chunks are sent at once over a pooled
+session.  Failed requests are retried with backoff.
 
+Files in a chunk that has been loaded are appended to a
+log (by default .loaded in the source directory), and
+files named in the log are skipped, so an interrupted
+load can be resumed by running it again.
+
+Turtle files are concatenated as they are: adam writes
+no labelled blank nodes, which would otherwise be merged
+across the files of a chunk.
+
+  python ttl_loader.py ~/Desktop/ColdWarPapers/MC076/subseries_1a/data/rdf test_kennan
 """
 
+import argparse
+import gzip
+import logging
+import os
+import random
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-import argparse
 import requests
+from requests.adapters import HTTPAdapter
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_SERVER = "http://localhost:7200"
+DEFAULT_CHUNK_SIZE = 16 * 1024 * 1024
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RETRIES = 5
+
+CONTENT_TYPES = {
+    ".ttl": "text/turtle",
+    ".nt": "application/n-triples",
+    ".nq": "application/n-quads",
+}
+
 
-def load_ttl_file(path):
-    headers = {"Content-Type": "application/x-turtle"}
-#    url = "http://localhost:7200/repositories/Kennan_subseries_1A/statements"
-    url = "http://localhost:7200/repositories/test_kennan/statements"
+class LoadError(Exception):
+    """A chunk could not be loaded."""
+
+
+def rdf_format(path):
+    """Returns the RDF suffix of path, ignoring .gz."""
+    suffixes = Path(path).suffixes
+    if suffixes and suffixes[-1] == ".gz":
+        suffixes = suffixes[:-1]
+    return suffixes[-1] if suffixes else ""
 
-    with open(path, 'rb') as f:
-        print(path)
-        response = requests.post(url, headers=headers, data=f)
-    return response
 
 def file_list(path):
-    p = Path(path)
-    return p.glob("**/*.ttl")
+    p = Path(path).resolve()
+    return sorted(
+        f for f in p.glob("**/*") if f.is_file() and rdf_format(f) in CONTENT_TYPES
+    )
+
+
+def read_file(path) -> bytes:
+    if path.suffix == ".gz":
+        with gzip.open(path, "rb") as f:
+            return f.read()
+    return path.read_bytes()
+
+
+def chunk_files(files, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yields (suffix, files) groups of files of one format
+    whose total size is at most chunk_size (or a single
+    larger file)."""
+    by_format = {}
+    for f in files:
+        by_format.setdefault(rdf_format(f), []).append(f)
+    for suffix, group in by_format.items():
+        chunk, size = [], 0
+        for f in group:
+            file_size = f.stat().st_size
+            if chunk and size + file_size > chunk_size:
+                yield suffix, chunk
+                chunk, size = [], 0
+            chunk.append(f)
+            size += file_size
+        if chunk:
+            yield suffix, chunk
+
+
+class LoadLog:
+    """The files that have been loaded, one path per line."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.loaded = set()
+        if self.path.exists():
+            with self.path.open("r", encoding="utf-8") as f:
+                self.loaded = {line.rstrip("\n") for line in f if line.strip()}
+
+    def __contains__(self, path):
+        return str(path) in self.loaded
+
+    def add(self, paths):
+        with self._lock:
+            with self.path.open("a", encoding="utf-8") as f:
+                for path in paths:
+                    f.write(f"{path}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.loaded.update(str(path) for path in paths)
+
+
+class BulkLoader:
+    """Posts chunks of RDF to a GraphDB (RDF4J) repository."""
+
+    def __init__(
+        self,
+        repository,
+        server_url=DEFAULT_SERVER,
+        concurrency=DEFAULT_CONCURRENCY,
+        retries=DEFAULT_RETRIES,
+        backoff=0.5,
+        max_backoff=30,
+        timeout=300,
+        compress=True,
+    ):
+        self.url = f"{server_url.rstrip('/')}/repositories/{repository}/statements"
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.compress = compress
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def backoff_delay(self, attempt):
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    def post(self, suffix, files):
+        """Posts files as one request, retrying transient
+        failures; raises LoadError if it cannot."""
+        body = b"\n".join(read_file(f) for f in files)
+        headers = {"Content-Type": CONTENT_TYPES[suffix]}
+        if self.compress:
+            body = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.post(
+                    self.url, data=body, headers=headers, timeout=self.timeout
+                )
+            except requests.RequestException as error:
+                reason = str(error)
+            else:
+                if response.ok:
+                    return response
+                reason = f"{response.status_code} {response.text[:200]}"
+                if 400 <= response.status_code < 500 and response.status_code not in (
+                    408,
+                    429,
+                ):
+                    raise LoadError(f"{len(files)} files from {files[0]}: {reason}")
+            if attempt < self.retries:
+                delay = self.backoff_delay(attempt)
+                _logger.warning(f"retrying in {delay:.1f}s after {reason}")
+                time.sleep(delay)
+        raise LoadError(f"{len(files)} files from {files[0]}: {reason}")
+
+    def load(self, files, log, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Loads the files not in log; returns the number of
+        files loaded and a list of the chunks that failed."""
+        pending = [f for f in files if f not in log]
+        _logger.info(f"loading {len(pending)} of {len(files)} files into {self.url}")
+        loaded, failures = 0, []
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = {
+                pool.submit(self.post, suffix, chunk): chunk
+                for suffix, chunk in chunk_files(pending, chunk_size)
+            }
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    future.result()
+                except LoadError as error:
+                    _logger.error(f"failed: {error}")
+                    failures.append(chunk)
+                else:
+                    log.add(chunk)
+                    loaded += len(chunk)
+                    _logger.info(f"loaded {len(chunk)} files from {chunk[0]}")
+        return loaded, failures
+
+    def close(self):
+        self.session.close()
 
 
 def parse_args(args):
-    parser = argparse.ArgumentParser(
-        description="upload turtle files")
-    parser.add_argument('source_dir')
+    parser = argparse.ArgumentParser(description="upload RDF files")
+    parser.add_argument("source_dir")
+    parser.add_argument("repository")
+    parser.add_argument("--server", default=DEFAULT_SERVER)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="number of uploads in flight",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="bytes of RDF per request",
+    )
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES)
+    parser.add_argument(
+        "--log",
+        help="file recording loaded files (default: SOURCE_DIR/.loaded)",
+    )
+    parser.add_argument(
+        "--no-compress",
+        dest="compress",
+        action="store_false",
+        help="send requests uncompressed",
+    )
     return parser.parse_args(args)
 
+
 def main(args):
     args = parse_args(args)
-    files = file_list(args.source_dir)
-    for f in files:
-        print(f"loading {f}")
-        load_ttl_file(f)
+    logging.basicConfig(
+        level=logging.INFO,
+        stream=sys.stdout,
+        format="[%(asctime)s] %(levelname)s:%(name)s:%(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    log = LoadLog(args.log or Path(args.source_dir) / ".loaded")
+    loader = BulkLoader(
+        args.repository,
+        args.server,
+        concurrency=args.concurrency,
+        retries=args.retries,
+        compress=args.compress,
+    )
+    try:
+        loaded, failures = loader.load(file_list(args.source_dir), log, args.chunk_size)
+    finally:
+        loader.close()
+    _logger.info(f"loaded {loaded} files; {len(failures)} chunks failed")
+    if failures:
+        sys.exit(1)
+
 
 def run():
     main(sys.argv[1:])
 
+
 if __name__ == "__main__":
     run()
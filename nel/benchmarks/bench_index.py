@@ -0,0 +1,116 @@
+"""
+Times AppellationIndex lookups on a real appellation list.
+
+Builds the index from an OpenRefine export (or any CSV or
+TSV with appellation and VIAF_ID columns), then looks up
+a sample of its appellations, each misspelled with up to
+max_distance random edits as OCR might, both through the
+index and by scoring every appellation in turn.  Reports
+the size of the index and the time to build it, the time
+per lookup each way, and how often the misspelled name's
+own appellation is among the candidates.
+
+  python benchmarks/bench_index.py openrefine_data.tsv --queries 200
+"""
+
+import argparse
+import random
+import string
+import sys
+import time
+from nel.index import DEFAULT_LIMIT, AppellationIndex, Candidate, distance, normalize
+
+
+def misspell(name, edits, rng):
+    """Returns name with edits random deletions,
+    insertions, substitutions or transpositions."""
+    for _ in range(edits):
+        if len(name) < 2:
+            break
+        i = rng.randrange(len(name) - 1)
+        edit = rng.choice(("delete", "insert", "substitute", "transpose"))
+        if edit == "delete":
+            name = name[:i] + name[i + 1 :]
+        elif edit == "insert":
+            name = name[:i] + rng.choice(string.ascii_lowercase) + name[i:]
+        elif edit == "substitute":
+            name = name[:i] + rng.choice(string.ascii_lowercase) + name[i + 1 :]
+        else:
+            name = name[:i] + name[i + 1] + name[i] + name[i + 2 :]
+    return name
+
+
+def scan(index, name, limit=DEFAULT_LIMIT):
+    """Looks name up by scoring every appellation, as the
+    index would without its deletes."""
+    query = normalize(name)
+    candidates = []
+    for term, entries in index.entries.items():
+        edits = distance(query, term, index.max_distance)
+        if edits > index.max_distance:
+            continue
+        score = 1 - edits / max(len(query), len(term))
+        for appellation, viaf_id in entries:
+            candidates.append(Candidate(appellation, viaf_id, round(score, 4)))
+    candidates.sort(key=lambda c: (-c.score, c.appellation, c.viaf_id))
+    return candidates[:limit]
+
+
+def time_lookups(lookup, queries):
+    start = time.perf_counter()
+    results = [lookup(name) for name, _ in queries]
+    return results, (time.perf_counter() - start) / len(queries)
+
+
+def found(results, queries):
+    hits = sum(
+        any(c.appellation == appellation for c in candidates)
+        for candidates, (_, appellation) in zip(results, queries)
+    )
+    return hits / len(queries)
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(description="Benchmark appellation lookups")
+    parser.add_argument("data_file", help="CSV or TSV with appellation and VIAF_ID")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--max-distance", type=int, default=2)
+    parser.add_argument("--prefix-length", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(args)
+
+
+def main(args):
+    args = parse_args(args)
+    start = time.perf_counter()
+    index = AppellationIndex.from_file(
+        args.data_file, max_distance=args.max_distance, prefix_length=args.prefix_length
+    )
+    build = time.perf_counter() - start
+
+    rng = random.Random(args.seed)
+    appellations = [a for entries in index.entries.values() for a, _ in entries]
+    queries = [
+        (misspell(a, rng.randint(0, args.max_distance), rng), a)
+        for a in rng.choices(appellations, k=args.queries)
+    ]
+    indexed, indexed_time = time_lookups(index.lookup, queries)
+    scanned, scanned_time = time_lookups(lambda name: scan(index, name), queries)
+    agree = sum(
+        [c[:2] for c in a[:1]] == [c[:2] for c in b[:1]] for a, b in zip(indexed, scanned)
+    )
+
+    print(f"appellations\t{len(index)}")
+    print(f"deletes\t{len(index.deletes)}")
+    print(f"build\t{build:.2f} s")
+    print(f"queries\t{len(queries)}")
+    print(f"index lookup\t{indexed_time * 1e6:.0f} us")
+    print(f"scan lookup\t{scanned_time * 1e6:.0f} us")
+    print(f"speedup\t{scanned_time / indexed_time:.0f}x")
+    print(f"found by index\t{found(indexed, queries):.1%}")
+    print(f"found by scan\t{found(scanned, queries):.1%}")
+    print(f"same best candidate\t{agree / len(queries):.1%}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
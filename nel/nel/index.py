@@ -0,0 +1,220 @@
+"""A fuzzy index of appellations to VIAF identifiers
+
+Names recognized in OCR text are often misspelled
+("Achesen" for "Acheson"), so they cannot be linked by
+exact lookup.  AppellationIndex uses symmetric deletes
+(as in SymSpell): every name is indexed under each string
+obtained by deleting up to max_distance characters from
+the first prefix_length characters of its normalized
+form.  A query generates the same deletes, so the names
+within max_distance edits of it are found by a handful of
+dictionary lookups, whatever the size of the index, and
+only those few are scored by edit distance.
+
+  Typical usage:
+
+  index = AppellationIndex.from_file("openrefine_data.csv")
+  index.save("appellations.pickle")
+  index = AppellationIndex.load("appellations.pickle")
+  index.link(["Achesen", "George Kennan"])
+"""
+import argparse
+import csv
+import logging
+import pickle
+import re
+import sys
+import unicodedata
+from collections import namedtuple
+from pathlib import Path
+
+_logger = logging.getLogger(__name__)
+
+Candidate = namedtuple("Candidate", ["appellation", "viaf_id", "score"])
+
+DEFAULT_MAX_DISTANCE = 2
+DEFAULT_PREFIX_LENGTH = 7
+DEFAULT_LIMIT = 5
+
+
+def normalize(name: str) -> str:
+    """Folds case and accents, drops punctuation and
+    collapses whitespace."""
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(c for c in name if not unicodedata.combining(c))
+    name = re.sub(r"[^\w\s]", " ", name.casefold())
+    return " ".join(name.split())
+
+
+def distance(a: str, b: str, limit: int) -> int:
+    """Returns the optimal string alignment distance between
+    a and b, or limit + 1 if it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = None
+    row = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(current[j - 1] + 1, row[j] + 1, row[j - 1] + cost)
+            if (
+                previous is not None
+                and j > 1
+                and a[i - 1] == b[j - 2]
+                and a[i - 2] == b[j - 1]
+            ):
+                current[j] = min(current[j], previous[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous, row = row, current
+    return row[-1] if row[-1] <= limit else limit + 1
+
+
+class AppellationIndex:
+    """A symmetric-delete index of appellations"""
+
+    def __init__(
+        self, max_distance=DEFAULT_MAX_DISTANCE, prefix_length=DEFAULT_PREFIX_LENGTH
+    ):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.entries = {}
+        self.deletes = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _deletes(self, term):
+        prefix = term[: self.prefix_length]
+        found = {prefix}
+        frontier = {prefix}
+        for _ in range(self.max_distance):
+            frontier = {
+                t[:i] + t[i + 1 :] for t in frontier for i in range(len(t))
+            } - found
+            found |= frontier
+        return found
+
+    def add(self, appellation, viaf_id):
+        term = normalize(appellation)
+        if not term:
+            return
+        entries = self.entries.setdefault(term, [])
+        if (appellation, viaf_id) in entries:
+            return
+        if not entries:
+            for delete in self._deletes(term):
+                self.deletes.setdefault(delete, set()).add(term)
+        entries.append((appellation, viaf_id))
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """Builds an index from a CSV or TSV file with
+        appellation and VIAF_ID columns, such as an
+        OpenRefine export."""
+        index = cls(**kwargs)
+        path = Path(path)
+        delimiter = "\t" if path.suffix == ".tsv" else ","
+        with path.open("r", encoding="utf-8") as data_file:
+            for row in csv.DictReader(data_file, delimiter=delimiter):
+                if row.get("appellation") and row.get("VIAF_ID"):
+                    index.add(row["appellation"].strip(), row["VIAF_ID"].strip())
+        _logger.info(f"indexed {len(index)} appellations from {path}")
+        return index
+
+    def save(self, path):
+        with open(path, "wb") as index_file:
+            pickle.dump(self, index_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as index_file:
+            return pickle.load(index_file)
+
+    def lookup(self, name, limit=DEFAULT_LIMIT) -> list:
+        """Returns up to limit Candidates for name, best first.
+        A candidate's score is 1 less its edit distance from
+        name relative to the longer of the two."""
+        query = normalize(name)
+        if not query:
+            return []
+        terms = set()
+        for delete in self._deletes(query):
+            terms |= self.deletes.get(delete, set())
+        candidates = []
+        for term in terms:
+            edits = distance(query, term, self.max_distance)
+            if edits > self.max_distance:
+                continue
+            score = 1 - edits / max(len(query), len(term))
+            for appellation, viaf_id in self.entries[term]:
+                candidates.append(Candidate(appellation, viaf_id, round(score, 4)))
+        candidates.sort(key=lambda c: (-c.score, c.appellation, c.viaf_id))
+        return candidates[:limit]
+
+    def link(self, entities, limit=DEFAULT_LIMIT) -> list:
+        """Returns the candidates for each of a batch of
+        entities, which may be strings or NamedEntity
+        objects.  Repeated names are looked up once."""
+        names = [getattr(entity, "string", entity) for entity in entities]
+        found = {}
+        for name in names:
+            if name not in found:
+                found[name] = self.lookup(name, limit)
+        return [found[name] for name in names]
+
+
+# CLI
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(description="Link appellations to VIAF")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="build an index from a data file")
+    build.add_argument("data_file", help="CSV or TSV with appellation and VIAF_ID")
+    build.add_argument("index_file")
+    build.add_argument("--max-distance", type=int, default=DEFAULT_MAX_DISTANCE)
+    build.add_argument("--prefix-length", type=int, default=DEFAULT_PREFIX_LENGTH)
+    link = subparsers.add_parser("link", help="link names, one per line, to VIAF")
+    link.add_argument("index_file")
+    link.add_argument("names", help="file of names, or - for stdin")
+    link.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        dest="loglevel",
+        help="set loglevel to INFO",
+        action="store_const",
+        const=logging.INFO,
+    )
+    return parser.parse_args(args)
+
+
+def main(args):
+    args = parse_args(args)
+    logging.basicConfig(level=args.loglevel, stream=sys.stderr)
+    if args.command == "build":
+        index = AppellationIndex.from_file(
+            args.data_file,
+            max_distance=args.max_distance,
+            prefix_length=args.prefix_length,
+        )
+        index.save(args.index_file)
+        return
+    index = AppellationIndex.load(args.index_file)
+    names_file = sys.stdin if args.names == "-" else open(args.names, encoding="utf-8")
+    with names_file:
+        names = [line.strip() for line in names_file if line.strip()]
+    writer = csv.writer(sys.stdout, delimiter="\t")
+    for name, candidates in zip(names, index.link(names, args.limit)):
+        for candidate in candidates:
+            writer.writerow([name, *candidate])
+
+
+def run():
+    main(sys.argv[1:])
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,52 @@
+import pytest
+from nel.index import AppellationIndex, distance, normalize
+
+
+@pytest.fixture()
+def index(small_test):
+    return AppellationIndex.from_file(small_test)
+
+
+def test_normalize():
+    assert normalize("  Gleason,  Abbott ") == "gleason abbott"
+    assert normalize("José Martí") == "jose marti"
+
+
+def test_distance():
+    assert distance("acheson", "achesen", 2) == 1
+    assert distance("acheson", "achseon", 2) == 1
+    assert distance("acheson", "kennan", 2) == 3
+
+
+def test_exact_lookup(index):
+    assert len(index) == 2
+    [candidate] = index.lookup("Abbott Gleason")
+    assert candidate == ("Abbott Gleason", "50398309", 1.0)
+
+
+def test_fuzzy_lookup(index):
+    [candidate] = index.lookup("Abbot Gleasen")
+    assert candidate.viaf_id == "50398309"
+    assert 0.8 < candidate.score < 1
+    assert index.lookup("A. Blaire Knap")[0].viaf_id == "71190067"
+    assert index.lookup("Dean Acheson") == []
+
+
+def test_link_batch(index):
+    class Entity:
+        string = "A Blair Knapp"
+
+    results = index.link(["Abbott Gleason", Entity(), "Nobody", "Abbott Gleason"])
+    assert [[c.viaf_id for c in r] for r in results] == [
+        ["50398309"],
+        ["71190067"],
+        [],
+        ["50398309"],
+    ]
+
+
+def test_save_and_load(index, tmp_path):
+    path = tmp_path / "index.pickle"
+    index.save(path)
+    loaded = AppellationIndex.load(path)
+    assert loaded.lookup("Abbot Gleason") == index.lookup("Abbot Gleason")